@@ -5,6 +5,51 @@ LLM配置文件
 import os
 from typing import Optional, Dict, Any
 
+# 单个任务默认的并发请求数，以及允许配置的上限
+DEFAULT_CONCURRENCY = 5
+MAX_CONCURRENCY = 64
+
+# 每题采样次数上限（pass@k / 多数投票）
+MAX_SAMPLES_PER_QUESTION = 20
+
+# 计算pass@k和多数投票准确率时，单个样本得分达到该值视为通过
+PASS_SCORE_THRESHOLD = float(os.getenv("LLM_PASS_SCORE_THRESHOLD", "60"))
+
+# 每个 (API端点, 模型) 默认的限流配置，可被LLM表中的配置覆盖；为0表示不限制
+DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv("LLM_DEFAULT_RPM", "600")) or None
+DEFAULT_TOKENS_PER_MINUTE = int(os.getenv("LLM_DEFAULT_TPM", "1000000")) or None
+# 429、超时、5xx等可重试错误的最大重试次数
+DEFAULT_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+
+# 响应缓存配置：SQLite文件位置、总大小上限和最长保留时间
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_response_cache.sqlite3")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "512")) * 1024 * 1024
+LLM_CACHE_MAX_AGE_SECONDS = int(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600
+
+# 任务结果写缓冲：累计多少行或多少秒后批量写入数据库
+WRITE_BUFFER_ROWS = int(os.getenv("LLM_WRITE_BUFFER_ROWS", "50"))
+WRITE_BUFFER_SECONDS = float(os.getenv("LLM_WRITE_BUFFER_SECONDS", "2"))
+
+# 评测worker配置：每个worker同时运行的作业数、作业租约时长、空闲时轮询间隔和最大尝试次数
+WORKER_MAX_JOBS = int(os.getenv("EVAL_WORKER_MAX_JOBS", "4"))
+JOB_LEASE_SECONDS = int(os.getenv("EVAL_JOB_LEASE_SECONDS", "60"))
+WORKER_POLL_SECONDS = float(os.getenv("EVAL_WORKER_POLL_SECONDS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("EVAL_JOB_MAX_ATTEMPTS", "3"))
+
+# 进度快照：多久写入一次（SSE进度推送也按此间隔轮询），以及每个请求保留的部分输出长度
+PROGRESS_SNAPSHOT_SECONDS = float(os.getenv("LLM_PROGRESS_SNAPSHOT_SECONDS", "1"))
+INFLIGHT_PARTIAL_CHARS = int(os.getenv("LLM_INFLIGHT_PARTIAL_CHARS", "300"))
+
+# 结果导出时每页读取的答案数
+EXPORT_PAGE_SIZE = int(os.getenv("LLM_EXPORT_PAGE_SIZE", "1000"))
+
+# 数据集版本快照文件目录（API和worker需使用同一本地目录），设为空字符串时不使用快照
+DATASET_SNAPSHOT_DIR = os.getenv("DATASET_SNAPSHOT_DIR", "dataset_snapshots")
+
+# 批量API模式：轮询间隔和最长等待时间（OpenAI批量作业的完成窗口为24小时）
+BATCH_POLL_SECONDS = float(os.getenv("LLM_BATCH_POLL_SECONDS", "30"))
+BATCH_MAX_WAIT_SECONDS = int(os.getenv("LLM_BATCH_MAX_WAIT_HOURS", "24")) * 3600
+
 # 默认系统提示词配置
 DEFAULT_SYSTEM_PROMPTS = {
     "choice": """你是一个专业的问答助手。请仔细阅读问题和选项，选择最合适的答案。
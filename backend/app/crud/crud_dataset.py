@@ -7,6 +7,7 @@ from typing import List, Optional, Tuple
 
 from ..models.dataset import Dataset
 from ..schemas.dataset import DatasetCreate, DatasetUpdate
+from .crud_dataset_version_stats import refresh_dataset_version_stats
 
 
 def get_dataset(db: Session, dataset_id: int, version: Optional[int] = None) -> Optional[Dataset]:
@@ -107,6 +108,7 @@ def create_dataset(db: Session, dataset: DatasetCreate, created_by: int) -> Data
         created_by=created_by
     )
     db.add(db_dataset)
+    refresh_dataset_version_stats(db, db_dataset.id, db_dataset.version)
     db.commit()
     db.refresh(db_dataset)
     return db_dataset
@@ -227,6 +229,7 @@ def create_dataset_version(
     )
     
     db.add(db_dataset)
+    refresh_dataset_version_stats(db, dataset_id, new_version)
     db.commit()
     db.refresh(db_dataset)
     return db_dataset
@@ -0,0 +1,290 @@
+"""
+CRUD operations for DatasetVersionStats - 数据集版本统计的计算、读取与失效
+版本创建或完成时计算并写入；问题、答案、得分点或标签发生变化时删除所属数据集的统计行，读取时按需重新计算
+"""
+import logging
+import uuid
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, case, delete, event, func, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..db.database import SessionLocal
+from ..models.dataset import Dataset
+from ..models.dataset_version_stats import DatasetVersionStats
+from ..models.std_question import StdQuestion
+from ..models.std_answer import StdAnswer, StdAnswerScoringPoint
+from ..models.tag import std_question_tag_association
+
+logger = logging.getLogger(__name__)
+
+# (数据集ID, 版本)
+VersionKey = Tuple[int, int]
+
+# 这些表的内容变化会使统计失效
+_SOURCE_MODELS = (StdQuestion, StdAnswer, StdAnswerScoringPoint)
+
+
+def _version_questions_join():
+    """Dataset与其版本范围内有效问题的关联条件"""
+    return and_(
+        StdQuestion.dataset_id == Dataset.id,
+        StdQuestion.original_version_id <= Dataset.version,
+        StdQuestion.current_version_id >= Dataset.version,
+        StdQuestion.is_valid == True
+    )
+
+
+def compute_dataset_version_stats(db: Session, keys: Iterable[VersionKey]) -> Dict[VersionKey, Dict]:
+    """
+    计算多个数据集版本的统计（计数一次分组查询，标签分布一次分组查询）
+
+    Returns:
+        (数据集ID, 版本) 到统计字段的映射，没有问题的版本计数为0；
+        content_token每次计算都重新生成，内容变化删除统计行后旧的快照文件随之失效
+    """
+    keys = list(set(keys))
+    stats = {
+        key: {
+            "question_count": 0, "choice_question_count": 0, "text_question_count": 0,
+            "answer_count": 0, "scoring_point_count": 0, "tag_counts": {},
+            "content_token": uuid.uuid4().hex
+        }
+        for key in keys
+    }
+    if not keys:
+        return stats
+    version_filter = tuple_(Dataset.id, Dataset.version).in_(keys)
+
+    rows = db.query(
+        Dataset.id,
+        Dataset.version,
+        func.count(func.distinct(StdQuestion.id)),
+        func.count(func.distinct(case((StdQuestion.question_type == 'choice', StdQuestion.id)))),
+        func.count(func.distinct(case((StdQuestion.question_type == 'text', StdQuestion.id)))),
+        func.count(func.distinct(StdAnswer.id)),
+        func.count(func.distinct(StdAnswerScoringPoint.id))
+    ).join(
+        StdQuestion, _version_questions_join()
+    ).outerjoin(
+        StdAnswer, and_(StdAnswer.std_question_id == StdQuestion.id, StdAnswer.is_valid == True)
+    ).outerjoin(
+        StdAnswerScoringPoint, and_(
+            StdAnswerScoringPoint.std_answer_id == StdAnswer.id,
+            StdAnswerScoringPoint.is_valid == True
+        )
+    ).filter(version_filter).group_by(Dataset.id, Dataset.version)
+    for dataset_id, version, questions, choices, texts, answers, scoring_points in rows:
+        stats[(dataset_id, version)].update(
+            question_count=questions,
+            choice_question_count=choices,
+            text_question_count=texts,
+            answer_count=answers,
+            scoring_point_count=scoring_points
+        )
+
+    tag_rows = db.query(
+        Dataset.id,
+        Dataset.version,
+        std_question_tag_association.c.tag_label,
+        func.count(StdQuestion.id)
+    ).join(
+        StdQuestion, _version_questions_join()
+    ).join(
+        std_question_tag_association, std_question_tag_association.c.std_question_id == StdQuestion.id
+    ).filter(version_filter).group_by(Dataset.id, Dataset.version, std_question_tag_association.c.tag_label)
+    for dataset_id, version, tag_label, count in tag_rows:
+        stats[(dataset_id, version)]["tag_counts"][tag_label] = count
+    return stats
+
+
+def refresh_dataset_version_stats(db: Session, dataset_id: int, version: int) -> DatasetVersionStats:
+    """重新计算并写入一个数据集版本的统计（不提交，由调用方在同一事务中提交）"""
+    # 先写入未提交的变更，使统计包含本事务中的修改
+    db.flush()
+    values = compute_dataset_version_stats(db, [(dataset_id, version)])[(dataset_id, version)]
+    row = db.merge(DatasetVersionStats(dataset_id=dataset_id, version=version, computed_at=datetime.now(), **values))
+    logger.info(f"Dataset {dataset_id} v{version}: 统计已更新，{values['question_count']} 个问题")
+    return row
+
+
+def get_dataset_version_stats(db: Session, datasets: Iterable[Dataset]) -> Dict[VersionKey, DatasetVersionStats]:
+    """
+    读取多个数据集版本的统计；缺少的版本（新版本或内容变化后）一次计算并写入
+
+    Returns:
+        (数据集ID, 版本) 到统计行的映射
+    """
+    keys = {(dataset.id, dataset.version) for dataset in datasets}
+    if not keys:
+        return {}
+    result = {
+        (row.dataset_id, row.version): row
+        for row in db.query(DatasetVersionStats).filter(
+            tuple_(DatasetVersionStats.dataset_id, DatasetVersionStats.version).in_(list(keys))
+        )
+    }
+    missing = keys - result.keys()
+    if not missing:
+        return result
+
+    now = datetime.now()
+    computed = [
+        {"dataset_id": dataset_id, "version": version, "computed_at": now, **values}
+        for (dataset_id, version), values in compute_dataset_version_stats(db, missing).items()
+    ]
+    _save_computed_stats(computed)
+    result.update({(row["dataset_id"], row["version"]): DatasetVersionStats(**row) for row in computed})
+    return result
+
+
+def _save_computed_stats(rows: List[Dict]):
+    """使用独立会话写入按需计算的统计，不提交调用方会话（避免已加载的对象过期后逐个重新加载）"""
+    writer = SessionLocal()
+    try:
+        writer.execute(insert(DatasetVersionStats), rows)
+        writer.commit()
+    except IntegrityError:
+        # 并发请求已写入同一版本的统计，使用本次计算的结果即可
+        writer.rollback()
+    except Exception as e:
+        writer.rollback()
+        logger.warning(f"写入数据集版本统计失败: {str(e)}")
+    finally:
+        writer.close()
+
+
+def get_dataset_content_token(db: Session, dataset: Dataset) -> Optional[str]:
+    """
+    数据集版本当前内容的标识（快照文件按此命名）
+
+    统计行没有标识时（新增该列之前计算的行）使用独立会话补写；统计行被并发删除时返回None
+    """
+    stats = get_dataset_version_stats(db, [dataset])[(dataset.id, dataset.version)]
+    if stats.content_token:
+        return stats.content_token
+    table = DatasetVersionStats.__table__
+    key_filter = and_(table.c.dataset_id == dataset.id, table.c.version == dataset.version)
+    writer = SessionLocal()
+    try:
+        writer.execute(update(table).where(key_filter, table.c.content_token.is_(None)).values(
+            content_token=uuid.uuid4().hex
+        ))
+        writer.commit()
+        # 并发补写时以先提交的为准
+        return writer.execute(select(table.c.content_token).where(key_filter)).scalar()
+    except Exception as e:
+        writer.rollback()
+        logger.warning(f"Dataset {dataset.id} v{dataset.version}: 写入内容标识失败: {str(e)}")
+        return None
+    finally:
+        writer.close()
+
+
+def invalidate_dataset_version_stats(db: Session, dataset_ids: Optional[Set[int]] = None):
+    """
+    删除数据集所有版本的统计（不提交）；问题可能跨多个版本，因此不区分版本
+
+    Args:
+        dataset_ids: 数据集ID集合，为None时删除全部统计
+    """
+    if dataset_ids is not None and not dataset_ids:
+        return
+    statement = delete(DatasetVersionStats.__table__)
+    if dataset_ids is not None:
+        statement = statement.where(DatasetVersionStats.__table__.c.dataset_id.in_(dataset_ids))
+    db.execute(statement)
+    # 会话中已加载的统计行已被删除，移出会话，之后重新计算时插入新行
+    for obj in list(db.identity_map.values()):
+        if isinstance(obj, DatasetVersionStats) and (dataset_ids is None or obj.dataset_id in dataset_ids):
+            db.expunge(obj)
+
+
+def _changed_dataset_ids(session: Session) -> Set[int]:
+    """本次flush中新增、修改或删除的问题、答案、得分点所属的数据集"""
+    dataset_ids: Set[int] = set()
+    question_ids: Set[int] = set()
+    answer_ids: Set[int] = set()
+    modified = (obj for obj in session.dirty if session.is_modified(obj))
+    for obj in chain(session.new, session.deleted, modified):
+        if not isinstance(obj, _SOURCE_MODELS):
+            continue
+        if isinstance(obj, StdQuestion):
+            dataset_ids.add(obj.dataset_id)
+        elif isinstance(obj, StdAnswer):
+            if obj.std_question_id is not None:
+                question_ids.add(obj.std_question_id)
+            elif obj.std_question is not None:
+                dataset_ids.add(obj.std_question.dataset_id)
+        elif obj.std_answer_id is not None:
+            answer_ids.add(obj.std_answer_id)
+        elif obj.std_answer is not None:
+            if obj.std_answer.std_question_id is not None:
+                question_ids.add(obj.std_answer.std_question_id)
+            elif obj.std_answer.std_question is not None:
+                dataset_ids.add(obj.std_answer.std_question.dataset_id)
+    if question_ids:
+        dataset_ids.update(dataset_id for (dataset_id,) in session.query(StdQuestion.dataset_id).filter(
+            StdQuestion.id.in_(question_ids)
+        ).distinct())
+    if answer_ids:
+        dataset_ids.update(dataset_id for (dataset_id,) in session.query(StdQuestion.dataset_id).join(
+            StdAnswer, StdAnswer.std_question_id == StdQuestion.id
+        ).filter(StdAnswer.id.in_(answer_ids)).distinct())
+    dataset_ids.discard(None)
+    return dataset_ids
+
+
+@event.listens_for(Session, "before_flush")
+def _invalidate_on_flush(session: Session, flush_context, instances):
+    """
+    通过ORM对象修改问题、答案、得分点或标签时，删除所属数据集的统计
+
+    以原生SQL写入标签关联表（QuestionTagRecords）不经过此处，调用方需自行调用invalidate_dataset_version_stats
+    """
+    with session.no_autoflush:
+        invalidate_dataset_version_stats(session, _changed_dataset_ids(session))
+
+
+def _bulk_changed_dataset_ids(session: Session, model, whereclause) -> Set[int]:
+    """批量UPDATE/DELETE执行前，按语句的WHERE条件查询涉及的数据集"""
+    if model is StdQuestion:
+        query = select(StdQuestion.dataset_id)
+    elif model is StdAnswer:
+        query = select(StdQuestion.dataset_id).join(StdAnswer, StdAnswer.std_question_id == StdQuestion.id)
+    else:
+        query = select(StdQuestion.dataset_id).join(
+            StdAnswer, StdAnswer.std_question_id == StdQuestion.id
+        ).join(StdAnswerScoringPoint, StdAnswerScoringPoint.std_answer_id == StdAnswer.id)
+    dataset_ids = set(session.execute(query.where(whereclause).distinct()).scalars())
+    dataset_ids.discard(None)
+    return dataset_ids
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_on_bulk_change(orm_execute_state):
+    """
+    批量UPDATE/DELETE问题、答案或得分点时，先按WHERE条件查询涉及的数据集，只删除这些数据集的统计；
+    语句没有WHERE条件或查询失败时删除全部统计
+    """
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or not issubclass(mapper.class_, _SOURCE_MODELS):
+        return
+    session = orm_execute_state.session
+    whereclause = orm_execute_state.statement.whereclause
+    if whereclause is not None:
+        try:
+            with session.no_autoflush:
+                dataset_ids = _bulk_changed_dataset_ids(session, mapper.class_, whereclause)
+            invalidate_dataset_version_stats(session, dataset_ids)
+            return
+        except Exception as e:
+            logger.warning(f"无法确定批量修改{mapper.class_.__name__}涉及的数据集，删除全部统计: {str(e)}")
+    else:
+        logger.warning(f"批量修改{mapper.class_.__name__}没有WHERE条件，删除全部统计")
+    invalidate_dataset_version_stats(session)
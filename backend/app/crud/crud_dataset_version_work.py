@@ -15,6 +15,7 @@ from ..models.std_question import StdQuestion
 from ..models.std_answer import StdAnswer, StdAnswerScoringPoint
 from ..models.tag import Tag
 from ..models.user import User
+from .crud_dataset_version_stats import refresh_dataset_version_stats
 from ..schemas.dataset_version_work import (
     DatasetVersionWorkCreate, DatasetVersionWorkUpdate,
     VersionStdQuestionCreate, VersionStdQuestionUpdate,
@@ -179,6 +180,9 @@ def complete_dataset_version_work(
         # 3. 应用版本工作表中的修改
         _apply_version_changes(db, work)
         
+        # 新版本内容已确定，计算版本统计
+        refresh_dataset_version_stats(db, work.dataset_id, work.target_version)
+        
         # 4. 更新版本工作状态
         work.work_status = WorkStatus.COMPLETED
         work.completed_at = datetime.utcnow()
@@ -7,6 +7,7 @@ from sqlalchemy import and_
 
 from ..models.evaluation import Evaluation, EvaluatorType
 from ..schemas.evaluation import EvaluationCreate, EvaluationUpdate
+from .crud_task_score_aggregate import apply_evaluation_score_changes, counted_score
 
 
 def get_evaluation(db: Session, evaluation_id: int) -> Optional[Evaluation]:
@@ -67,6 +68,7 @@ def create_evaluation(db: Session, evaluation: EvaluationCreate) -> Evaluation:
     )
     
     db.add(db_evaluation)
+    apply_evaluation_score_changes(db, [(db_evaluation.llm_answer_id, None, db_evaluation.score)])
     db.commit()
     db.refresh(db_evaluation)
     return db_evaluation
@@ -82,9 +84,11 @@ def update_evaluation(
     if not db_evaluation:
         return None
     
+    old_score = counted_score(db_evaluation)
     update_data = evaluation_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_evaluation, field, value)
+    apply_evaluation_score_changes(db, [(db_evaluation.llm_answer_id, old_score, counted_score(db_evaluation))])
     
     db.commit()
     db.refresh(db_evaluation)
@@ -97,7 +101,9 @@ def delete_evaluation(db: Session, evaluation_id: int) -> bool:
     if not db_evaluation:
         return False
     
+    old_score = counted_score(db_evaluation)
     db_evaluation.is_valid = False
+    apply_evaluation_score_changes(db, [(db_evaluation.llm_answer_id, old_score, None)])
     db.commit()
     return True
 
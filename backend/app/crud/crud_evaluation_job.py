@@ -0,0 +1,153 @@
+"""
+CRUD operations for the evaluation job queue
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from typing import Optional
+from datetime import datetime, timedelta
+import logging
+
+from ..models.evaluation_job import EvaluationJob, JobType, JobStatus
+from ..models.llm_evaluation_task import LLMEvaluationTask
+from ..config.llm_config import JOB_MAX_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+
+def get_active_job(db: Session, task_id: int) -> Optional[EvaluationJob]:
+    """获取任务尚未结束的作业"""
+    return db.query(EvaluationJob).filter(
+        EvaluationJob.task_id == task_id,
+        EvaluationJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+    ).first()
+
+
+def get_active_fanout_job(db: Session, fanout_group: str) -> Optional[EvaluationJob]:
+    """获取扇出分组中任一任务尚未结束的作业"""
+    return db.query(EvaluationJob).join(
+        LLMEvaluationTask, LLMEvaluationTask.id == EvaluationJob.task_id
+    ).filter(
+        LLMEvaluationTask.fanout_group == fanout_group,
+        EvaluationJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+    ).first()
+
+
+def enqueue_evaluation_job(
+    db: Session,
+    task_id: int,
+    job_type: JobType,
+    question_limit: Optional[int] = None
+) -> EvaluationJob:
+    """
+    将评测作业加入队列；同一任务已有未结束的作业时直接返回该作业
+
+    多个进程同时入队时由active_task_id的唯一索引保证只插入一个作业，插入冲突的一方返回已有的作业
+    """
+    while True:
+        job = get_active_job(db, task_id)
+        if job:
+            logger.info(f"Task {task_id}: 已有未结束的作业 {job.id}，不重复入队")
+            return job
+        job = EvaluationJob(
+            task_id=task_id,
+            job_type=job_type,
+            status=JobStatus.QUEUED,
+            question_limit=question_limit,
+            active_task_id=task_id
+        )
+        db.add(job)
+        try:
+            db.commit()
+            break
+        except IntegrityError:
+            # 其他进程已为该任务插入未结束的作业，重新读取
+            db.rollback()
+    db.refresh(job)
+    logger.info(f"Task {task_id}: 作业 {job.id} ({job_type.value}) 已入队")
+    return job
+
+
+def claim_evaluation_job(db: Session, worker_id: str, lease_seconds: int) -> Optional[EvaluationJob]:
+    """领取一个排队中或租约已过期的作业
+
+    使用 SELECT ... FOR UPDATE SKIP LOCKED，多个worker并发领取时不会拿到同一个作业。
+    """
+    now = datetime.now()
+    while True:
+        job = db.query(EvaluationJob).filter(
+            or_(
+                EvaluationJob.status == JobStatus.QUEUED,
+                and_(
+                    EvaluationJob.status == JobStatus.RUNNING,
+                    EvaluationJob.lease_expires_at < now
+                )
+            )
+        ).order_by(EvaluationJob.id).with_for_update(skip_locked=True).first()
+        if not job:
+            db.commit()
+            return None
+
+        if job.attempts >= JOB_MAX_ATTEMPTS:
+            # 多次领取后仍未完成（worker反复崩溃），不再重试
+            job.status = JobStatus.FAILED
+            job.error_message = f"作业已尝试 {job.attempts} 次仍未完成"
+            job.finished_at = now
+            job.active_task_id = None
+            job.lease_owner = None
+            job.lease_expires_at = None
+            db.commit()
+            logger.error(f"Job {job.id}: {job.error_message}")
+            continue
+
+        if job.status == JobStatus.RUNNING:
+            logger.warning(f"Job {job.id}: worker {job.lease_owner} 的租约已过期，重新领取")
+        job.status = JobStatus.RUNNING
+        job.lease_owner = worker_id
+        job.lease_expires_at = now + timedelta(seconds=lease_seconds)
+        job.attempts += 1
+        db.commit()
+        db.refresh(job)
+        return job
+
+
+def renew_job_lease(db: Session, job_id: int, worker_id: str, lease_seconds: int) -> bool:
+    """续约作业租约，租约已被其他worker接管时返回False"""
+    updated = db.query(EvaluationJob).filter(
+        EvaluationJob.id == job_id,
+        EvaluationJob.status == JobStatus.RUNNING,
+        EvaluationJob.lease_owner == worker_id
+    ).update(
+        {EvaluationJob.lease_expires_at: datetime.now() + timedelta(seconds=lease_seconds)},
+        synchronize_session=False
+    )
+    db.commit()
+    return updated == 1
+
+
+def finish_evaluation_job(
+    db: Session,
+    job_id: int,
+    worker_id: str,
+    job_status: JobStatus,
+    error_message: Optional[str] = None
+) -> bool:
+    """结束作业（完成、失败或释放回队列），只有租约持有者可以操作"""
+    values = {
+        EvaluationJob.status: job_status,
+        EvaluationJob.lease_owner: None,
+        EvaluationJob.lease_expires_at: None,
+        EvaluationJob.error_message: error_message
+    }
+    if job_status in [JobStatus.DONE, JobStatus.FAILED]:
+        values[EvaluationJob.finished_at] = datetime.now()
+        values[EvaluationJob.active_task_id] = None
+    elif job_status == JobStatus.QUEUED:
+        # worker正常退出时释放的作业不计入尝试次数
+        values[EvaluationJob.attempts] = EvaluationJob.attempts - 1
+    updated = db.query(EvaluationJob).filter(
+        EvaluationJob.id == job_id,
+        EvaluationJob.lease_owner == worker_id
+    ).update(values, synchronize_session=False)
+    db.commit()
+    return updated == 1
@@ -0,0 +1,176 @@
+"""
+CRUD operations for ModelLeaderboardEntry - 任务完成时刷新排行榜汇总行，排行榜接口只读取汇总行
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from ..models.model_leaderboard_entry import (
+    ModelLeaderboardEntry, GROUP_OVERALL, GROUP_QUESTION_TYPE, GROUP_TAG
+)
+from ..models.llm_evaluation_task import LLMEvaluationTask, TaskStatus
+from ..models.llm_answer import LLMAnswer
+from ..models.evaluation import Evaluation
+from ..models.llm import LLM
+from ..models.tag import std_question_tag_association
+from ..models.task_score_aggregate import ALL_QUESTION_TYPES
+from .crud_task_score_aggregate import get_task_score_aggregates
+
+
+def _average(score_sum: Decimal, score_count: int) -> Optional[Decimal]:
+    if not score_count:
+        return None
+    return round(Decimal(score_sum) / score_count, 2)
+
+
+def refresh_task_leaderboard(db: Session, task_id: int):
+    """
+    重新生成任务的排行榜汇总行并提交
+
+    总体和按问题类型的分数直接取自评分汇总表，按标签的分数用一次分组查询计算。
+    """
+    task = db.query(
+        LLMEvaluationTask.id, LLMEvaluationTask.dataset_id, LLMEvaluationTask.dataset_version,
+        LLMEvaluationTask.model_id, LLMEvaluationTask.created_by, LLMEvaluationTask.completed_at
+    ).filter(LLMEvaluationTask.id == task_id).first()
+    if not task:
+        return
+
+    groups = []
+    aggregates = get_task_score_aggregates(db, task_id)
+    overall = aggregates.get(ALL_QUESTION_TYPES)
+    groups.append((GROUP_OVERALL, ALL_QUESTION_TYPES,
+                   overall.score_count if overall else 0, overall.score_sum if overall else Decimal(0)))
+    for question_type, row in aggregates.items():
+        if question_type != ALL_QUESTION_TYPES:
+            groups.append((GROUP_QUESTION_TYPE, question_type, row.score_count, row.score_sum))
+
+    # 与评分汇总口径一致：每个答案先取有效评测的平均分
+    answer_scores = db.query(
+        LLMAnswer.std_question_id, func.avg(Evaluation.score).label("score")
+    ).join(
+        Evaluation, Evaluation.llm_answer_id == LLMAnswer.id
+    ).filter(
+        LLMAnswer.task_id == task_id,
+        Evaluation.is_valid == True,
+        Evaluation.score.isnot(None)
+    ).group_by(LLMAnswer.id, LLMAnswer.std_question_id).subquery()
+    tag_rows = db.query(
+        std_question_tag_association.c.tag_label, func.count(), func.sum(answer_scores.c.score)
+    ).select_from(answer_scores).join(
+        std_question_tag_association, std_question_tag_association.c.std_question_id == answer_scores.c.std_question_id
+    ).group_by(std_question_tag_association.c.tag_label).all()
+    for tag_label, score_count, score_sum in tag_rows:
+        groups.append((GROUP_TAG, tag_label, score_count, Decimal(str(score_sum or 0))))
+
+    db.query(ModelLeaderboardEntry).filter(ModelLeaderboardEntry.task_id == task_id).delete(synchronize_session=False)
+    now = datetime.now()
+    db.add_all([
+        ModelLeaderboardEntry(
+            task_id=task.id,
+            dataset_id=task.dataset_id,
+            dataset_version=task.dataset_version,
+            model_id=task.model_id,
+            created_by=task.created_by,
+            group_type=group_type,
+            group_key=group_key,
+            score_count=score_count,
+            score_sum=score_sum,
+            average_score=_average(score_sum, score_count),
+            completed_at=task.completed_at,
+            updated_at=now
+        )
+        for group_type, group_key, score_count, score_sum in groups
+    ])
+    db.commit()
+
+
+def _backfill_leaderboard(db: Session, dataset_id: int, dataset_version: int, user_id: int):
+    """为还没有汇总行的已完成任务（汇总表上线前完成的任务）生成汇总行"""
+    missing = db.query(LLMEvaluationTask.id).outerjoin(
+        ModelLeaderboardEntry, and_(
+            ModelLeaderboardEntry.task_id == LLMEvaluationTask.id,
+            ModelLeaderboardEntry.group_type == GROUP_OVERALL
+        )
+    ).filter(
+        LLMEvaluationTask.dataset_id == dataset_id,
+        LLMEvaluationTask.dataset_version == dataset_version,
+        LLMEvaluationTask.created_by == user_id,
+        LLMEvaluationTask.status == TaskStatus.COMPLETED,
+        ModelLeaderboardEntry.id.is_(None)
+    ).all()
+    for (task_id,) in missing:
+        refresh_task_leaderboard(db, task_id)
+
+
+def get_leaderboard(
+    db: Session,
+    dataset_id: int,
+    dataset_version: int,
+    user_id: int,
+    latest_only: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    获取数据集版本上的模型排行榜
+
+    Args:
+        latest_only: 每个模型只保留最近完成的一次任务；为False时列出全部已完成任务
+
+    Returns:
+        按总体平均分降序排列的条目，每个条目包含总体、按问题类型和按标签的分数
+    """
+    _backfill_leaderboard(db, dataset_id, dataset_version, user_id)
+
+    rows = db.query(
+        ModelLeaderboardEntry, LLMEvaluationTask.name, LLM.name, LLM.display_name
+    ).join(
+        LLMEvaluationTask, LLMEvaluationTask.id == ModelLeaderboardEntry.task_id
+    ).outerjoin(
+        LLM, LLM.id == ModelLeaderboardEntry.model_id
+    ).filter(
+        ModelLeaderboardEntry.dataset_id == dataset_id,
+        ModelLeaderboardEntry.dataset_version == dataset_version,
+        ModelLeaderboardEntry.created_by == user_id
+    ).all()
+
+    entries: Dict[int, Dict[str, Any]] = {}
+    for row, task_name, model_name, model_display_name in rows:
+        entry = entries.get(row.task_id)
+        if entry is None:
+            entry = entries[row.task_id] = {
+                "task_id": row.task_id,
+                "task_name": task_name,
+                "model_id": row.model_id,
+                "model_name": model_name,
+                "model_display_name": model_display_name,
+                "completed_at": row.completed_at,
+                "score_count": 0,
+                "average_score": None,
+                "by_question_type": {},
+                "by_tag": {}
+            }
+        group = {"score_count": row.score_count, "average_score": row.average_score}
+        if row.group_type == GROUP_OVERALL:
+            entry.update(group)
+        elif row.group_type == GROUP_QUESTION_TYPE:
+            entry["by_question_type"][row.group_key] = group
+        else:
+            entry["by_tag"][row.group_key] = group
+
+    results = list(entries.values())
+    if latest_only:
+        latest: Dict[Optional[int], Dict[str, Any]] = {}
+        for entry in results:
+            current = latest.get(entry["model_id"])
+            if current is None or (entry["completed_at"] or datetime.min, entry["task_id"]) > \
+                    (current["completed_at"] or datetime.min, current["task_id"]):
+                latest[entry["model_id"]] = entry
+        results = list(latest.values())
+
+    results.sort(key=lambda e: (e["average_score"] is None, -(e["average_score"] or 0), e["task_id"]))
+    for rank, entry in enumerate(results, 1):
+        entry["rank"] = rank
+    return results
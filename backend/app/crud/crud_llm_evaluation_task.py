@@ -1,11 +1,13 @@
 """
 CRUD operations for LLM evaluation tasks
 """
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, desc, func
+from sqlalchemy import and_, desc, func, case
 from typing import List, Optional, Dict, Any
 import hashlib
 import logging
+import uuid
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 
@@ -13,7 +15,14 @@ from ..models.llm_evaluation_task import LLMEvaluationTask, TaskStatus
 from ..models.llm_answer import LLMAnswer
 from ..models.dataset import Dataset
 from ..models.std_question import StdQuestion
-from ..models.evaluation import Evaluation
+from ..models.evaluation import Evaluation, EvaluatorType
+from ..models.task_progress_snapshot import TaskProgressSnapshot
+from .crud_task_score_aggregate import (
+    apply_evaluation_score_changes, get_task_score_aggregates, summarize_aggregate
+)
+from .crud_leaderboard import refresh_task_leaderboard
+from ..models.task_score_aggregate import ALL_QUESTION_TYPES
+from ..config.llm_config import DEFAULT_CONCURRENCY
 from ..schemas.llm_evaluation_task import (
     LLMEvaluationTaskCreate, LLMEvaluationTaskUpdate,
     ModelConfigRequest, ManualEvaluationTaskCreate
@@ -27,19 +36,22 @@ def hash_api_key(api_key: str) -> str:
     return hashlib.sha256(api_key.encode()).hexdigest()
 
 
-def create_llm_evaluation_task(
-    db: Session, 
-    task_data: LLMEvaluationTaskCreate, 
-    user_id: int
-) -> LLMEvaluationTask:
-    """创建LLM评测任务"""
-    # 获取数据集的所有标准问题，使用复合主键
-    std_questions = db.query(StdQuestion).filter(
+def _count_task_questions(db: Session, task_data: LLMEvaluationTaskCreate) -> int:
+    """任务数据集版本中的有效问题数"""
+    return db.query(func.count(StdQuestion.id)).filter(
         StdQuestion.dataset_id == task_data.dataset_id,
         StdQuestion.current_version_id == task_data.dataset_version,  # 使用dataset_version
         StdQuestion.is_valid == True
-    ).all()
-    total_questions = len(std_questions)
+    ).scalar() or 0
+
+
+def _new_llm_evaluation_task(
+    task_data: LLMEvaluationTaskCreate,
+    user_id: int,
+    total_questions: int,
+    fanout_group: Optional[str] = None
+) -> LLMEvaluationTask:
+    """根据创建数据构造任务对象（不添加到会话）"""
     # 处理API密钥 - 临时直接存储，实际应该使用可逆加密
     api_key_hash = None
     if task_data.api_key:
@@ -63,6 +75,12 @@ def create_llm_evaluation_task(
         max_tokens=task_data.max_tokens,
         top_k=task_data.top_k,        
         enable_reasoning=task_data.enable_reasoning,
+        concurrency=task_data.concurrency or DEFAULT_CONCURRENCY,
+        use_cache=task_data.use_cache if task_data.use_cache is not None else True,
+        execution_mode=task_data.execution_mode or "interactive",
+        enable_streaming=task_data.enable_streaming or False,
+        samples_per_question=task_data.samples_per_question or 1,
+        fanout_group=fanout_group,
         evaluation_prompt=task_data.evaluation_prompt,
         status=TaskStatus.CONFIG_PARAMS,
         total_questions=total_questions,
@@ -70,6 +88,16 @@ def create_llm_evaluation_task(
         completed_questions=0,
         failed_questions=0
     )
+    return task
+
+
+def create_llm_evaluation_task(
+    db: Session, 
+    task_data: LLMEvaluationTaskCreate, 
+    user_id: int
+) -> LLMEvaluationTask:
+    """创建LLM评测任务"""
+    task = _new_llm_evaluation_task(task_data, user_id, _count_task_questions(db, task_data))
     
     logger.info(f"创建LLMEvaluationTask对象成功，准备添加到数据库")
     db.add(task)
@@ -95,6 +123,35 @@ def create_llm_evaluation_task(
     return task
 
 
+def create_fanout_evaluation_tasks(
+    db: Session,
+    tasks_data: List[LLMEvaluationTaskCreate],
+    user_id: int
+) -> List[LLMEvaluationTask]:
+    """
+    为同一数据集的多个模型创建扇出任务（共享同一个fanout_group），在一个事务中提交
+
+    Args:
+        tasks_data: 每个模型一份创建数据，数据集和版本相同
+    """
+    fanout_group = str(uuid.uuid4())
+    total_questions = _count_task_questions(db, tasks_data[0])
+    tasks = [_new_llm_evaluation_task(task_data, user_id, total_questions, fanout_group) for task_data in tasks_data]
+    db.add_all(tasks)
+    db.commit()
+    for task in tasks:
+        db.refresh(task)
+    logger.info(f"扇出分组 {fanout_group}: 创建 {len(tasks)} 个任务")
+    return tasks
+
+
+def get_fanout_group_tasks(db: Session, fanout_group: str) -> List[LLMEvaluationTask]:
+    """获取扇出分组中的所有任务（按ID排序）"""
+    return db.query(LLMEvaluationTask).options(
+        joinedload(LLMEvaluationTask.model)
+    ).filter(LLMEvaluationTask.fanout_group == fanout_group).order_by(LLMEvaluationTask.id).all()
+
+
 def get_llm_evaluation_task(db: Session, task_id: int) -> Optional[LLMEvaluationTask]:
     """获取LLM评测任务"""    
     return db.query(LLMEvaluationTask).options(
@@ -229,82 +286,245 @@ def cancel_llm_evaluation_task(db: Session, task_id: int, user_id: int) -> Optio
         return None
     task.status = TaskStatus.CANCELLED
     task.completed_at = datetime.now(timezone.utc)
-    
+
     db.commit()
     db.refresh(task)
     return task
 
 
-def get_task_progress(db: Session, task_id: int) -> Dict[str, Any]:
-    """获取任务进度信息"""
-    task = db.query(LLMEvaluationTask).filter(LLMEvaluationTask.id == task_id).first()
-    if not task:
-        return {}
-      # 计算预计剩余时间
-    estimated_remaining_time = None
-    questions_per_minute = None
-    if task.status in [TaskStatus.GENERATING_ANSWERS, TaskStatus.EVALUATING_ANSWERS] and task.started_at:
-        elapsed_time = (datetime.now() - task.started_at).total_seconds()
-        if elapsed_time > 0 and task.completed_questions > 0:
-            questions_per_minute = (task.completed_questions / elapsed_time) * 60
-            remaining_questions = task.total_questions - task.completed_questions
-            if questions_per_minute > 0:
-                estimated_remaining_time = int(remaining_questions / questions_per_minute * 60)
+def get_interrupted_llm_evaluation_tasks(db: Session) -> List[LLMEvaluationTask]:
+    """获取处于生成答案或评测阶段的任务（服务重启时这些任务已被中断）"""
+    return db.query(LLMEvaluationTask).filter(
+        LLMEvaluationTask.status.in_([TaskStatus.GENERATING_ANSWERS, TaskStatus.EVALUATING_ANSWERS])
+    ).order_by(LLMEvaluationTask.id).all()
+
+
+def get_task_progress(db: Session, task_id: int) -> Optional[Dict[str, Any]]:
+    """
+    获取任务进度信息
+
+    计数、速率、预计剩余时间和最新内容都来自worker写入的进度快照，
+    一次按主键的查询即可返回；没有快照的旧任务按索引取最新一条答案和评测。
+    """
+    row = db.query(
+        LLMEvaluationTask.id, LLMEvaluationTask.created_by, LLMEvaluationTask.status,
+        LLMEvaluationTask.progress, LLMEvaluationTask.total_questions,
+        LLMEvaluationTask.completed_questions, LLMEvaluationTask.failed_questions,
+        TaskProgressSnapshot
+    ).outerjoin(
+        TaskProgressSnapshot, TaskProgressSnapshot.task_id == LLMEvaluationTask.id
+    ).filter(LLMEvaluationTask.id == task_id).first()
+    if not row:
+        return None
+
+    snapshot = row.TaskProgressSnapshot
+    progress = {
+        "task_id": row.id,
+        "created_by": row.created_by,
+        "status": row.status,
+        "progress": row.progress or 0,
+        "total_questions": row.total_questions or 0,
+        "completed_questions": row.completed_questions or 0,
+        "failed_questions": row.failed_questions or 0,
+        "phase": None,
+        "total_items": None,
+        "completed_items": None,
+        "failed_items": None,
+        "estimated_remaining_time": None,
+        "questions_per_minute": None,
+        "latest_content": None,
+        "latest_score": None,
+        "latest_content_type": None,
+        "inflight": [],
+        "updated_at": None,
+    }
+    if snapshot is None:
+        progress.update(_get_latest_task_content(db, task_id))
+        return progress
+
+    progress.update(
+        phase=snapshot.phase,
+        latest_content=snapshot.latest_content,
+        latest_score=snapshot.latest_score,
+        latest_content_type=snapshot.latest_content_type,
+        updated_at=snapshot.updated_at
+    )
+    # 快照属于当前阶段时才使用其中的计数、速率和正在执行的请求；阶段结束后以任务表为准
+    if row.status.value == snapshot.phase:
+        progress.update(
+            progress=snapshot.progress,
+            total_items=snapshot.total_items,
+            completed_items=snapshot.completed_items,
+            failed_items=snapshot.failed_items,
+            questions_per_minute=snapshot.questions_per_minute,
+            estimated_remaining_time=snapshot.estimated_remaining_time,
+            inflight=snapshot.inflight or []
+        )
+    return progress
+
+
+def _get_latest_task_content(db: Session, task_id: int) -> Dict[str, Any]:
+    """没有进度快照时取最新的评测或答案（按ID倒序取一条，走 (task_id, id) 索引）"""
+    latest_evaluation = db.query(Evaluation.score, Evaluation.reasoning).join(
+        LLMAnswer, LLMAnswer.id == Evaluation.llm_answer_id
+    ).filter(LLMAnswer.task_id == task_id).order_by(Evaluation.id.desc()).first()
+    if latest_evaluation:
+        reasoning = latest_evaluation.reasoning or "无评测理由"
+        if len(reasoning) > 150:
+            reasoning = reasoning[:150] + "..."
+        return {
+            "latest_content": f"评分: {latest_evaluation.score}/100\n评测内容: {reasoning}",
+            "latest_score": latest_evaluation.score,
+            "latest_content_type": "evaluation"
+        }
+
+    latest_answer = db.query(LLMAnswer.answer).filter(
+        LLMAnswer.task_id == task_id
+    ).order_by(LLMAnswer.id.desc()).first()
+    if latest_answer and latest_answer.answer:
+        answer = latest_answer.answer
+        return {
+            "latest_content": answer[:200] + "..." if len(answer) > 200 else answer,
+            "latest_content_type": "answer"
+        }
+    return {}
+
+
+def filter_task_answers(
+    db: Session,
+    task_id: int,
+    after_id: Optional[int] = None,
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None,
+    evaluator_type: Optional[EvaluatorType] = None,
+    question_type: Optional[str] = None,
+    unevaluated: bool = False
+):
+    """
+    构建任务答案的筛选查询，按答案ID升序，配合after_id做keyset分页
     
-    # 根据任务状态返回不同的进度信息
-    latest_content = None
-    latest_score = None
-    latest_content_type = "answer"  # "answer" 或 "evaluation"
+    Args:
+        after_id: 上一页最后一个答案ID，只返回ID更大的答案
+        min_score / max_score: 存在分数落在该范围内的评测（限定evaluator_type时只看该类评测）
+        evaluator_type: 存在该类型的评测
+        question_type: 问题类型（choice/text）
+        unevaluated: 只返回还没有评测的答案（限定evaluator_type时只看该类评测）
+    """
+    query = db.query(LLMAnswer).filter(LLMAnswer.task_id == task_id)
+    if after_id is not None:
+        query = query.filter(LLMAnswer.id > after_id)
+    if question_type:
+        query = query.join(StdQuestion, StdQuestion.id == LLMAnswer.std_question_id).filter(
+            StdQuestion.question_type == question_type
+        )
     
-    if task.status == TaskStatus.GENERATING_ANSWERS:
-        # 答案生成阶段：显示最新生成的答案
-        if task.llm_answers:
-            latest_llm_answer = sorted(task.llm_answers, key=lambda x: x.answered_at, reverse=True)[0]
-            latest_content = latest_llm_answer.answer[:200] + "..." if len(latest_llm_answer.answer) > 200 else latest_llm_answer.answer
-            latest_content_type = "answer"
-            
-    elif task.status == TaskStatus.EVALUATING_ANSWERS:
-        # 评测阶段：显示最新的评测结果
-        if task.llm_answers:
-            # 查找最新有评测的答案
-            answers_with_evaluations = []
-            for answer in task.llm_answers:
-                if answer.evaluations:
-                    latest_eval = sorted(answer.evaluations, key=lambda x: x.evaluation_time, reverse=True)[0]
-                    answers_with_evaluations.append((answer, latest_eval))
-            
-            if answers_with_evaluations:
-                # 按评测时间排序，获取最新的评测
-                latest_answer, latest_evaluation = sorted(answers_with_evaluations, 
-                                                        key=lambda x: x[1].evaluation_time, reverse=True)[0]
-                latest_content = f"评分: {latest_evaluation.score}/100\n评测内容: {latest_evaluation.reasoning[:150]}..." if latest_evaluation.reasoning and len(latest_evaluation.reasoning) > 150 else f"评分: {latest_evaluation.score}/100\n评测内容: {latest_evaluation.reasoning or '无评测理由'}"
-                latest_score = latest_evaluation.score
-                latest_content_type = "evaluation"
-            else:
-                # 如果还没有评测结果，显示最新答案
-                latest_llm_answer = sorted(task.llm_answers, key=lambda x: x.answered_at, reverse=True)[0]
-                latest_content = latest_llm_answer.answer[:200] + "..." if len(latest_llm_answer.answer) > 200 else latest_llm_answer.answer
-                latest_content_type = "answer"
+    evaluation_filters = [Evaluation.llm_answer_id == LLMAnswer.id]
+    if evaluator_type is not None:
+        evaluation_filters.append(Evaluation.evaluator_type == evaluator_type)
+    if unevaluated:
+        query = query.filter(~db.query(Evaluation.id).filter(*evaluation_filters).exists())
     else:
-        # 其他状态：显示最新答案和评分
-        if task.llm_answers:
-            latest_llm_answer = sorted(task.llm_answers, key=lambda x: x.answered_at, reverse=True)[0]
-            latest_content = latest_llm_answer.answer[:200] + "..." if len(latest_llm_answer.answer) > 200 else latest_llm_answer.answer
-            
-            # 获取最新评分
-            if latest_llm_answer.evaluations:
-                latest_evaluation = sorted(latest_llm_answer.evaluations, key=lambda x: x.evaluation_time, reverse=True)[0]
-                latest_score = latest_evaluation.score
+        if min_score is not None:
+            evaluation_filters.append(Evaluation.score >= min_score)
+        if max_score is not None:
+            evaluation_filters.append(Evaluation.score <= max_score)
+        if len(evaluation_filters) > 1:
+            query = query.filter(db.query(Evaluation.id).filter(*evaluation_filters).exists())
+    return query.order_by(LLMAnswer.id)
+
+
+def _percentile(sorted_values: List[int], percent: float) -> Optional[int]:
+    """最近秩法计算百分位数，sorted_values需已升序排列"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _latency_summary(db: Session, column, *filters) -> Dict[str, Any]:
+    """统计某个耗时列的分布"""
+    values = [v for (v,) in db.query(column).filter(column.isnot(None), *filters).order_by(column).all()]
+    return {
+        "count": len(values),
+        "p50": _percentile(values, 50),
+        "p95": _percentile(values, 95),
+        "p99": _percentile(values, 99),
+        "max": values[-1] if values else None,
+        "avg": round(sum(values) / len(values), 1) if values else None
+    }
+
+
+def get_task_metrics(db: Session, task_id: int) -> Dict[str, Any]:
+    """汇总任务的延迟分布、token用量、成本、重试次数和失败原因"""
+    answer_filter = LLMAnswer.task_id == task_id
+    answers = db.query(
+        func.count(LLMAnswer.id),
+        func.sum(func.coalesce(LLMAnswer.prompt_tokens, 0)),
+        func.sum(func.coalesce(LLMAnswer.completion_tokens, 0)),
+        func.sum(func.coalesce(LLMAnswer.cost, 0)),
+        func.sum(LLMAnswer.retries)
+    ).filter(answer_filter).one()
+    failure_reasons = dict(
+        db.query(LLMAnswer.failure_reason, func.count(LLMAnswer.id))
+        .filter(answer_filter, LLMAnswer.is_valid == False)
+        .group_by(LLMAnswer.failure_reason).all()
+    )
+    
+    evaluation_filter = and_(
+        Evaluation.evaluator_type == EvaluatorType.LLM,
+        Evaluation.llm_answer_id.in_(db.query(LLMAnswer.id).filter(answer_filter))
+    )
+    evaluations = db.query(
+        func.count(Evaluation.id),
+        func.sum(func.coalesce(Evaluation.prompt_tokens, 0)),
+        func.sum(func.coalesce(Evaluation.completion_tokens, 0)),
+        func.sum(func.coalesce(Evaluation.cost, 0)),
+        func.sum(Evaluation.retries)
+    ).filter(evaluation_filter).one()
+    
+    def usage(row) -> Dict[str, Any]:
+        count, prompt_tokens, completion_tokens, cost, retries = row
+        return {
+            "count": count,
+            "prompt_tokens": int(prompt_tokens or 0),
+            "completion_tokens": int(completion_tokens or 0),
+            "cost": float(cost or 0),
+            "retries": int(retries or 0)
+        }
+    
+    generation = usage(answers)
+    generation.update(
+        failed=sum(failure_reasons.values()),
+        failure_reasons={reason or "unknown": count for reason, count in failure_reasons.items()},
+        latency_ms=_latency_summary(db, LLMAnswer.response_time_ms, answer_filter),
+        first_token_ms=_latency_summary(db, LLMAnswer.first_token_ms, answer_filter)
+    )
+    evaluation = usage(evaluations)
+    evaluation["latency_ms"] = _latency_summary(db, Evaluation.response_time_ms, evaluation_filter)
     
     return {
-        "estimated_remaining_time": estimated_remaining_time,
-        "questions_per_minute": questions_per_minute,
-        "latest_content": latest_content,
-        "latest_score": latest_score,
-        "latest_content_type": latest_content_type,
+        "task_id": task_id,
+        "generation": generation,
+        "evaluation": evaluation,
+        "total_prompt_tokens": generation["prompt_tokens"] + evaluation["prompt_tokens"],
+        "total_completion_tokens": generation["completion_tokens"] + evaluation["completion_tokens"],
+        "total_cost": generation["cost"] + evaluation["cost"],
+        "total_retries": generation["retries"] + evaluation["retries"]
     }
 
 
+def save_task_progress_snapshot(db: Session, task_id: int, values: Dict[str, Any]):
+    """覆盖写入任务的进度快照"""
+    db.merge(TaskProgressSnapshot(task_id=task_id, **values))
+    try:
+        db.commit()
+    except IntegrityError:
+        # 首次写入时与另一次写入同时插入，快照行已存在，改为更新
+        db.rollback()
+        db.merge(TaskProgressSnapshot(task_id=task_id, **values))
+        db.commit()
+
+
 def create_manual_evaluation_task(
     db: Session,
     task_data: ManualEvaluationTaskCreate,
@@ -364,6 +584,7 @@ def create_manual_evaluation_task(
         db.flush()
         
         # 创建LLM答案和评测记录
+        score_changes = []
         for entry in task_data.entries:
             # 创建LLM答案记录
             llm_answer = LLMAnswer(
@@ -387,6 +608,8 @@ def create_manual_evaluation_task(
                 evaluation_prompt="手动录入评测结果"
             )
             db.add(evaluation)
+            score_changes.append((llm_answer.id, None, entry.score))
+        apply_evaluation_score_changes(db, score_changes)
         
         # 生成结果摘要
         result_summary = {
@@ -401,6 +624,7 @@ def create_manual_evaluation_task(
         task.result_summary = result_summary
         
         db.commit()
+        refresh_task_leaderboard(db, task.id)
         logger.info(f"Manual evaluation task created successfully: {task.id}")
         return task
         
@@ -432,10 +656,43 @@ def _calculate_score_distribution(scores: List[float]) -> Dict[str, int]:
     return distribution
 
 
-def calculate_and_update_task_score(db: Session, task_id: int) -> Optional[float]:
-    """计算并更新任务的总体得分（所有evaluation的平均分）"""
-    from decimal import Decimal
+def get_task_score_stats(db: Session, task_id: int) -> Dict[str, Any]:
+    """
+    任务得分统计：总分、平均分和已评分答案数直接读取评分汇总表，答案计数在SQL中聚合
+    
+    总分为各答案平均分之和，total_score / evaluated_answers 等于 average_score
+    
+    Returns:
+        包含total_score、average_score、evaluated_answers、total_answers、valid_answers的字典
+    """
+    overall = summarize_aggregate(get_task_score_aggregates(db, task_id).get(ALL_QUESTION_TYPES))
+    
+    total_answers, valid_answers = db.query(
+        func.count(LLMAnswer.id),
+        func.sum(case((LLMAnswer.is_valid == True, 1), else_=0))
+    ).filter(LLMAnswer.task_id == task_id).one()
     
+    return {
+        "total_score": overall["total_score"],
+        "average_score": overall["average_score"] or 0,
+        "evaluated_answers": overall["count"],
+        "total_answers": total_answers,
+        "valid_answers": int(valid_answers or 0)
+    }
+
+
+def get_task_score_distribution(db: Session, task_id: int) -> Dict[str, Dict[str, Any]]:
+    """按问题类型（及all总计）返回评分数量、平均分、标准差和分数分布"""
+    aggregates = get_task_score_aggregates(db, task_id)
+    result = {ALL_QUESTION_TYPES: summarize_aggregate(aggregates.get(ALL_QUESTION_TYPES))}
+    for question_type, row in aggregates.items():
+        if question_type != ALL_QUESTION_TYPES:
+            result[question_type] = summarize_aggregate(row)
+    return result
+
+
+def calculate_and_update_task_score(db: Session, task_id: int) -> Optional[float]:
+    """计算并更新任务的总体得分（各答案平均分的平均值）"""
     logger.info(f"Task {task_id}: 开始计算任务总分")
     
     try:
@@ -445,27 +702,8 @@ def calculate_and_update_task_score(db: Session, task_id: int) -> Optional[float
             logger.error(f"Task {task_id}: 任务不存在")
             return None
         
-        # 获取所有evaluation结果
-        llm_answers = db.query(LLMAnswer).filter(LLMAnswer.task_id == task_id).all()
-        
-        total_score = 0
-        valid_scores = 0
-        
-        for answer in llm_answers:
-            evaluations = db.query(Evaluation).filter(
-                Evaluation.llm_answer_id == answer.id,
-                Evaluation.score.isnot(None)
-            ).all()
-            
-            # 计算该答案的平均分
-            answer_scores = [float(e.score) for e in evaluations if e.score is not None]
-            if answer_scores:
-                avg_score = sum(answer_scores) / len(answer_scores)
-                total_score += avg_score
-                valid_scores += 1
-        
-        # 计算总体平均分
-        overall_average = total_score / valid_scores if valid_scores > 0 else 0
+        overall = summarize_aggregate(get_task_score_aggregates(db, task_id).get(ALL_QUESTION_TYPES))
+        overall_average = overall["average_score"] or 0
         
         # 更新任务得分
         task.score = Decimal(str(round(overall_average, 2)))
@@ -508,6 +746,8 @@ def update_task_when_evaluation_completed(db: Session, task_id: int):
                 task.completed_at = datetime.now(timezone.utc)
                 db.commit()
                 logger.info(f"Task {task_id}: 任务状态已更新为COMPLETED")
+            # 已完成任务的评分变化后同样刷新排行榜
+            refresh_task_leaderboard(db, task_id)
                 
     except Exception as e:
         logger.error(f"Task {task_id}: 更新任务状态时出错: {str(e)}")
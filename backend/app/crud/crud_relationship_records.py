@@ -11,6 +11,8 @@ from app.schemas.relationship_records import (
     StdAnswerExpertAnswerRecordCreate,
     StdQuestionRawQuestionRecordCreate
 )
+from app.models.std_question import StdQuestion
+from app.crud.crud_dataset_version_stats import invalidate_dataset_version_stats
 
 # StdAnswer - RawAnswer 关系操作
 def create_std_answer_raw_answer_record(
@@ -226,6 +228,13 @@ def create_multiple_std_question_raw_question_records(
 
 # ============ Question Tag Relationship Operations ============
 
+def _invalidate_question_dataset_stats(db: Session, std_question_id: int):
+    """原生SQL修改标签关联不经过ORM事件，需自行删除问题所属数据集的统计（标签分布）"""
+    dataset_id = db.query(StdQuestion.dataset_id).filter(StdQuestion.id == std_question_id).scalar()
+    if dataset_id is not None:
+        invalidate_dataset_version_stats(db, {dataset_id})
+
+
 def create_question_tag_record(db: Session, std_question_id: int, tag_label: str) -> bool:
     """创建标准问题与标签的关联关系"""
     try:
@@ -234,6 +243,7 @@ def create_question_tag_record(db: Session, std_question_id: int, tag_label: str
             text("INSERT IGNORE INTO QuestionTagRecords (std_question_id, tag_label) VALUES (:std_question_id, :tag_label)"),
             {"std_question_id": std_question_id, "tag_label": tag_label}
         )
+        _invalidate_question_dataset_stats(db, std_question_id)
         db.commit()
         return True
     except Exception as e:
@@ -249,6 +259,8 @@ def delete_question_tag_record(db: Session, std_question_id: int, tag_label: str
             text("DELETE FROM QuestionTagRecords WHERE std_question_id = :std_question_id AND tag_label = :tag_label"),
             {"std_question_id": std_question_id, "tag_label": tag_label}
         )
+        if result.rowcount > 0:
+            _invalidate_question_dataset_stats(db, std_question_id)
         db.commit()
         return result.rowcount > 0
     except Exception as e:
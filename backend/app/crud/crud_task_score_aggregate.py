@@ -0,0 +1,299 @@
+"""
+CRUD operations for TaskScoreAggregate - 评分汇总的增量维护与读取
+评测写入、改分、失效时在同一事务中调用apply_evaluation_score_changes，读取时直接取汇总行
+
+与原任务得分的口径一致：每个答案先取其有效评测的平均分（同时有人工和自动评测的答案只计一次），
+汇总行累计的是答案数和答案平均分之和
+"""
+import math
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models.task_score_aggregate import TaskScoreAggregate, ALL_QUESTION_TYPES, HISTOGRAM_BUCKETS
+from ..models.llm_answer import LLMAnswer
+from ..models.std_question import StdQuestion
+from ..models.evaluation import Evaluation
+from ..models.llm_evaluation_task import LLMEvaluationTask
+
+# (llm_answer_id, 原分数, 新分数)；分数为None表示该评测不计入（不存在、无分数或已失效）
+ScoreChange = Tuple[int, Optional[float], Optional[float]]
+
+# 答案平均分保留的精度，与汇总列的小数位数一致，增量累加和重建使用同一舍入
+_SCORE_QUANTUM = Decimal("0.0001")
+
+# 多次采样指标字段，不随评分增量更新，重建汇总行时保留
+SAMPLE_METRIC_FIELDS = ("question_count", "samples_per_question", "pass_at_1", "pass_at_k", "majority_vote_accuracy")
+
+
+def _bucket(score: Decimal) -> int:
+    return min(HISTOGRAM_BUCKETS - 1, max(0, int(score // 10)))
+
+
+def _answer_mean(score_sum: Decimal, count: int) -> Optional[Decimal]:
+    """答案的平均分，没有有效评分时为None"""
+    if not count:
+        return None
+    return (Decimal(score_sum) / count).quantize(_SCORE_QUANTUM)
+
+
+def _remove_score(scores: List[Decimal], score: Decimal):
+    """从答案的分数列表中移除一个分数（按列精度存储后可能有舍入差异，取最接近的一个）"""
+    if score in scores:
+        scores.remove(score)
+    elif scores:
+        scores.remove(min(scores, key=lambda value: abs(value - score)))
+
+
+def _get_row_for_update(db: Session, task_id: int, question_type: str) -> TaskScoreAggregate:
+    """加锁读取汇总行，不存在时创建（并发创建冲突时重新读取）"""
+    row = db.query(TaskScoreAggregate).filter(
+        TaskScoreAggregate.task_id == task_id,
+        TaskScoreAggregate.question_type == question_type
+    ).with_for_update().first()
+    if row:
+        return row
+    try:
+        with db.begin_nested():
+            row = TaskScoreAggregate(
+                task_id=task_id, question_type=question_type,
+                score_count=0, score_sum=Decimal(0), score_sum_sq=Decimal(0),
+                histogram=[0] * HISTOGRAM_BUCKETS
+            )
+            db.add(row)
+        return row
+    except IntegrityError:
+        return db.query(TaskScoreAggregate).filter(
+            TaskScoreAggregate.task_id == task_id,
+            TaskScoreAggregate.question_type == question_type
+        ).with_for_update().one()
+
+
+def _has_aggregate_rows(db: Session, task_id: int) -> bool:
+    return db.query(TaskScoreAggregate.task_id).filter(TaskScoreAggregate.task_id == task_id).first() is not None
+
+
+def _backfill_if_missing(db: Session, task_id: int) -> bool:
+    """
+    任务还没有汇总行时（评测早于汇总表写入，或任务的第一次评分变化）根据评测表重建（不提交）
+
+    Returns:
+        是否已重建；重建结果已包含本事务中的变化，调用方不再累加
+    """
+    if _has_aggregate_rows(db, task_id):
+        return False
+    # 加锁任务行，并发的首次写入依次执行，后到的看到已有汇总行后直接累加
+    db.query(LLMEvaluationTask.id).filter(LLMEvaluationTask.id == task_id).with_for_update().first()
+    if _has_aggregate_rows(db, task_id):
+        return False
+    db.flush()
+    _rebuild_rows(db, task_id)
+    return True
+
+
+def apply_score_changes(db: Session, task_id: int, changes: Iterable[Tuple[str, Optional[Decimal], Optional[Decimal]]]):
+    """
+    把一组答案平均分的变化累加到任务的汇总行（不提交，由调用方在同一事务中提交）
+
+    调用方需先在会话中完成评测的写入或修改：任务还没有汇总行时按评测表重建，重建结果已包含这些变化。
+
+    Args:
+        changes: (问题类型, 答案原平均分, 答案新平均分) 列表；为None表示该答案不计入
+    """
+    if _backfill_if_missing(db, task_id):
+        return
+    deltas: Dict[str, Dict[str, Any]] = defaultdict(
+        lambda: {"count": 0, "sum": Decimal(0), "sum_sq": Decimal(0), "histogram": [0] * HISTOGRAM_BUCKETS}
+    )
+    for question_type, old_score, new_score in changes:
+        for score, sign in ((old_score, -1), (new_score, 1)):
+            if score is None:
+                continue
+            for key in (question_type or "text", ALL_QUESTION_TYPES):
+                delta = deltas[key]
+                delta["count"] += sign
+                delta["sum"] += sign * score
+                delta["sum_sq"] += sign * (score * score).quantize(_SCORE_QUANTUM)
+                delta["histogram"][_bucket(score)] += sign
+
+    # 固定加锁顺序，避免并发事务死锁
+    for question_type in sorted(deltas):
+        delta = deltas[question_type]
+        if not delta["count"] and not delta["sum"] and not any(delta["histogram"]):
+            continue
+        row = _get_row_for_update(db, task_id, question_type)
+        histogram = list(row.histogram or [0] * HISTOGRAM_BUCKETS)
+        row.score_count = (row.score_count or 0) + delta["count"]
+        row.score_sum = Decimal(row.score_sum or 0) + delta["sum"]
+        row.score_sum_sq = Decimal(row.score_sum_sq or 0) + delta["sum_sq"]
+        row.histogram = [a + b for a, b in zip(histogram, delta["histogram"])]
+        row.updated_at = datetime.now()
+
+
+def apply_evaluation_score_changes(db: Session, changes: Iterable[ScoreChange]):
+    """
+    把评测分数的变化换算为答案平均分的变化后更新汇总行（不提交）
+
+    答案的新平均分按会话中已写入的评测计算，原平均分由新的分数列表撤销本次变化得到。
+    """
+    changes = [c for c in changes if c[1] != c[2]]
+    if not changes:
+        return
+    db.flush()
+    answer_ids = {answer_id for answer_id, _, _ in changes}
+    owners = {
+        answer_id: (task_id, question_type)
+        for answer_id, task_id, question_type in db.query(
+            LLMAnswer.id, LLMAnswer.task_id, StdQuestion.question_type
+        ).outerjoin(StdQuestion, StdQuestion.id == LLMAnswer.std_question_id).filter(
+            LLMAnswer.id.in_(answer_ids)
+        )
+    }
+    current_scores: Dict[int, List[Decimal]] = defaultdict(list)
+    for answer_id, score in db.query(Evaluation.llm_answer_id, Evaluation.score).filter(
+        Evaluation.llm_answer_id.in_(answer_ids),
+        Evaluation.is_valid == True,
+        Evaluation.score.isnot(None)
+    ):
+        current_scores[answer_id].append(Decimal(score))
+    previous_scores = {answer_id: list(current_scores[answer_id]) for answer_id in answer_ids}
+    for answer_id, old_score, new_score in changes:
+        if new_score is not None:
+            _remove_score(previous_scores[answer_id], Decimal(str(new_score)))
+        if old_score is not None:
+            previous_scores[answer_id].append(Decimal(str(old_score)))
+
+    by_task: Dict[int, List[Tuple[str, Optional[Decimal], Optional[Decimal]]]] = defaultdict(list)
+    for answer_id in sorted(answer_ids):
+        task_id, question_type = owners.get(answer_id, (None, None))
+        if task_id is None:
+            continue
+        previous, current = previous_scores[answer_id], current_scores[answer_id]
+        old_mean, new_mean = _answer_mean(sum(previous, Decimal(0)), len(previous)), _answer_mean(sum(current, Decimal(0)), len(current))
+        if old_mean != new_mean:
+            by_task[task_id].append((question_type, old_mean, new_mean))
+    for task_id in sorted(by_task):
+        apply_score_changes(db, task_id, by_task[task_id])
+
+
+def counted_score(evaluation: Evaluation) -> Optional[float]:
+    """评测当前计入汇总的分数，失效或无分数时为None"""
+    if evaluation is None or not evaluation.is_valid or evaluation.score is None:
+        return None
+    return evaluation.score
+
+
+def rebuild_task_score_aggregate(db: Session, task_id: int) -> List[TaskScoreAggregate]:
+    """根据评测表重新计算任务的汇总行（用于已有数据的回填和校正），并提交"""
+    rows = _rebuild_rows(db, task_id)
+    db.commit()
+    return rows
+
+
+def _rebuild_rows(db: Session, task_id: int) -> List[TaskScoreAggregate]:
+    """根据评测表重新计算任务的汇总行（不提交）"""
+    rows = db.query(
+        StdQuestion.question_type, func.sum(Evaluation.score), func.count(Evaluation.id)
+    ).join(LLMAnswer, LLMAnswer.id == Evaluation.llm_answer_id).outerjoin(
+        StdQuestion, StdQuestion.id == LLMAnswer.std_question_id
+    ).filter(
+        LLMAnswer.task_id == task_id,
+        Evaluation.is_valid == True,
+        Evaluation.score.isnot(None)
+    ).group_by(LLMAnswer.id, StdQuestion.question_type).all()
+
+    sample_metrics = {
+        row.question_type: {field: getattr(row, field) for field in SAMPLE_METRIC_FIELDS}
+        for row in db.query(TaskScoreAggregate).filter(TaskScoreAggregate.task_id == task_id)
+    }
+    db.query(TaskScoreAggregate).filter(TaskScoreAggregate.task_id == task_id).delete(synchronize_session=False)
+    totals: Dict[str, TaskScoreAggregate] = {}
+    for question_type, score_sum, count in rows:
+        score = _answer_mean(Decimal(str(score_sum)), count)
+        for key in (question_type or "text", ALL_QUESTION_TYPES):
+            row = totals.get(key)
+            if row is None:
+                row = totals[key] = TaskScoreAggregate(
+                    task_id=task_id, question_type=key,
+                    score_count=0, score_sum=Decimal(0), score_sum_sq=Decimal(0),
+                    histogram=[0] * HISTOGRAM_BUCKETS
+                )
+            row.score_count += 1
+            row.score_sum += score
+            row.score_sum_sq += (score * score).quantize(_SCORE_QUANTUM)
+            histogram = list(row.histogram)
+            histogram[_bucket(score)] += 1
+            row.histogram = histogram
+    for key, row in totals.items():
+        for field, value in sample_metrics.get(key, {}).items():
+            setattr(row, field, value)
+    db.add_all(totals.values())
+    db.flush()
+    return list(totals.values())
+
+
+def save_sample_metrics(db: Session, task_id: int, metrics: Dict[str, Dict[str, Any]]):
+    """
+    写入多次采样指标并提交
+
+    Args:
+        metrics: 问题类型（含all）到 question_count、samples_per_question、pass_at_1、pass_at_k、majority_vote_accuracy 的映射
+    """
+    for question_type in sorted(metrics):
+        row = _get_row_for_update(db, task_id, question_type)
+        for field in SAMPLE_METRIC_FIELDS:
+            setattr(row, field, metrics[question_type].get(field))
+        row.updated_at = datetime.now()
+    db.commit()
+
+
+def get_task_score_aggregates(db: Session, task_id: int) -> Dict[str, TaskScoreAggregate]:
+    """读取任务的汇总行，按问题类型索引；还没有汇总行但已有评测的旧任务会先回填"""
+    rows = db.query(TaskScoreAggregate).filter(TaskScoreAggregate.task_id == task_id).all()
+    if not rows and db.query(Evaluation.id).join(LLMAnswer).filter(LLMAnswer.task_id == task_id).first():
+        rows = rebuild_task_score_aggregate(db, task_id)
+    return {row.question_type: row for row in rows}
+
+
+def _sample_metrics(row: Optional[TaskScoreAggregate]) -> Dict[str, Any]:
+    if row is None or row.question_count is None:
+        return {}
+    return {
+        field: float(getattr(row, field)) if isinstance(getattr(row, field), Decimal) else getattr(row, field)
+        for field in SAMPLE_METRIC_FIELDS
+    }
+
+
+def summarize_aggregate(row: Optional[TaskScoreAggregate]) -> Dict[str, Any]:
+    """把汇总行转换为计数（有评分的答案数）、平均分、标准差和分数分布（均按答案平均分）"""
+    count = row.score_count if row else 0
+    if not count:
+        return {
+            "count": 0, "total_score": 0.0, "average_score": None, "std_dev": None,
+            "histogram": [0] * HISTOGRAM_BUCKETS,
+            "distribution": {"excellent": 0, "good": 0, "fair": 0, "poor": 0}
+        }
+    total = float(row.score_sum)
+    mean = total / count
+    variance = max(0.0, float(row.score_sum_sq) / count - mean * mean)
+    histogram = list(row.histogram or [0] * HISTOGRAM_BUCKETS)
+    return {
+        "count": count,
+        "total_score": total,
+        "average_score": round(mean, 2),
+        "std_dev": round(math.sqrt(variance), 2),
+        "histogram": histogram,
+        **_sample_metrics(row),
+        # 与_calculate_score_distribution相同的分档：90-100、70-89、50-69、0-49
+        "distribution": {
+            "excellent": histogram[9],
+            "good": histogram[7] + histogram[8],
+            "fair": histogram[5] + histogram[6],
+            "poor": sum(histogram[:5])
+        }
+    }
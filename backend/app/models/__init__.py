@@ -13,4 +13,9 @@ from .evaluation import Evaluation, EvaluatorType
 from .llm import LLM
 from .llm_answer import LLMAnswer
 from .llm_evaluation_task import LLMEvaluationTask, TaskStatus
-from .relationship_records import StdQuestionRawQuestionRecord, StdAnswerExpertAnswerRecord, StdAnswerRawAnswerRecord
\ No newline at end of file
+from .relationship_records import StdQuestionRawQuestionRecord, StdAnswerExpertAnswerRecord, StdAnswerRawAnswerRecord
+from .evaluation_job import EvaluationJob, JobType, JobStatus
+from .task_progress_snapshot import TaskProgressSnapshot
+from .task_score_aggregate import TaskScoreAggregate
+from .model_leaderboard_entry import ModelLeaderboardEntry
+from .dataset_version_stats import DatasetVersionStats
@@ -0,0 +1,27 @@
+"""
+Dataset version stats model - 每个数据集版本的统计汇总，版本创建或完成时计算，
+列表、统计和下载接口直接读取，开销与数据集大小无关
+"""
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKeyConstraint, text
+
+from ..db.database import Base
+
+
+class DatasetVersionStats(Base):
+    """数据集版本统计表，每个 (数据集ID, 版本) 一行；版本内容变化时删除，下次读取时重新计算"""
+    __tablename__ = "DatasetVersionStats"
+
+    dataset_id = Column(Integer, primary_key=True)
+    version = Column(Integer, primary_key=True)
+    question_count = Column(Integer, server_default=text('0'), nullable=False)  # 有效问题数
+    choice_question_count = Column(Integer, server_default=text('0'), nullable=False)  # 选择题数
+    text_question_count = Column(Integer, server_default=text('0'), nullable=False)  # 文本题数
+    answer_count = Column(Integer, server_default=text('0'), nullable=False)  # 有效标准答案数
+    scoring_point_count = Column(Integer, server_default=text('0'), nullable=False)  # 有效得分点数
+    tag_counts = Column(JSON, nullable=True)  # 标签到问题数的映射
+    content_token = Column(String(32), nullable=True)  # 每次计算时重新生成，用于标识快照文件对应的版本内容
+    computed_at = Column(DateTime, server_default=text('CURRENT_TIMESTAMP'), nullable=False)
+
+    __table_args__ = (
+        ForeignKeyConstraint(['dataset_id', 'version'], ['Dataset.id', 'Dataset.version'], ondelete="CASCADE"),
+    )
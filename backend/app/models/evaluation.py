@@ -1,7 +1,7 @@
 """
 Evaluation model for storing LLM and user evaluations
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum as SQLEnum, DECIMAL, text
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum as SQLEnum, DECIMAL, text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -14,6 +14,12 @@ class EvaluatorType(enum.Enum):
     """评估者类型枚举"""
     USER = "user"
     LLM = "llm"
+    AUTO = "auto"  # 规则自动评分（如选择题）
+
+
+# 评测流程自动写入的评估者类型，续跑时据此判断答案是否已评测
+AUTOMATIC_EVALUATOR_TYPES = (EvaluatorType.LLM, EvaluatorType.AUTO)
+
 
 class Evaluation(Base):
     """评估表 - 对LLM回答进行评估"""
@@ -32,6 +38,18 @@ class Evaluation(Base):
     evaluation_prompt = Column(Text, nullable=True)  # 使用的评估提示词
     is_valid = Column(Boolean, server_default=text('1'), nullable=False)
     
+    # 自动评估的调用统计
+    response_time_ms = Column(Integer, nullable=True)  # 评估耗时（毫秒）
+    prompt_tokens = Column(Integer, nullable=True)  # 输入token数
+    completion_tokens = Column(Integer, nullable=True)  # 输出token数
+    cost = Column(DECIMAL(12, 6), nullable=True)  # 调用成本，命中缓存时为0
+    retries = Column(Integer, server_default=text('0'), nullable=False)  # 重试次数
+    
+    # 按答案查找某类评测（及其分数）时使用的复合索引
+    __table_args__ = (
+        Index('idx_eval_answer_type_score', 'llm_answer_id', 'evaluator_type', 'score'),
+    )
+    
     # 关系
     std_question = relationship("StdQuestion")
     llm_answer = relationship("LLMAnswer", back_populates="evaluations")
@@ -0,0 +1,54 @@
+"""
+Evaluation job queue model - 评测任务的持久化作业队列，由独立的worker进程领取执行
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum as SQLEnum, text, Index
+from sqlalchemy.orm import relationship
+import enum
+
+from ..db.database import Base
+
+
+class JobType(enum.Enum):
+    """作业类型"""
+    GENERATE = "generate"  # 生成答案
+    EVALUATE = "evaluate"  # 评测答案
+    RESUME = "resume"      # 从中断处续跑（由worker判断阶段）
+    FANOUT = "fanout"      # 多模型扇出：为同一扇出分组的所有任务生成答案，task_id为分组中的第一个任务
+
+
+class JobStatus(enum.Enum):
+    """作业状态"""
+    QUEUED = "queued"    # 等待领取
+    RUNNING = "running"  # 已被worker领取（租约有效期内）
+    DONE = "done"        # 已完成
+    FAILED = "failed"    # 多次尝试后仍失败
+
+
+class EvaluationJob(Base):
+    """评测作业表"""
+    __tablename__ = "EvaluationJob"
+
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("LLMEvaluationTask.id", ondelete="CASCADE"), nullable=False, index=True)
+    job_type = Column(SQLEnum(JobType, values_callable=lambda x: [e.value for e in x]), nullable=False)
+    status = Column(SQLEnum(JobStatus, values_callable=lambda x: [e.value for e in x]),
+                    default=JobStatus.QUEUED, nullable=False)
+    question_limit = Column(Integer, nullable=True)  # 生成答案时的问题数量限制
+    attempts = Column(Integer, server_default=text('0'), nullable=False)  # 已被领取的次数
+    lease_owner = Column(String(255), nullable=True)  # 持有租约的worker标识
+    lease_expires_at = Column(DateTime, nullable=True)  # 租约到期时间，到期未续约的作业可被其他worker重新领取
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=text('CURRENT_TIMESTAMP'))
+    finished_at = Column(DateTime, nullable=True)
+    # 作业未结束时等于task_id，结束时置空；唯一索引保证同一任务最多只有一个未结束的作业（多个NULL不冲突）
+    active_task_id = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index('idx_job_status_lease', 'status', 'lease_expires_at'),
+        Index('uq_job_active_task', 'active_task_id', unique=True),
+    )
+
+    task = relationship("LLMEvaluationTask")
+
+    def __repr__(self):
+        return f"<EvaluationJob(id={self.id}, task_id={self.task_id}, type={self.job_type}, status={self.status})>"
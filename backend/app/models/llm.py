@@ -16,6 +16,8 @@ class LLM(Base):
     top_k = Column(Integer, server_default=text('50'))
     enable_reasoning = Column(Boolean, nullable=False, server_default=text('0'))
     cost_per_1k_tokens = Column(DECIMAL(8,6), server_default=text('0.0006'))
+    requests_per_minute = Column(Integer, nullable=True)  # 每分钟请求数上限，为空使用默认值
+    tokens_per_minute = Column(Integer, nullable=True)    # 每分钟token数上限，为空使用默认值
     description = Column(Text, nullable=True)
     version = Column(String(50), nullable=True)
     affiliation = Column(String(100), nullable=True)
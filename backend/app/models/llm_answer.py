@@ -1,7 +1,7 @@
 """
 LLM Answer models for storing LLM responses and evaluations
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float, JSON, DECIMAL, text
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Float, JSON, DECIMAL, text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..db.database import Base
@@ -15,10 +15,24 @@ class LLMAnswer(Base):
     llm_id = Column(Integer, ForeignKey("LLM.id"), nullable=True, index=True)
     task_id = Column(Integer, ForeignKey("LLMEvaluationTask.id"), nullable=True, index=True)
     std_question_id = Column(Integer, ForeignKey("StdQuestion.id"), nullable=True, index=True)
+    sample_index = Column(Integer, server_default=text('0'), nullable=False)  # 同一问题的第几次采样，从0开始
     prompt_used = Column(Text, nullable=True)  # 使用的提示词
     answer = Column(Text, nullable=True)  # LLM的回答内容
     answered_at = Column(DateTime(timezone=True), server_default=text('CURRENT_TIMESTAMP'), index=True)
     is_valid = Column(Boolean, server_default=text('1'), nullable=False, index=True)
+    response_time_ms = Column(Integer, nullable=True)  # 生成总耗时（毫秒）
+    first_token_ms = Column(Integer, nullable=True)  # 首token耗时（毫秒），仅流式生成时记录
+    tokens_per_second = Column(Float, nullable=True)  # 首token之后的生成速度
+    prompt_tokens = Column(Integer, nullable=True)  # 输入token数
+    completion_tokens = Column(Integer, nullable=True)  # 输出token数
+    cost = Column(DECIMAL(12, 6), nullable=True)  # 调用成本，命中缓存时为0
+    retries = Column(Integer, server_default=text('0'), nullable=False)  # 重试次数
+    failure_reason = Column(String(100), nullable=True, index=True)  # 失败原因分类，如 timeout、rate_limited、http_500
+    
+    # 按任务分页（keyset on id）使用的复合索引
+    __table_args__ = (
+        Index('idx_la_task_id', 'task_id', 'id'),
+    )
     
     # 关系
     llm = relationship("LLM", back_populates="answers")
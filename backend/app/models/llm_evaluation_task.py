@@ -41,6 +41,8 @@ class LLMEvaluationTask(Base):
     total_questions = Column(Integer, server_default=text('0'), nullable=False)
     completed_questions = Column(Integer, server_default=text('0'), nullable=False)
     failed_questions = Column(Integer, server_default=text('0'), nullable=False)
+    cache_hits = Column(Integer, server_default=text('0'), nullable=False)  # 响应缓存命中次数
+    cache_misses = Column(Integer, server_default=text('0'), nullable=False)  # 响应缓存未命中次数
     
     # 模型配置
     model_id = Column(Integer, ForeignKey("LLM.id"), nullable=False, index=True)  # LLM模型ID    
@@ -55,6 +57,13 @@ class LLMEvaluationTask(Base):
     max_tokens = Column(Integer, server_default=text('2000'))  # 最大token数
     top_k = Column(Integer, server_default=text('50'))  # Top-K采样
     enable_reasoning = Column(Boolean, server_default=text('0'), nullable=False)  # 启用推理模式
+    concurrency = Column(Integer, server_default=text('5'), nullable=False)  # 并发请求数
+    use_cache = Column(Boolean, server_default=text('1'), nullable=False)  # 是否使用响应缓存（非确定性评测可关闭）
+    execution_mode = Column(String(20), server_default=text("'interactive'"), nullable=False)  # 执行方式：interactive / batch
+    batch_id = Column(String(255), nullable=True)  # 正在进行的批量作业ID，续跑时据此重新接管而不是重复提交
+    enable_streaming = Column(Boolean, server_default=text('0'), nullable=False)  # 流式生成回答，记录首token耗时并展示生成中的内容
+    samples_per_question = Column(Integer, server_default=text('1'), nullable=False)  # 每题采样次数，大于1时计算pass@k和多数投票准确率
+    fanout_group = Column(String(36), nullable=True, index=True)  # 多模型扇出分组：同一次请求为多个模型创建的任务共享，由一个作业统一执行
     
     # 自动评估配置
     evaluation_prompt = Column(Text, nullable=True)  # 评估prompt（兼容性保留）
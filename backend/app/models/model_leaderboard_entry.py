@@ -0,0 +1,37 @@
+"""
+Model leaderboard entry model - 已完成评测任务的得分汇总（总体、按问题类型、按标签），
+任务完成时刷新，排行榜按数据集版本直接读取，无需扫描评测表
+"""
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, DECIMAL, Index, UniqueConstraint, text
+
+from ..db.database import Base
+
+
+# 分组类型
+GROUP_OVERALL = "overall"
+GROUP_QUESTION_TYPE = "question_type"
+GROUP_TAG = "tag"
+
+
+class ModelLeaderboardEntry(Base):
+    """排行榜汇总表，每个任务每个分组一行"""
+    __tablename__ = "ModelLeaderboardEntry"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(Integer, ForeignKey("LLMEvaluationTask.id", ondelete="CASCADE"), nullable=False)
+    dataset_id = Column(Integer, nullable=False)
+    dataset_version = Column(Integer, nullable=False)
+    model_id = Column(Integer, ForeignKey("LLM.id"), nullable=True)
+    created_by = Column(Integer, ForeignKey("User.id"), nullable=False)  # 任务创建者，排行榜只展示自己的任务
+    group_type = Column(String(20), nullable=False)  # overall / question_type / tag
+    group_key = Column(String(100), nullable=False)  # overall为all，其余为问题类型或标签名
+    score_count = Column(Integer, server_default=text('0'), nullable=False)
+    score_sum = Column(DECIMAL(16, 4), server_default=text('0'), nullable=False)
+    average_score = Column(DECIMAL(5, 2), nullable=True)
+    completed_at = Column(DateTime, nullable=True)  # 任务完成时间，用于选取每个模型最近一次评测
+    updated_at = Column(DateTime, server_default=text('CURRENT_TIMESTAMP'), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('task_id', 'group_type', 'group_key', name='uq_leaderboard_task_group'),
+        Index('idx_leaderboard_dataset', 'dataset_id', 'dataset_version', 'created_by'),
+    )
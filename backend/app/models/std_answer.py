@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, text
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..db.database import Base
@@ -17,6 +17,11 @@ class StdAnswer(Base):
       # 版本区间字段
     original_version_id = Column(Integer, nullable=False, index=True)  # 最早出现的版本
     current_version_id = Column(Integer, nullable=False, index=True)   # 当前有效的最新版本
+
+    # 答案没有dataset_id，按问题读取时以std_question_id等值匹配，再对版本区间做范围扫描
+    __table_args__ = (
+        Index('idx_stdanswer_question_valid_version', 'std_question_id', 'is_valid', 'original_version_id', 'current_version_id'),
+    )
     
     # Relationships
     std_question = relationship("StdQuestion", back_populates="std_answers")
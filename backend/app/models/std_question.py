@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum, ForeignKeyConstraint
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum, ForeignKeyConstraint, Index
 from sqlalchemy import text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -23,6 +23,8 @@ class StdQuestion(Base):
     # 复合外键约束
     __table_args__ = (
         ForeignKeyConstraint(['dataset_id', 'current_version_id'], ['Dataset.id', 'Dataset.version']),
+        # 版本快照读取：按数据集和有效性等值匹配后，对版本区间做范围扫描
+        Index('idx_stdquestion_dataset_valid_version', 'dataset_id', 'is_valid', 'original_version_id', 'current_version_id'),
     )
     
     # Relationships
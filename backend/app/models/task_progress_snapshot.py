@@ -0,0 +1,26 @@
+"""
+Task progress snapshot model - 评测任务的实时进度快照，由执行任务的worker定期覆盖写入
+进度接口只读取这一行，不再按答案和评测明细计算
+"""
+from sqlalchemy import Column, Integer, String, Text, Float, DECIMAL, DateTime, ForeignKey, JSON, text
+
+from ..db.database import Base
+
+
+class TaskProgressSnapshot(Base):
+    """评测任务进度快照表，每个任务一行"""
+    __tablename__ = "TaskProgressSnapshot"
+
+    task_id = Column(Integer, ForeignKey("LLMEvaluationTask.id", ondelete="CASCADE"), primary_key=True)
+    phase = Column(String(30), nullable=True)  # 写入快照时的阶段：generating_answers / evaluating_answers
+    progress = Column(Integer, default=0)  # 当前阶段进度百分比
+    total_items = Column(Integer, default=0)  # 当前阶段条目总数
+    completed_items = Column(Integer, default=0)
+    failed_items = Column(Integer, default=0)
+    questions_per_minute = Column(Float, nullable=True)  # 本次运行的处理速率
+    estimated_remaining_time = Column(Integer, nullable=True)  # 预计剩余时间（秒）
+    latest_content = Column(Text, nullable=True)  # 最新生成的答案或评测理由（截断）
+    latest_score = Column(DECIMAL(5, 2), nullable=True)
+    latest_content_type = Column(String(20), nullable=True)  # answer / evaluation
+    inflight = Column(JSON, nullable=True)  # 正在执行的请求：问题ID、已耗时、首token耗时和部分输出
+    updated_at = Column(DateTime, server_default=text('CURRENT_TIMESTAMP'), nullable=False)
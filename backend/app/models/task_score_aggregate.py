@@ -0,0 +1,34 @@
+"""
+Task score aggregate model - 按任务和问题类型增量维护的评分汇总，读取任务得分和分数分布时无需扫描评测表
+每个答案按其有效评测的平均分计入一次
+多次采样的pass@k和多数投票准确率在评测完成时一并写入
+"""
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, DECIMAL, text
+
+from ..db.database import Base
+
+
+# 汇总全部问题类型的行使用的question_type
+ALL_QUESTION_TYPES = "all"
+
+# 直方图分桶数：[0,10), [10,20), ..., [90,100]
+HISTOGRAM_BUCKETS = 10
+
+
+class TaskScoreAggregate(Base):
+    """任务评分汇总表，每个任务每种问题类型一行，另有question_type为all的总计行"""
+    __tablename__ = "TaskScoreAggregate"
+
+    task_id = Column(Integer, ForeignKey("LLMEvaluationTask.id", ondelete="CASCADE"), primary_key=True)
+    question_type = Column(String(20), primary_key=True)  # choice / text / all
+    score_count = Column(Integer, server_default=text('0'), nullable=False)  # 有有效评分的答案数
+    score_sum = Column(DECIMAL(16, 4), server_default=text('0'), nullable=False)  # 答案平均分之和
+    score_sum_sq = Column(DECIMAL(20, 4), server_default=text('0'), nullable=False)  # 答案平均分的平方和，用于计算标准差
+    histogram = Column(JSON, nullable=True)  # 答案平均分每10分一个桶的计数
+    # 多次采样指标（百分比），评测阶段结束时按题计算
+    question_count = Column(Integer, nullable=True)  # 参与计算的题数
+    samples_per_question = Column(Integer, nullable=True)  # pass@k中的k
+    pass_at_1 = Column(DECIMAL(5, 2), nullable=True)
+    pass_at_k = Column(DECIMAL(5, 2), nullable=True)
+    majority_vote_accuracy = Column(DECIMAL(5, 2), nullable=True)  # 多数投票（自洽性）准确率
+    updated_at = Column(DateTime, server_default=text('CURRENT_TIMESTAMP'), nullable=False)
@@ -2,7 +2,7 @@
 Dataset Version Work Router
 Provides version management capabilities for datasets
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 
@@ -25,6 +25,7 @@ from app.crud.crud_dataset_version_work import (
     get_version_work_statistics, create_version_std_qa_pair, get_version_work_complete_data,
     create_version_answer_with_scoring_points
 )
+from app.services.dataset_snapshot import materialize_dataset_snapshot
 
 router = APIRouter(prefix="/api/dataset-version-work", tags=["Dataset Version Work"])
 
@@ -196,6 +197,7 @@ def update_version_work(
 @router.post("/{work_id}/complete", response_model=DatasetVersionWorkResponse)
 def complete_version_work(
     work_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -208,6 +210,8 @@ def complete_version_work(
             detail="Version work not found, already completed, or no permission"
         )
     
+    # 响应返回后写入新版本的快照文件
+    background_tasks.add_task(materialize_dataset_snapshot, work.dataset_id, work.target_version)
     return work
 
 
@@ -470,6 +474,7 @@ def create_version_std_qa_pair_endpoint(
 @router.post("/{work_id}/create-version", response_model=dict)
 def create_new_version(
     work_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -498,6 +503,8 @@ def create_new_version(
             StdQuestion.is_valid == True
         ).count()
         
+        # 响应返回后写入新版本的快照文件
+        background_tasks.add_task(materialize_dataset_snapshot, work.dataset_id, work.target_version)
         return {
             "success": True,
             "message": f"Successfully created version {work.target_version}",
@@ -1,5 +1,5 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, and_
 
@@ -12,6 +12,8 @@ from app.crud.crud_dataset import (
     get_datasets_paginated, get_dataset as crud_get_dataset, get_dataset_versions, 
     create_dataset_version, get_latest_dataset_version, delete_dataset
 )
+from app.crud.crud_dataset_version_stats import get_dataset_version_stats, refresh_dataset_version_stats
+from app.services.dataset_snapshot import materialize_dataset_snapshot
 
 router = APIRouter(prefix="/api/datasets", tags=["Datasets"])
 
@@ -39,6 +41,7 @@ def create_dataset(
         is_public=dataset.is_public
     )
     db.add(db_dataset)
+    refresh_dataset_version_stats(db, next_dataset_id, version)
     db.commit()
     db.refresh(db_dataset)
     
@@ -101,10 +104,6 @@ def get_datasets_marketplace(
     db: Session = Depends(get_db)
 ):
     """获取数据库市场列表（包含统计信息）"""
-    from ..models.raw_question import RawQuestion
-    from ..models.std_question import StdQuestion
-    from ..models.std_answer import StdAnswer
-    
     # 基础查询，包含创建者信息
     query = db.query(Dataset).options(joinedload(Dataset.creator))
     
@@ -117,24 +116,12 @@ def get_datasets_marketplace(
         query = query.filter((Dataset.is_public == True) & (Dataset.is_valid == True))
     
     datasets = query.order_by(Dataset.create_time.desc()).offset(skip).limit(limit).all()
-      # 为每个数据集添加统计信息 - marketplace端点
+    # 从版本统计表读取问题数和答案数 - marketplace端点
+    stats = get_dataset_version_stats(db, datasets)
     result = []
     for dataset in datasets:
-        std_questions_count = db.query(func.count(StdQuestion.id)).filter(
-            StdQuestion.dataset_id == dataset.id,
-            StdQuestion.original_version_id <= dataset.version,
-            StdQuestion.current_version_id >= dataset.version,
-            StdQuestion.is_valid == True
-        ).scalar() or 0
-        
-        std_answers_count = db.query(func.count(StdAnswer.id)).join(StdQuestion).filter(
-            StdQuestion.dataset_id == dataset.id,
-            StdQuestion.original_version_id <= dataset.version,
-            StdQuestion.current_version_id >= dataset.version,
-            StdQuestion.is_valid == True,
-            StdAnswer.is_valid == True
-        ).scalar() or 0
-          # 创建带统计信息的数据集对象
+        version_stats = stats[(dataset.id, dataset.version)]
+        # 创建带统计信息的数据集对象
         dataset_with_stats = DatasetWithStats(
             id=dataset.id,
             name=dataset.name,
@@ -143,8 +130,8 @@ def get_datasets_marketplace(
             created_by=dataset.created_by,
             is_public=dataset.is_public,
             create_time=dataset.create_time,
-            std_questions_count=std_questions_count,
-            std_answers_count=std_answers_count,
+            std_questions_count=version_stats.question_count,
+            std_answers_count=version_stats.answer_count,
             creator_username=dataset.creator.username if dataset.creator else None
         )
         result.append(dataset_with_stats)
@@ -158,30 +145,15 @@ def get_my_datasets(
     db: Session = Depends(get_db)
 ):
     """获取自建数据库列表（包含统计信息）"""
-    from ..models.raw_question import RawQuestion
-    from ..models.std_question import StdQuestion
-    from ..models.std_answer import StdAnswer
-    
     query = db.query(Dataset).options(joinedload(Dataset.creator)).filter((Dataset.created_by == current_user.id) & (Dataset.is_valid == True))
     
-    datasets = query.order_by(Dataset.create_time.desc()).offset(skip).limit(limit).all()      # 为每个数据集添加统计信息 - my端点
+    datasets = query.order_by(Dataset.create_time.desc()).offset(skip).limit(limit).all()
+    # 从版本统计表读取问题数和答案数 - my端点
+    stats = get_dataset_version_stats(db, datasets)
     result = []
     for dataset in datasets:
-        std_questions_count = db.query(func.count(StdQuestion.id)).filter(
-            StdQuestion.dataset_id == dataset.id,
-            StdQuestion.original_version_id <= dataset.version,
-            StdQuestion.current_version_id >= dataset.version,
-            StdQuestion.is_valid == True
-        ).scalar() or 0
-        
-        std_answers_count = db.query(func.count(StdAnswer.id)).join(StdQuestion).filter(
-            StdQuestion.dataset_id == dataset.id,
-            StdQuestion.original_version_id <= dataset.version,
-            StdQuestion.current_version_id >= dataset.version,
-            StdQuestion.is_valid == True,
-            StdAnswer.is_valid == True
-        ).scalar() or 0
-          # 创建带统计信息的数据集对象
+        version_stats = stats[(dataset.id, dataset.version)]
+        # 创建带统计信息的数据集对象
         dataset_with_stats = DatasetWithStats(
             id=dataset.id,
             name=dataset.name,
@@ -190,8 +162,8 @@ def get_my_datasets(
             created_by=dataset.created_by,
             is_public=dataset.is_public,
             create_time=dataset.create_time,
-            std_questions_count=std_questions_count,
-            std_answers_count=std_answers_count,
+            std_questions_count=version_stats.question_count,
+            std_answers_count=version_stats.answer_count,
             creator_username=dataset.creator.username if dataset.creator else None
         )
         result.append(dataset_with_stats)
@@ -244,34 +216,19 @@ def get_dataset_stats(
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    from ..models.std_question import StdQuestion
-    from ..models.std_answer import StdAnswer
-    from sqlalchemy import func
-    
-    # 获取该特定版本数据集的标准问题数量
-    std_questions_count = db.query(func.count(StdQuestion.id)).filter(
-        StdQuestion.dataset_id == dataset_id,
-        StdQuestion.current_version_id == dataset.version,  # 使用特定版本
-        StdQuestion.is_valid == True
-    ).scalar()
-    
-    # 获取该特定版本数据集的标准答案数量  
-    std_answers_count = db.query(func.count(StdAnswer.id)).join(
-        StdQuestion, StdAnswer.std_question_id == StdQuestion.id
-    ).filter(
-        StdQuestion.dataset_id == dataset_id,
-        StdQuestion.current_version_id == dataset.version,  # 使用特定版本
-        StdQuestion.is_valid == True,
-        StdAnswer.is_valid == True
-    ).scalar()
+    version_stats = get_dataset_version_stats(db, [dataset])[(dataset.id, dataset.version)]
     
     return {
         "dataset_id": dataset_id,
         "version": dataset.version,
         "description": dataset.description,
         "create_time": dataset.create_time,
-        "std_questions_count": std_questions_count,
-        "std_answers_count": std_answers_count
+        "std_questions_count": version_stats.question_count,
+        "std_answers_count": version_stats.answer_count,
+        "choice_questions_count": version_stats.choice_question_count,
+        "text_questions_count": version_stats.text_question_count,
+        "scoring_points_count": version_stats.scoring_point_count,
+        "tag_counts": version_stats.tag_counts or {}
     }
 
 @router.put("/{dataset_id}", response_model=DatasetResponse)
@@ -372,6 +329,7 @@ def get_dataset_versions_endpoint(
 def create_new_dataset_version(
     dataset_id: int,
     dataset_update: DatasetUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -389,6 +347,8 @@ def create_new_dataset_version(
     
     try:
         new_version = create_dataset_version(db, dataset_id, dataset_update, current_user.id)
+        # 响应返回后写入新版本的快照文件
+        background_tasks.add_task(materialize_dataset_snapshot, dataset_id, new_version.version)
         return new_version
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
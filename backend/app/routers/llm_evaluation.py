@@ -2,15 +2,20 @@
 LLM Evaluation Router for regular users
 Provides marketplace access, task-based LLM evaluation, and result management
 """
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func
 from typing import List, Optional, Dict, Any
+import asyncio
 import json
+import time
 import logging
 from datetime import datetime
 from decimal import Decimal
 
-from app.db.database import get_db
+from app.db.database import get_db, SessionLocal
 from app.auth import get_current_user
 from app.models.user import User
 from app.models.dataset import Dataset
@@ -21,10 +26,13 @@ from app.models.llm import LLM
 from app.models.llm_answer import LLMAnswer
 from app.models.llm_evaluation_task import LLMEvaluationTask, TaskStatus
 from app.models.evaluation import Evaluation, EvaluatorType
+from app.models.evaluation_job import JobType
 from app.schemas.llm_evaluation_task import (
     LLMEvaluationTaskCreate, LLMEvaluationTaskResponse, LLMEvaluationTaskUpdate,
-    LLMEvaluationTaskProgress, PromptTemplateInfo,
-    EvaluationStartRequest, AvailableModel, EvaluationResultSummary,
+    LLMEvaluationTaskProgress, TaskMetricsResponse, TaskScoreDistributionResponse, LeaderboardResponse,
+    PromptTemplateInfo,
+    EvaluationStartRequest, FanoutEvaluationRequest, FanoutEvaluationResponse,
+    AvailableModel, EvaluationResultSummary,
     EvaluationDownloadRequest, ModelConfigRequest,
     ManualEvaluationTaskCreate, ManualEvaluationTaskResponse, ManualEvaluationRequest
 )
@@ -34,12 +42,23 @@ from app.schemas.llm_answer import (
 from app.schemas.evaluation import EvaluationResponse, EvaluationCreate
 from app.crud.crud_llm_evaluation_task import (
     create_llm_evaluation_task, get_llm_evaluation_task, update_llm_evaluation_task,
-    get_user_evaluation_tasks, get_task_progress, create_manual_evaluation_task
+    get_user_evaluation_tasks, get_task_progress, create_manual_evaluation_task, get_task_metrics,
+    get_task_score_stats, filter_task_answers, get_task_score_distribution,
+    create_fanout_evaluation_tasks
 )
+from app.crud.crud_evaluation_job import enqueue_evaluation_job, get_active_job, get_active_fanout_job
+from app.crud.crud_task_score_aggregate import apply_evaluation_score_changes, counted_score
+from app.crud.crud_leaderboard import get_leaderboard
 from app.crud.crud_llm import get_active_llms
 from app.crud.crud_dataset import get_datasets_paginated
+from app.crud.crud_dataset_version_stats import get_dataset_version_stats
 from app.services.llm_evaluation_service import LLMEvaluationTaskProcessor
-from app.config.llm_config import get_default_system_prompt, get_default_evaluation_prompt
+from app.services.task_export_service import stream_task_results, export_filename, MEDIA_TYPES
+from app.services.task_diff_service import stream_task_diff
+from app.services.dataset_export_service import stream_dataset, dataset_filename
+from app.config.llm_config import (
+    get_default_system_prompt, get_default_evaluation_prompt, DEFAULT_CONCURRENCY, PROGRESS_SNAPSHOT_SECONDS
+)
 
 router = APIRouter(prefix="/api/llm-evaluation", tags=["LLM Evaluation"])
 
@@ -49,6 +68,11 @@ logger = logging.getLogger(__name__)
 # 创建任务处理器实例
 task_processor = LLMEvaluationTaskProcessor()
 
+# SSE进度推送：任务处于这些状态时持续推送，无变化时每隔一段时间发送心跳
+ACTIVE_TASK_STATUSES = (TaskStatus.CONFIG_PARAMS, TaskStatus.CONFIG_PROMPTS,
+                        TaskStatus.GENERATING_ANSWERS, TaskStatus.EVALUATING_ANSWERS)
+PROGRESS_HEARTBEAT_SECONDS = 15
+
 
 @router.get("/marketplace/datasets", response_model=List[MarketplaceDatasetInfo])
 def get_marketplace_datasets(
@@ -71,41 +95,19 @@ def get_marketplace_datasets(
         search_query=search,
     )
     
+    # 从版本统计表读取本页所有数据集的问题数
+    stats = get_dataset_version_stats(db, datasets)
     marketplace_datasets = []
-    for dataset in datasets:        # 统计问题总数（使用版本范围查询）
-        question_count = db.query(StdQuestion).filter(
-            StdQuestion.dataset_id == dataset.id,
-            StdQuestion.original_version_id <= dataset.version,
-            StdQuestion.current_version_id >= dataset.version,
-            StdQuestion.is_valid == True
-        ).count()
-        
-        # 统计选择题数量（使用版本范围查询）
-        choice_question_count = db.query(StdQuestion).filter(
-            StdQuestion.dataset_id == dataset.id,
-            StdQuestion.original_version_id <= dataset.version,
-            StdQuestion.current_version_id >= dataset.version,
-            StdQuestion.is_valid == True,
-            StdQuestion.question_type == 'choice'
-        ).count()
-        
-        # 统计文本题数量（使用版本范围查询）
-        text_question_count = db.query(StdQuestion).filter(
-            StdQuestion.dataset_id == dataset.id,
-            StdQuestion.original_version_id <= dataset.version,
-            StdQuestion.current_version_id >= dataset.version,
-            StdQuestion.is_valid == True,
-            StdQuestion.question_type == 'text'
-        ).count()
-        
+    for dataset in datasets:
+        version_stats = stats[(dataset.id, dataset.version)]
         marketplace_datasets.append(MarketplaceDatasetInfo(
             id=dataset.id,
             name=dataset.name,
             description=dataset.description,
             version=dataset.version,
-            question_count=question_count,
-            choice_question_count=choice_question_count,
-            text_question_count=text_question_count,
+            question_count=version_stats.question_count,
+            choice_question_count=version_stats.choice_question_count,
+            text_question_count=version_stats.text_question_count,
             is_public=dataset.is_public,
             created_by=dataset.created_by,
             create_time=dataset.create_time
@@ -148,31 +150,17 @@ def get_marketplace_dataset(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Dataset version not found or not public")
     
-    # 获取数据集的所有标准问题（使用版本范围查询）
-    std_questions = db.query(StdQuestion).filter(
-        StdQuestion.dataset_id == dataset.id,
-        StdQuestion.original_version_id <= dataset.version,
-        StdQuestion.current_version_id >= dataset.version,
-        StdQuestion.is_valid == True
-    ).all()
-    
-    # 统计问题总数
-    question_count = len(std_questions)
-    
-    # 统计选择题数量
-    choice_question_count = len([q for q in std_questions if q.question_type == 'choice'])
-    
-    # 统计文本题数量
-    text_question_count = len([q for q in std_questions if q.question_type == 'text'])
+    # 从版本统计表读取问题数
+    version_stats = get_dataset_version_stats(db, [dataset])[(dataset.id, dataset.version)]
     
     return MarketplaceDatasetInfo(
         id=dataset.id,
         name=dataset.name,
         description=dataset.description,
         version=dataset.version,
-        question_count=question_count,
-        choice_question_count=choice_question_count,
-        text_question_count=text_question_count,
+        question_count=version_stats.question_count,
+        choice_question_count=version_stats.choice_question_count,
+        text_question_count=version_stats.text_question_count,
         is_public=dataset.is_public,
         created_by=dataset.created_by,
         create_time=dataset.create_time
@@ -183,11 +171,12 @@ def get_marketplace_dataset(
 def download_marketplace_dataset(
     dataset_id: int,
     version: Optional[int] = None,  # 可选版本参数
-    format: str = "json",
+    format: str = Query("json", pattern="^(json|ndjson)$", description="下载格式：json或ndjson（每个问题一行）"),
+    gzip: bool = Query(False, description="是否使用gzip压缩"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """下载数据集的问题数据"""
+    """下载数据集版本的全部问题数据（流式输出，包含标签、答案和得分点）"""
     # 如果未指定版本，获取最新版本
     if version is None:
         latest_dataset = db.query(Dataset).filter(
@@ -215,63 +204,29 @@ def download_marketplace_dataset(
                 detail="Dataset version not found or not public"
             )
     
-    # 获取数据集的所有标准问题（使用版本范围查询）
-    from sqlalchemy.orm import selectinload
-    std_questions = db.query(StdQuestion).options(
-        selectinload(StdQuestion.tags),
-        selectinload(StdQuestion.std_answers).selectinload(StdAnswer.answered_by_user)
-    ).filter(
-        StdQuestion.dataset_id == dataset.id,
-        StdQuestion.original_version_id <= dataset.version,
-        StdQuestion.current_version_id >= dataset.version,
-        StdQuestion.is_valid == True
-    ).all()
-    
     # 获取数据集的基本信息
-    question_count = len(std_questions)
-    
-    choice_question_count = len([q for q in std_questions if q.question_type == 'choice'])
-    
-    text_question_count = len([q for q in std_questions if q.question_type == 'text'])
+    version_stats = get_dataset_version_stats(db, [dataset])[(dataset.id, dataset.version)]
     
     dataset_info = MarketplaceDatasetInfo(
         id=dataset.id,
         name=dataset.name,
         description=dataset.description,
         version=dataset.version,
-        question_count=question_count,
-        choice_question_count=choice_question_count,
-        text_question_count=text_question_count,
+        question_count=version_stats.question_count,
+        choice_question_count=version_stats.choice_question_count,
+        text_question_count=version_stats.text_question_count,
         is_public=dataset.is_public,
         created_by=dataset.created_by,
         create_time=dataset.create_time
     )
     
-    # 获取数据集的问题
-    questions = std_questions[:100]  # 限制数量以防止过大的响应
-      # 转换为响应格式
-    question_data = []
-    for question in questions:
-        question_info = {
-            "id": question.id,
-            "question": question.body,
-            "question_type": question.question_type,
-            "tags": [tag.label for tag in question.tags] if question.tags else [],
-            "std_answer": [
-                {
-                    "id": answer.id,
-                    "answer": answer.answer,
-                    "answered_by": answer.answered_by_user.username if answer.answered_by_user else "unknown",
-                    "answered_at": answer.answered_at.isoformat() if answer.answered_at else None,
-                    "is_valid": answer.is_valid
-                } for answer in question.std_answers if answer.is_valid
-            ] if question.std_answers else [],
+    # 按问题ID分页读取版本快照并逐条写出，内存占用与数据集规模无关
+    return StreamingResponse(
+        stream_dataset(dataset.id, dataset.version, dataset_info.model_dump(mode="json"), format, gzip),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f"attachment; filename={dataset_filename(dataset.id, dataset.version, format, gzip)}"
         }
-        question_data.append(question_info)
-    
-    return DatasetDownloadResponse(
-        dataset_info=dataset_info,
-        questions=question_data
     )
 
 
@@ -411,11 +366,52 @@ def get_prompt_template_by_key(
     return template
 
 
+def _get_config_value(config, key, default=None):
+    """从配置对象中获取值，支持Pydantic模型和字典"""
+    if hasattr(config, key):
+        return getattr(config, key, default)
+    elif hasattr(config, 'get'):
+        return config.get(key, default)
+    else:
+        return default
+
+
+def _build_task_create_data(
+    request: EvaluationStartRequest,
+    model_id: int,
+    task_name: str,
+    api_key: Optional[str] = None
+) -> LLMEvaluationTaskCreate:
+    """根据评测请求中的模型配置和评测配置构造任务创建数据"""
+    return LLMEvaluationTaskCreate(
+        name=task_name,
+        description=f"LLM评测任务: {task_name}",
+        dataset_id=request.dataset_id,
+        dataset_version=request.dataset_version or 1,  # 添加dataset_version字段
+        model_id=model_id,  # 使用验证过的LLM ID
+        system_prompt=_get_config_value(request.model_settings, 'system_prompt'),
+        choice_system_prompt=_get_config_value(request.model_settings, 'choice_system_prompt'),
+        text_system_prompt=_get_config_value(request.model_settings, 'text_system_prompt'),
+        choice_evaluation_prompt=_get_config_value(request.evaluation_config, 'choice_evaluation_prompt') if request.evaluation_config else None,
+        text_evaluation_prompt=_get_config_value(request.evaluation_config, 'text_evaluation_prompt') if request.evaluation_config else None,
+        temperature=Decimal(str(_get_config_value(request.model_settings, 'temperature', 0.7))),  # 转换为Decimal
+        max_tokens=_get_config_value(request.model_settings, 'max_tokens', 2000),
+        top_k=_get_config_value(request.model_settings, 'top_k', 50),
+        enable_reasoning=_get_config_value(request.model_settings, 'enable_reasoning', False),
+        concurrency=_get_config_value(request.model_settings, 'concurrency', DEFAULT_CONCURRENCY),
+        use_cache=_get_config_value(request.model_settings, 'use_cache', True),
+        execution_mode=_get_config_value(request.model_settings, 'execution_mode', 'interactive'),
+        enable_streaming=_get_config_value(request.model_settings, 'enable_streaming', False),
+        samples_per_question=_get_config_value(request.model_settings, 'samples_per_question', 1),
+        evaluation_prompt=_get_config_value(request.evaluation_config, 'evaluation_prompt') if request.evaluation_config else None,
+        api_key=api_key or _get_config_value(request.model_settings, 'api_key')
+    )
+
+
 @router.post("/tasks", response_model=LLMEvaluationTaskResponse)
 async def create_evaluation_task(
     request: EvaluationStartRequest,
     raw_request: Request,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -471,33 +467,7 @@ async def create_evaluation_task(
         )
     
     # 创建任务数据
-    def get_config_value(config, key, default=None):
-        """从配置对象中获取值，支持Pydantic模型和字典"""
-        if hasattr(config, key):
-            return getattr(config, key, default)
-        elif hasattr(config, 'get'):
-            return config.get(key, default)
-        else:
-            return default
-        
-    task_data = LLMEvaluationTaskCreate(
-        name=request.task_name,
-        description=f"LLM评测任务: {request.task_name}",
-        dataset_id=request.dataset_id,
-        dataset_version=request.dataset_version or 1,  # 添加dataset_version字段
-        model_id=llm.id,  # 使用验证过的LLM ID
-        system_prompt=get_config_value(request.model_settings, 'system_prompt'),
-        choice_system_prompt=get_config_value(request.model_settings, 'choice_system_prompt'),
-        text_system_prompt=get_config_value(request.model_settings, 'text_system_prompt'),
-        choice_evaluation_prompt=get_config_value(request.evaluation_config, 'choice_evaluation_prompt') if request.evaluation_config else None,
-        text_evaluation_prompt=get_config_value(request.evaluation_config, 'text_evaluation_prompt') if request.evaluation_config else None,
-        temperature=Decimal(str(get_config_value(request.model_settings, 'temperature', 0.7))),  # 转换为Decimal
-        max_tokens=get_config_value(request.model_settings, 'max_tokens', 2000),
-        top_k=get_config_value(request.model_settings, 'top_k', 50),
-        enable_reasoning=get_config_value(request.model_settings, 'enable_reasoning', False),
-        evaluation_prompt=get_config_value(request.evaluation_config, 'evaluation_prompt') if request.evaluation_config else None,
-        api_key=get_config_value(request.model_settings, 'api_key')
-    )
+    task_data = _build_task_create_data(request, llm.id, request.task_name)
     
     # 创建任务
     logger.info(f"开始创建LLM评测任务: {request.task_name}")
@@ -510,24 +480,77 @@ async def create_evaluation_task(
         logger.error(f"创建任务错误堆栈:\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"创建任务失败: {str(create_error)}")
     
-    # 添加后台任务
-    logger.info(f"开始添加后台任务，任务ID: {task.id}")
+    # 加入作业队列，由独立的评测worker进程执行
+    logger.info(f"开始添加评测作业，任务ID: {task.id}")
     try:
-        background_tasks.add_task(
-            task_processor.process_evaluation_task,
-            task.id,
-            request.question_limit
-        )
-        logger.info(f"后台任务添加成功，任务ID: {task.id}")
+        enqueue_evaluation_job(db, task.id, JobType.GENERATE, request.question_limit)
+        logger.info(f"评测作业添加成功，任务ID: {task.id}")
     except Exception as bg_error:
-        logger.error(f"添加后台任务失败: {str(bg_error)}")
+        logger.error(f"添加评测作业失败: {str(bg_error)}")
         import traceback
-        logger.error(f"后台任务错误堆栈:\n{traceback.format_exc()}")
-        # 即使后台任务失败，也要返回任务，但状态会是FAILED
+        logger.error(f"评测作业错误堆栈:\n{traceback.format_exc()}")
+        # 即使作业入队失败，也要返回任务，之后可通过续跑接口重新入队
     
     return LLMEvaluationTaskResponse.from_orm(task)
 
 
+@router.post("/tasks/fanout", response_model=FanoutEvaluationResponse)
+def create_fanout_evaluation_task(
+    request: FanoutEvaluationRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    创建多模型扇出评测：为每个模型创建一个任务（共享同一个fanout_group），由一个作业统一生成答案
+
+    数据集只加载一次，各模型并发调用、各自限流；之后每个任务可单独查看进度、评测和对比。
+    """
+    dataset = db.query(Dataset).filter(
+        Dataset.id == request.dataset_id,
+        Dataset.version == (request.dataset_version or 1)
+    ).first()
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset or specified version not found"
+        )
+
+    # model_config中的模型排在第一位，其余模型去重
+    api_keys: Dict[int, Optional[str]] = {request.model_settings.model_id: None}
+    for model in request.models:
+        api_keys.setdefault(model.model_id, model.api_key)
+    if len(api_keys) < 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Fan-out evaluation requires at least two distinct models"
+        )
+    llms = {llm.id: llm for llm in db.query(LLM).filter(LLM.id.in_(api_keys))}
+    missing = [model_id for model_id in api_keys if model_id not in llms]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Model not found: {missing}"
+        )
+
+    tasks = create_fanout_evaluation_tasks(db, [
+        _build_task_create_data(
+            request, model_id, f"{request.task_name} - {llms[model_id].display_name or llms[model_id].name}", api_key
+        )
+        for model_id, api_key in api_keys.items()
+    ], current_user.id)
+
+    try:
+        enqueue_evaluation_job(db, tasks[0].id, JobType.FANOUT, request.question_limit)
+    except Exception as e:
+        # 入队失败时各任务仍可通过续跑接口单独重新入队
+        logger.error(f"扇出分组 {tasks[0].fanout_group}: 添加评测作业失败: {str(e)}")
+
+    return FanoutEvaluationResponse(
+        fanout_group=tasks[0].fanout_group,
+        tasks=[LLMEvaluationTaskResponse.from_orm(task) for task in tasks]
+    )
+
+
 @router.post("/tasks/manual", response_model=ManualEvaluationTaskResponse)
 def create_manual_evaluation_task_endpoint(
     task_data: ManualEvaluationTaskCreate,
@@ -663,7 +686,85 @@ def get_task_progress_endpoint(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取任务进度"""
+    """获取任务进度（读取worker写入的进度快照）"""
+    progress_data = _get_owned_task_progress(db, task_id, current_user)
+    return LLMEvaluationTaskProgress(**progress_data)
+
+
+@router.get("/tasks/{task_id}/progress/stream")
+def stream_task_progress(
+    task_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """以Server-Sent Events推送任务进度，快照变化时推送一次，任务结束后关闭"""
+    _get_owned_task_progress(db, task_id, current_user)
+    # 请求会话（与get_current_user共用）在响应结束后才会被依赖清理关闭，
+    # 鉴权后立即归还连接，避免每个SSE连接在任务运行期间一直占用连接池
+    db.close()
+    return StreamingResponse(
+        _progress_events(task_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _get_owned_task_progress(db: Session, task_id: int, current_user: User) -> Dict[str, Any]:
+    progress_data = get_task_progress(db=db, task_id=task_id)
+    
+    if not progress_data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+    
+    if progress_data.pop("created_by") != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    return progress_data
+
+
+def _poll_task_progress(task_id: int) -> Optional[Dict[str, Any]]:
+    """使用短时会话读取一次进度（在线程池中执行），读取后立即归还连接"""
+    db = SessionLocal()
+    try:
+        return get_task_progress(db=db, task_id=task_id)
+    finally:
+        db.close()
+
+
+async def _progress_events(task_id: int):
+    """按快照写入间隔轮询进度，内容变化时输出一条事件，长时间无变化时输出心跳注释"""
+    last_payload = None
+    idle_seconds = 0.0
+    while True:
+        progress_data = await run_in_threadpool(_poll_task_progress, task_id)
+        if not progress_data:
+            return
+        progress_data.pop("created_by")
+        payload = LLMEvaluationTaskProgress(**progress_data).model_dump_json()
+        if payload != last_payload:
+            yield f"event: progress\ndata: {payload}\n\n"
+            last_payload = payload
+            idle_seconds = 0.0
+        elif idle_seconds >= PROGRESS_HEARTBEAT_SECONDS:
+            yield ": keep-alive\n\n"
+            idle_seconds = 0.0
+        if progress_data["status"] not in ACTIVE_TASK_STATUSES:
+            return
+        await asyncio.sleep(PROGRESS_SNAPSHOT_SECONDS)
+        idle_seconds += PROGRESS_SNAPSHOT_SECONDS
+
+
+@router.get("/tasks/{task_id}/metrics", response_model=TaskMetricsResponse)
+def get_task_metrics_endpoint(
+    task_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取任务的延迟分布、token用量、成本、重试和失败原因汇总"""
     task = get_llm_evaluation_task(db=db, task_id=task_id)
     
     if not task:
@@ -678,15 +779,64 @@ def get_task_progress_endpoint(
             detail="Access denied"
         )
     
-    progress_data = get_task_progress(db=db, task_id=task_id)
-    return LLMEvaluationTaskProgress(
-        task_id=task.id,
-        status=task.status,
-        progress=task.progress,
-        total_questions=task.total_questions,
-        completed_questions=task.completed_questions,
-        failed_questions=task.failed_questions,
-        **progress_data
+    return TaskMetricsResponse(
+        **get_task_metrics(db=db, task_id=task_id),
+        cache_hits=task.cache_hits or 0,
+        cache_misses=task.cache_misses or 0
+    )
+
+
+@router.get("/tasks/{task_id}/score-distribution", response_model=TaskScoreDistributionResponse)
+def get_task_score_distribution_endpoint(
+    task_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取任务按问题类型的评分数量、平均分、标准差和分数分布"""
+    task = get_llm_evaluation_task(db=db, task_id=task_id)
+    
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+    
+    if task.created_by != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    
+    return TaskScoreDistributionResponse(
+        task_id=task_id,
+        by_question_type=get_task_score_distribution(db=db, task_id=task_id)
+    )
+
+
+@router.get("/leaderboard/datasets/{dataset_id}", response_model=LeaderboardResponse)
+def get_dataset_leaderboard(
+    dataset_id: int,
+    dataset_version: Optional[int] = Query(None, description="数据集版本，默认为当前版本"),
+    latest_only: bool = Query(True, description="每个模型只保留最近完成的一次任务"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取当前用户在某个数据集版本上已完成任务的模型排行榜（按总体平均分排序）"""
+    if dataset_version is None:
+        dataset_version = db.query(func.max(Dataset.version)).filter(Dataset.id == dataset_id).scalar()
+        if dataset_version is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Dataset not found"
+            )
+    
+    return LeaderboardResponse(
+        dataset_id=dataset_id,
+        dataset_version=dataset_version,
+        entries=get_leaderboard(
+            db=db, dataset_id=dataset_id, dataset_version=dataset_version,
+            user_id=current_user.id, latest_only=latest_only
+        )
     )
 
 
@@ -724,6 +874,57 @@ def cancel_evaluation_task(
     return {"message": "Task cancelled successfully"}
 
 
+@router.post("/tasks/{task_id}/resume")
+def resume_evaluation_task(
+    task_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """续跑被中断、失败或取消的评测任务，只处理尚未生成答案的问题和尚未评测的答案"""
+    task = get_llm_evaluation_task(db=db, task_id=task_id)
+
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+
+    if task.created_by != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+
+    if task.status not in [TaskStatus.GENERATING_ANSWERS, TaskStatus.EVALUATING_ANSWERS, TaskStatus.FAILED, TaskStatus.CANCELLED]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot resume task in status: {task.status.value}"
+        )
+
+    phase = task_processor.get_resume_phase(db, task)
+    if not phase:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nothing left to resume for this task"
+        )
+
+    if get_active_job(db, task_id) or (
+        phase == "generate" and task.fanout_group and get_active_fanout_job(db, task.fanout_group)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Task already has a queued or running job"
+        )
+
+    enqueue_evaluation_job(db, task_id, JobType.RESUME)
+
+    return {
+        "message": "Task resumed successfully",
+        "task_id": task_id,
+        "phase": phase
+    }
+
+
 @router.get("/tasks/{task_id}/results", response_model=EvaluationResultSummary)
 def get_task_results(
     task_id: int,
@@ -788,70 +989,52 @@ def download_task_results(
             detail="Access denied"
         )
     
-    # 获取任务的所有答案和评测结果
-    answers = db.query(LLMAnswer).filter(
-        LLMAnswer.task_id == task_id
-    ).all()
-    
-    results = []
-    for answer in answers:
-        answer_data = {
-            "question_id": answer.std_question_id,
-            "question_text": answer.std_question.body if answer.std_question else "",
-            "llm_answer": answer.answer,
-            "answered_at": answer.answered_at.isoformat() if answer.answered_at else None,
-            "is_valid": answer.is_valid
-        }
-        
-        if request.include_prompts and answer.prompt_used:
-            answer_data["prompt_used"] = answer.prompt_used
-        
-        # 添加评测结果
-        evaluations = db.query(Evaluation).filter(
-            Evaluation.llm_answer_id == answer.id
-        ).all()
-        
-        answer_data["evaluations"] = []
-        for eval in evaluations:
-            answer_data["evaluations"].append({
-                "score": float(eval.score) if eval.score is not None else None,
-                "reasoning": eval.reasoning,
-                "evaluator_type": eval.evaluator_type.value,
-                "evaluation_time": eval.evaluation_time.isoformat()
-            })
-        
-        results.append(answer_data)
-    
-    result = {
-        "task_info": {
-            "id": task.id,
-            "name": task.name,  
-            "model": task.model.name if task.model else "Unknown",  # 使用关联的模型名称
-            "dataset": task.dataset.name,
-            "created_at": task.created_at.isoformat()
-        },
-        "results": results,
-        "summary": {
-            "total_questions": task.total_questions,
-            "successful_count": task.completed_questions,  # 使用completed_questions
-            "failed_count": task.failed_questions,
-            "average_score": float(task.score) if task.score is not None else None,
+    # 按页读取并逐行写出，内存占用与任务规模无关
+    return StreamingResponse(
+        stream_task_results(task_id, request.format, request.include_prompts, request.gzip),
+        media_type="application/gzip" if request.gzip else MEDIA_TYPES[request.format],
+        headers={
+            "Content-Disposition": f"attachment; filename={export_filename(task_id, request.format, request.gzip)}"
         }
-    }
+    )
 
-    from fastapi.responses import Response
-    import json
+@router.get("/tasks/{task_id}/diff/{other_task_id}")
+def diff_tasks(
+    task_id: int,
+    other_task_id: int,
+    top_n: int = Query(20, ge=0, le=1000, description="摘要中列出的退步最多的题目数"),
+    only_changed: bool = Query(False, description="只输出得分有变化的题目"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """逐题对比两个任务（以task_id为基准），以NDJSON流式返回每题分差，最后一行为汇总"""
+    tasks = {}
+    for tid in (task_id, other_task_id):
+        task = get_llm_evaluation_task(db=db, task_id=tid)
+        if not task:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Task {tid} not found"
+            )
+        if task.created_by != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied"
+            )
+        tasks[tid] = task
     
-    json_content = json.dumps(result, ensure_ascii=False, indent=2)
+    if tasks[task_id].dataset_id != tasks[other_task_id].dataset_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="只能对比同一数据集上的任务"
+        )
     
-    return Response(
-        content=json_content,
-        media_type="application/json",
-        headers={
-            "Content-Disposition": f"attachment; filename=task_{task_id}_detailed_results.json"
-        }
+    return StreamingResponse(
+        stream_task_diff(task_id, other_task_id, top_n, only_changed),
+        media_type=MEDIA_TYPES["ndjson"]
     )
 
+
 @router.get("/tasks/{task_id}/download/answers")
 def download_task_answers_only(
     task_id: int,
@@ -992,7 +1175,6 @@ def update_task_status(
 def start_task_evaluation(
     task_id: int,
     evaluation_config: dict,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -1034,8 +1216,8 @@ def start_task_evaluation(
             )
             updated_task = update_llm_evaluation_task(db=db, task_id=task_id, task_update=update_data)
         
-        # 启动后台评测任务
-        background_tasks.add_task(task_processor.process_answer_evaluation, task_id)
+        # 加入作业队列，由独立的评测worker进程执行
+        enqueue_evaluation_job(db, task_id, JobType.EVALUATE)
         
         return {
             "message": "Evaluation started successfully",
@@ -1073,46 +1255,27 @@ def get_task_detailed_results(
             detail="Access denied"
         )
     
-    # 获取所有LLM答案及其评测结果
-    llm_answers = db.query(LLMAnswer).filter(
+    # 一次性加载所有LLM答案及其标准问题、标准答案和评测结果，避免逐条查询
+    llm_answers = db.query(LLMAnswer).options(
+        selectinload(LLMAnswer.std_question).selectinload(StdQuestion.std_answers),
+        selectinload(LLMAnswer.evaluations)
+    ).filter(
         LLMAnswer.task_id == task_id
-    ).all()
+    ).order_by(LLMAnswer.id).all()
     
     # 构建详细结果
     detailed_answers = []
-    total_score = 0
-    valid_scores = 0
-    
     for answer in llm_answers:
-        # 获取标准问题
-        std_question = db.query(StdQuestion).filter(
-            StdQuestion.id == answer.std_question_id
-        ).first()
+        std_question = answer.std_question
+        evaluations = answer.evaluations
+        std_answers = [
+            {"id": sa.id, "answer": sa.answer}
+            for sa in (std_question.std_answers if std_question else [])
+        ]
         
-        # 获取评测结果
-        evaluations = db.query(Evaluation).filter(
-            Evaluation.llm_answer_id == answer.id
-        ).all()
-        
-        # 获取标准答案
-        std_answers = []
-        if std_question:
-            std_answers_data = db.query(StdAnswer).filter(
-                StdAnswer.std_question_id == std_question.id
-            ).all()
-            
-            for sa in std_answers_data:
-                std_answers.append({
-                    "id": sa.id,
-                    "answer": sa.answer
-                })
-          # 计算平均分
+        # 计算平均分
         answer_scores = [e.score for e in evaluations if e.score is not None]
         avg_score = sum(answer_scores) / len(answer_scores) if answer_scores else None
-        
-        if avg_score is not None:
-            total_score += avg_score
-            valid_scores += 1
 
         detailed_answers.append({
             "question_id": answer.std_question_id,
@@ -1134,15 +1297,15 @@ def get_task_detailed_results(
                 } for e in evaluations
             ],
             "average_score": avg_score
-        })      # 计算总体统计并更新任务得分
-    overall_average = total_score / valid_scores if valid_scores > 0 else 0
-    overall_success_rate = sum(1 for answer in llm_answers if answer.is_valid) / len(llm_answers) if llm_answers else 0
+        })
+    
+    # 总体统计在SQL中聚合；本接口只读，任务得分在评测完成时写入
+    stats = get_task_score_stats(db, task_id)
+    valid_scores = stats["evaluated_answers"]
+    overall_average = stats["average_score"]
+    overall_success_rate = stats["valid_answers"] / stats["total_answers"] if stats["total_answers"] else 0
+    task_score = overall_average if valid_scores > 0 else (float(task.score) if task.score else None)
     
-    # 更新任务得分到数据库
-    if valid_scores > 0:
-        task.score = Decimal(str(round(overall_average, 2)))
-        db.commit()
-        db.refresh(task)
       # 按照前端期望的格式返回数据
     return {
         "task_info": {
@@ -1150,7 +1313,7 @@ def get_task_detailed_results(
             "name": task.name,
             "status": task.status.value if hasattr(task.status, 'value') else str(task.status),
             "progress": task.progress,
-            "score": float(task.score) if task.score else None,
+            "score": task_score,
             "total_questions": task.total_questions,
             "completed_questions": task.completed_questions,
             "failed_questions": task.failed_questions,
@@ -1182,14 +1345,14 @@ def get_task_detailed_results(
             "evaluation_prompt": task.evaluation_prompt  # 兼容性保留
         },
         "statistics": {
-            "total_score": float(total_score),
+            "total_score": stats["total_score"],
             "average_score": float(overall_average),
             "overall_average_score": float(overall_average),  # 前端期望的字段名
             "success_rate": float(overall_success_rate),
             "completion_rate": float(overall_success_rate),  # 前端期望的字段名
             "valid_scores_count": valid_scores,
-            "total_answers": len(llm_answers),
-            "valid_answers": sum(1 for answer in llm_answers if answer.is_valid),
+            "total_answers": stats["total_answers"],
+            "valid_answers": stats["valid_answers"],
             "evaluated_answers": valid_scores
         },
         "detailed_answers": detailed_answers
@@ -1274,9 +1437,51 @@ def get_dataset_questions(
         )
 
 
+def _paginate_task_answers(
+    db: Session,
+    task_id: int,
+    response: Response,
+    cursor: Optional[int],
+    limit: Optional[int],
+    min_score: Optional[float],
+    max_score: Optional[float],
+    evaluator_type: Optional[EvaluatorType],
+    question_type: Optional[str],
+    unevaluated: bool,
+    *options
+):
+    """按筛选条件取一页答案；还有下一页时在X-Next-Cursor响应头中返回游标"""
+    query = filter_task_answers(
+        db, task_id,
+        after_id=cursor,
+        min_score=min_score,
+        max_score=max_score,
+        # 未评测筛选默认针对手动评测
+        evaluator_type=evaluator_type or (EvaluatorType.USER if unevaluated else None),
+        question_type=question_type,
+        unevaluated=unevaluated
+    ).options(*options)
+    if limit is None:
+        return query.all(), None
+    
+    llm_answers = query.limit(limit).all()
+    next_cursor = llm_answers[-1].id if len(llm_answers) == limit else None
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return llm_answers, next_cursor
+
+
 @router.get("/tasks/{task_id}/manual-evaluation-answers")
 def get_task_answers_for_manual_evaluation(
     task_id: int,
+    response: Response,
+    cursor: Optional[int] = Query(None, description="上一页最后一个答案ID"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="每页数量，不传时返回全部"),
+    min_score: Optional[float] = Query(None, ge=0, le=100, description="最低分"),
+    max_score: Optional[float] = Query(None, ge=0, le=100, description="最高分"),
+    evaluator_type: Optional[EvaluatorType] = Query(None, description="评测者类型：user或llm"),
+    question_type: Optional[str] = Query(None, pattern="^(choice|text)$", description="问题类型"),
+    unevaluated: bool = Query(False, description="只返回尚未评测的答案（默认指手动评测）"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -1295,37 +1500,24 @@ def get_task_answers_for_manual_evaluation(
             detail="Access denied"
         )
     
-    # 获取所有LLM答案
-    llm_answers = db.query(LLMAnswer).filter(
-        LLMAnswer.task_id == task_id
-    ).all()
+    # 一页LLM答案，标准问题、标准答案和评测结果批量预加载
+    llm_answers, next_cursor = _paginate_task_answers(
+        db, task_id, response, cursor, limit, min_score, max_score, evaluator_type, question_type, unevaluated,
+        selectinload(LLMAnswer.std_question).selectinload(StdQuestion.std_answers),
+        selectinload(LLMAnswer.evaluations)
+    )
     
     # 构建答案列表，包含得分点信息
     answers_data = []
     
     for answer in llm_answers:
-        # 获取标准问题
-        std_question = db.query(StdQuestion).filter(
-            StdQuestion.id == answer.std_question_id
-        ).first()
-        
-        # 获取标准答案及其得分点
-        std_answers = []
-        if std_question:
-            std_answers_data = db.query(StdAnswer).filter(
-                StdAnswer.std_question_id == std_question.id
-            ).all()
-            
-            for sa in std_answers_data:
-                std_answers.append({
-                    "id": sa.id,
-                    "answer": sa.answer
-                })
-          # 获取已有的评测结果（如果有的话）
-        existing_evaluations = db.query(Evaluation).filter(
-            Evaluation.llm_answer_id == answer.id,
-            Evaluation.evaluator_type == 'manual'
-        ).all()
+        std_question = answer.std_question
+        std_answers = [
+            {"id": sa.id, "answer": sa.answer}
+            for sa in (std_question.std_answers if std_question else [])
+        ]
+        # 获取已有的手动评测结果（如果有的话）
+        existing_evaluations = [e for e in answer.evaluations if e.evaluator_type == EvaluatorType.USER]
         
         answers_data.append({
             "llm_answer_id": answer.id,
@@ -1348,13 +1540,22 @@ def get_task_answers_for_manual_evaluation(
         "task_id": task_id,
         "task_name": task.name,
         "answers": answers_data,
-        "total_count": len(answers_data)
+        "total_count": len(answers_data),
+        "next_cursor": next_cursor
     }
 
 
 @router.get("/tasks/{task_id}/answers")
 def get_task_answers(
     task_id: int,
+    response: Response,
+    cursor: Optional[int] = Query(None, description="上一页最后一个答案ID"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="每页数量，不传时返回全部；下一页游标在X-Next-Cursor响应头中"),
+    min_score: Optional[float] = Query(None, ge=0, le=100, description="最低分"),
+    max_score: Optional[float] = Query(None, ge=0, le=100, description="最高分"),
+    evaluator_type: Optional[EvaluatorType] = Query(None, description="评测者类型：user或llm"),
+    question_type: Optional[str] = Query(None, pattern="^(choice|text)$", description="问题类型"),
+    unevaluated: bool = Query(False, description="只返回尚未评测的答案（默认指手动评测）"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -1373,23 +1574,21 @@ def get_task_answers(
             detail="Access denied"
         )
     
-    # 获取所有LLM答案
-    llm_answers = db.query(LLMAnswer).filter(
-        LLMAnswer.task_id == task_id
-    ).all()
+    # 一页LLM答案，标准问题、得分点、标签和评测结果批量预加载
+    llm_answers, _ = _paginate_task_answers(
+        db, task_id, response, cursor, limit, min_score, max_score, evaluator_type, question_type, unevaluated,
+        selectinload(LLMAnswer.std_question).options(
+            selectinload(StdQuestion.std_answers).selectinload(StdAnswer.scoring_points),
+            selectinload(StdQuestion.tags)
+        ),
+        selectinload(LLMAnswer.evaluations)
+    )
     
     # 构建答案列表，包含标准问题和标准答案信息
     answers_data = []
     
     for answer in llm_answers:
-        # 获取标准问题
-        std_question = db.query(StdQuestion).options(
-            joinedload(StdQuestion.std_answers).joinedload(StdAnswer.scoring_points),
-            joinedload(StdQuestion.tags)
-        ).filter(
-            StdQuestion.id == answer.std_question_id
-        ).first()
-        
+        std_question = answer.std_question
         if not std_question:
             continue
         
@@ -1414,10 +1613,7 @@ def get_task_answers(
                 })
         
         # 获取已有的手动评测结果
-        existing_evaluations = db.query(Evaluation).filter(
-            Evaluation.llm_answer_id == answer.id,
-            Evaluation.evaluator_type == EvaluatorType.USER
-        ).all()
+        existing_evaluations = [e for e in answer.evaluations if e.evaluator_type == EvaluatorType.USER]
         
         # 获取最新的手动评测结果
         latest_evaluation = None
@@ -1482,9 +1678,11 @@ def submit_manual_evaluation(
         
         if existing_evaluation:
             # 更新现有评测
+            old_score = counted_score(existing_evaluation)
             existing_evaluation.score = evaluation_data.score
             existing_evaluation.reasoning = evaluation_data.reasoning
             existing_evaluation.evaluation_time = datetime.now()
+            apply_evaluation_score_changes(db, [(answer_id, old_score, counted_score(existing_evaluation))])
         else:
             # 创建新评测
             evaluation = Evaluation(
@@ -1497,6 +1695,7 @@ def submit_manual_evaluation(
                 evaluation_time=datetime.now()
             )
             db.add(evaluation)
+            apply_evaluation_score_changes(db, [(answer_id, None, evaluation_data.score)])
         
         db.commit()
         
@@ -1543,6 +1742,7 @@ def import_manual_evaluations(
     try:
         evaluations_data = import_data.get("evaluations", [])
         imported_count = 0
+        score_changes = []
         
         for eval_data in evaluations_data:
             answer_id = eval_data.get("answer_id")
@@ -1569,9 +1769,11 @@ def import_manual_evaluations(
             ).first()
             
             if existing_evaluation:
+                old_score = counted_score(existing_evaluation)
                 existing_evaluation.score = score
                 existing_evaluation.reasoning = reasoning
                 existing_evaluation.evaluation_time = datetime.now()
+                score_changes.append((answer_id, old_score, counted_score(existing_evaluation)))
             else:
                 evaluation = Evaluation(
                     std_question_id=llm_answer.std_question_id,
@@ -1583,8 +1785,10 @@ def import_manual_evaluations(
                     evaluation_time=datetime.now()
                 )
                 db.add(evaluation)
+                score_changes.append((answer_id, None, score))
             
-            imported_count += 1        
+            imported_count += 1
+        apply_evaluation_score_changes(db, score_changes)
         db.commit()
         
         return {
@@ -1634,9 +1838,11 @@ def create_evaluation(
         
         if existing_evaluation:
             # 更新现有评测
+            old_score = counted_score(existing_evaluation)
             existing_evaluation.score = evaluation_data.score
             existing_evaluation.reasoning = evaluation_data.reasoning
             existing_evaluation.evaluation_time = datetime.now()
+            apply_evaluation_score_changes(db, [(evaluation_data.answer_id, old_score, counted_score(existing_evaluation))])
             db.commit()
             db.refresh(existing_evaluation)
             evaluation = existing_evaluation
@@ -1652,6 +1858,7 @@ def create_evaluation(
                 evaluation_time=datetime.now()
             )
             db.add(evaluation)
+            apply_evaluation_score_changes(db, [(evaluation_data.answer_id, None, evaluation_data.score)])
             db.commit()
             db.refresh(evaluation)
         
@@ -11,6 +11,7 @@ class EvaluatorType(str, Enum):
     """评估者类型"""
     USER = "user"
     LLM = "llm"
+    AUTO = "auto"
 
 
 class EvaluationBase(BaseModel):
@@ -13,6 +13,8 @@ class LLMBase(BaseModel):
     top_k: Optional[int] = 50
     enable_reasoning: bool = False
     cost_per_1k_tokens: Optional[Decimal] = Decimal("0.0006")
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
     description: Optional[str] = None
     version: Optional[str] = None
     affiliation: Optional[str] = None
@@ -31,6 +33,8 @@ class LLMUpdate(BaseModel):
     top_k: Optional[int] = None
     enable_reasoning: Optional[bool] = None
     cost_per_1k_tokens: Optional[Decimal] = None
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
     description: Optional[str] = None
     version: Optional[str] = None
     affiliation: Optional[str] = None
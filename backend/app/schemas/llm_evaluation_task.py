@@ -7,6 +7,7 @@ from datetime import datetime
 from enum import Enum
 from decimal import Decimal
 from ..models.llm_evaluation_task import TaskStatus
+from ..config.llm_config import DEFAULT_CONCURRENCY, MAX_CONCURRENCY, MAX_SAMPLES_PER_QUESTION
 
 
 class SimpleDatasetInfo(BaseModel):
@@ -67,6 +68,11 @@ class ModelConfigRequest(BaseModel):
     max_tokens: Optional[int] = Field(2000, description="最大token数")
     top_k: Optional[int] = Field(50, description="Top-K采样")
     enable_reasoning: Optional[bool] = Field(False, description="启用推理模式")
+    concurrency: Optional[int] = Field(DEFAULT_CONCURRENCY, ge=1, le=MAX_CONCURRENCY, description="并发请求数")
+    use_cache: Optional[bool] = Field(True, description="是否使用响应缓存")
+    execution_mode: Optional[str] = Field("interactive", pattern="^(interactive|batch)$", description="执行方式：interactive逐条调用，batch使用批量API")
+    enable_streaming: Optional[bool] = Field(False, description="流式生成回答（仅interactive方式）")
+    samples_per_question: Optional[int] = Field(1, ge=1, le=MAX_SAMPLES_PER_QUESTION, description="每题采样次数（pass@k / 多数投票），大于1时不使用流式生成")
     
     class Config:
         allow_population_by_field_name = True
@@ -89,6 +95,18 @@ class EvaluationStartRequest(BaseModel):
     class Config:
         # 允许使用别名
         allow_population_by_field_name = True
+
+
+class FanoutModel(BaseModel):
+    """扇出评测中的单个模型"""
+    model_id: int = Field(..., description="模型ID")
+    api_key: Optional[str] = Field(None, description="API密钥，为空时使用model_config中的密钥")
+
+
+class FanoutEvaluationRequest(EvaluationStartRequest):
+    """多模型扇出评测请求Schema：model_config中的参数和提示词由所有模型共享"""
+    models: List[FanoutModel] = Field(..., min_length=1, description="额外参与评测的模型，model_config中的模型始终参与")
+
         
         
 class LLMEvaluationTaskBase(BaseModel):
@@ -107,6 +125,11 @@ class LLMEvaluationTaskBase(BaseModel):
     max_tokens: Optional[int] = Field(2000, description="最大token数")
     top_k: Optional[int] = Field(50, description="Top-K采样")
     enable_reasoning: Optional[bool] = Field(False, description="启用推理模式")
+    concurrency: Optional[int] = Field(DEFAULT_CONCURRENCY, ge=1, le=MAX_CONCURRENCY, description="并发请求数")
+    use_cache: Optional[bool] = Field(True, description="是否使用响应缓存")
+    execution_mode: Optional[str] = Field("interactive", pattern="^(interactive|batch)$", description="执行方式：interactive逐条调用，batch使用批量API")
+    enable_streaming: Optional[bool] = Field(False, description="流式生成回答（仅interactive方式）")
+    samples_per_question: Optional[int] = Field(1, ge=1, le=MAX_SAMPLES_PER_QUESTION, description="每题采样次数（pass@k / 多数投票），大于1时不使用流式生成")
     evaluation_prompt: Optional[str] = Field(None, description="评估prompt")
     
     class Config:
@@ -127,6 +150,10 @@ class LLMEvaluationTaskUpdate(BaseModel):
     total_questions: Optional[int] = None
     completed_questions: Optional[int] = None
     failed_questions: Optional[int] = None
+    cache_hits: Optional[int] = None
+    cache_misses: Optional[int] = None
+    batch_id: Optional[str] = None
+    score: Optional[Decimal] = None
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     error_message: Optional[str] = None
@@ -151,6 +178,10 @@ class LLMEvaluationTaskResponse(LLMEvaluationTaskBase):
     total_questions: int
     completed_questions: int
     failed_questions: int
+    cache_hits: int = 0
+    cache_misses: int = 0
+    batch_id: Optional[str] = None
+    fanout_group: Optional[str] = None
     started_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     error_message: Optional[str] = None
@@ -167,6 +198,21 @@ class LLMEvaluationTaskResponse(LLMEvaluationTaskBase):
         from_attributes = True
 
 
+class FanoutEvaluationResponse(BaseModel):
+    """多模型扇出评测响应Schema"""
+    fanout_group: str
+    tasks: List[LLMEvaluationTaskResponse]
+
+
+class InflightRequest(BaseModel):
+    """正在生成中的请求"""
+    question_id: int
+    sample_index: int = Field(0, description="样本序号，从0开始")
+    elapsed_ms: int = Field(..., description="已耗时（毫秒）")
+    first_token_ms: Optional[int] = Field(None, description="首token耗时（毫秒）")
+    partial: Optional[str] = Field(None, description="已生成内容的末尾部分")
+
+
 class LLMEvaluationTaskProgress(BaseModel):
     """LLM评测任务进度Schema"""
     task_id: int
@@ -175,11 +221,106 @@ class LLMEvaluationTaskProgress(BaseModel):
     total_questions: int
     completed_questions: int
     failed_questions: int
+    phase: Optional[str] = Field(None, description="进度快照所属阶段：generating_answers或evaluating_answers")
+    total_items: Optional[int] = Field(None, description="当前阶段条目总数（生成阶段为问题数，评测阶段为答案数）")
+    completed_items: Optional[int] = None
+    failed_items: Optional[int] = None
     estimated_remaining_time: Optional[int] = None
     questions_per_minute: Optional[float] = None
     latest_score: Optional[float] = Field(None, description="最新的评分")
     latest_content: Optional[str] = Field(None, description="最新内容（答案或评测结果）")
     latest_content_type: Optional[str] = Field(None, description="最新内容类型：answer或evaluation")
+    inflight: List[InflightRequest] = Field(default_factory=list, description="正在执行的请求（流式生成时包含部分输出）")
+    updated_at: Optional[datetime] = Field(None, description="进度快照的写入时间")
+
+
+class LatencySummary(BaseModel):
+    """耗时分布（毫秒）"""
+    count: int = 0
+    p50: Optional[int] = None
+    p95: Optional[int] = None
+    p99: Optional[int] = None
+    max: Optional[int] = None
+    avg: Optional[float] = None
+
+
+class PhaseMetrics(BaseModel):
+    """单个阶段（生成或评测）的调用统计"""
+    count: int = Field(0, description="已写入的结果数")
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0
+    retries: int = 0
+    latency_ms: LatencySummary = Field(default_factory=LatencySummary)
+
+
+class GenerationMetrics(PhaseMetrics):
+    """答案生成阶段的调用统计"""
+    failed: int = 0
+    failure_reasons: Dict[str, int] = Field(default_factory=dict, description="失败原因及次数")
+    first_token_ms: LatencySummary = Field(default_factory=LatencySummary, description="首token耗时，仅流式生成时有值")
+
+
+class TaskMetricsResponse(BaseModel):
+    """评测任务的性能与成本汇总"""
+    task_id: int
+    generation: GenerationMetrics
+    evaluation: PhaseMetrics
+    total_prompt_tokens: int
+    total_completion_tokens: int
+    total_cost: float
+    total_retries: int
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+class ScoreDistribution(BaseModel):
+    """某一问题类型的评分汇总"""
+    count: int = Field(0, description="有效评分数")
+    total_score: float = 0
+    average_score: Optional[float] = None
+    std_dev: Optional[float] = Field(None, description="标准差")
+    histogram: List[int] = Field(default_factory=list, description="每10分一个桶的计数，最后一桶包含100分")
+    distribution: Dict[str, int] = Field(default_factory=dict, description="excellent(90-100)/good(70-89)/fair(50-69)/poor(0-49)")
+    question_count: Optional[int] = Field(None, description="参与多次采样指标计算的题数")
+    samples_per_question: Optional[int] = Field(None, description="每题采样次数k")
+    pass_at_1: Optional[float] = Field(None, description="pass@1（%）")
+    pass_at_k: Optional[float] = Field(None, description="pass@k（%）")
+    majority_vote_accuracy: Optional[float] = Field(None, description="多数投票准确率（%）")
+
+
+class TaskScoreDistributionResponse(BaseModel):
+    """评测任务的评分分布，键为问题类型，all为全部"""
+    task_id: int
+    by_question_type: Dict[str, ScoreDistribution]
+
+
+class LeaderboardGroupScore(BaseModel):
+    """排行榜中某一分组（问题类型或标签）的得分"""
+    score_count: int = 0
+    average_score: Optional[float] = None
+
+
+class LeaderboardEntry(BaseModel):
+    """排行榜条目，对应一次已完成的评测任务"""
+    rank: int
+    task_id: int
+    task_name: str
+    model_id: Optional[int] = None
+    model_name: Optional[str] = None
+    model_display_name: Optional[str] = None
+    completed_at: Optional[datetime] = None
+    score_count: int = 0
+    average_score: Optional[float] = None
+    by_question_type: Dict[str, LeaderboardGroupScore] = Field(default_factory=dict)
+    by_tag: Dict[str, LeaderboardGroupScore] = Field(default_factory=dict)
+
+
+class LeaderboardResponse(BaseModel):
+    """数据集版本上的模型排行榜"""
+    dataset_id: int
+    dataset_version: int
+    entries: List[LeaderboardEntry]
 
 
 class LLMAnswerResponse(BaseModel):
@@ -188,10 +329,19 @@ class LLMAnswerResponse(BaseModel):
     llm_id: Optional[int] = None
     task_id: Optional[int] = None
     std_question_id: Optional[int] = None
+    sample_index: int = 0
     prompt_used: Optional[str] = None
     answer: Optional[str] = None
     answered_at: datetime
     is_valid: bool
+    response_time_ms: Optional[int] = None
+    first_token_ms: Optional[int] = None
+    tokens_per_second: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cost: Optional[Decimal] = None
+    retries: Optional[int] = None
+    failure_reason: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -281,9 +431,10 @@ class EvaluationResultSummary(BaseModel):
 class EvaluationDownloadRequest(BaseModel):
     """评测结果下载请求Schema"""
     task_id: int = Field(..., description="任务ID")
-    format: str = Field("json", description="下载格式")
+    format: str = Field("json", pattern="^(json|ndjson|csv)$", description="下载格式：json、ndjson或csv")
     include_raw_responses: bool = Field(False, description="是否包含原始响应")
     include_prompts: bool = Field(False, description="是否包含使用的prompt")
+    gzip: bool = Field(False, description="是否使用gzip压缩")
 
 
 class ManualEvaluationEntry(BaseModel):
@@ -0,0 +1,208 @@
+"""
+批量API服务 - 通过OpenAI兼容的 /files + /batches 接口离线执行大量补全请求
+适用于不需要交互延迟的大数据集评测，请求写成JSONL文件一次性提交，完成后整体取回结果
+"""
+import asyncio
+import json
+import time
+import logging
+from typing import Dict, Any, Optional, Callable
+
+import httpx
+
+from ..config.llm_config import BATCH_POLL_SECONDS, BATCH_MAX_WAIT_SECONDS
+from .llm_client_service import LLMClient, CACHED_RESULT_FIELDS
+from .response_cache import get_response_cache
+
+logger = logging.getLogger(__name__)
+
+# 批量作业的终止状态
+BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchNotSupportedError(Exception):
+    """API提供商不支持批量接口"""
+    pass
+
+
+class BatchAPIClient:
+    """OpenAI兼容批量接口的客户端"""
+
+    # 批量请求对应的补全接口路径
+    ENDPOINT = "/v1/chat/completions"
+
+    def __init__(
+        self,
+        llm_client: LLMClient,
+        poll_interval: float = BATCH_POLL_SECONDS,
+        max_wait_seconds: int = BATCH_MAX_WAIT_SECONDS
+    ):
+        """
+        初始化批量客户端
+
+        Args:
+            llm_client: 提供端点地址和API密钥的LLM客户端
+            poll_interval: 查询批量作业状态的间隔（秒）
+            max_wait_seconds: 最长等待时间，超时后取消批量作业
+        """
+        self.base_url = llm_client.base_url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {llm_client.api_key}"}
+        self.poll_interval = poll_interval
+        self.max_wait_seconds = max_wait_seconds
+
+    def _http(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=self.base_url, headers=self.headers, timeout=httpx.Timeout(120.0))
+
+    @staticmethod
+    def _check(response: httpx.Response):
+        if response.status_code in (404, 405, 501):
+            raise BatchNotSupportedError(f"{response.request.url} 返回 {response.status_code}")
+        response.raise_for_status()
+
+    async def submit(self, requests: Dict[str, Dict[str, Any]]) -> str:
+        """上传JSONL请求文件并创建批量作业，返回批量作业ID"""
+        lines = [
+            json.dumps({"custom_id": custom_id, "method": "POST", "url": self.ENDPOINT, "body": body}, ensure_ascii=False)
+            for custom_id, body in requests.items()
+        ]
+        content = ("\n".join(lines) + "\n").encode("utf-8")
+        async with self._http() as http:
+            response = await http.post(
+                "/files",
+                files={"file": ("batch_input.jsonl", content, "application/jsonl")},
+                data={"purpose": "batch"}
+            )
+            self._check(response)
+            input_file_id = response.json()["id"]
+
+            response = await http.post("/batches", json={
+                "input_file_id": input_file_id,
+                "endpoint": self.ENDPOINT,
+                "completion_window": "24h"
+            })
+            self._check(response)
+            batch_id = response.json()["id"]
+        logger.info(f"Batch {batch_id}: 已提交 {len(requests)} 个请求 ({len(content)} 字节)")
+        return batch_id
+
+    async def wait(self, batch_id: str) -> Dict[str, Any]:
+        """轮询直到批量作业结束，返回批量作业对象"""
+        deadline = time.monotonic() + self.max_wait_seconds
+        async with self._http() as http:
+            while True:
+                response = await http.get(f"/batches/{batch_id}")
+                self._check(response)
+                batch = response.json()
+                counts = batch.get("request_counts") or {}
+                logger.info(f"Batch {batch_id}: 状态 {batch.get('status')}，完成 {counts.get('completed', 0)}/{counts.get('total', '?')}")
+                if batch.get("status") in BATCH_FINAL_STATUSES:
+                    return batch
+                if time.monotonic() > deadline:
+                    await http.post(f"/batches/{batch_id}/cancel")
+                    raise TimeoutError(f"批量作业 {batch_id} 超过 {self.max_wait_seconds} 秒未完成，已取消")
+                await asyncio.sleep(self.poll_interval)
+
+    async def fetch_results(self, batch: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """下载输出文件和错误文件，按custom_id返回补全结果（失败的请求只包含error）"""
+        results: Dict[str, Dict[str, Any]] = {}
+        async with self._http() as http:
+            for file_key in ("output_file_id", "error_file_id"):
+                file_id = batch.get(file_key)
+                if not file_id:
+                    continue
+                response = await http.get(f"/files/{file_id}/content")
+                self._check(response)
+                for line in response.text.splitlines():
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    results[record["custom_id"]] = self._parse_record(record)
+        return results
+
+    @staticmethod
+    def _parse_record(record: Dict[str, Any]) -> Dict[str, Any]:
+        response = record.get("response") or {}
+        body = response.get("body") or {}
+        if response.get("status_code") == 200 and body.get("choices"):
+            choice = body["choices"][0]
+            usage = body.get("usage") or {}
+            result = {
+                "content": (choice.get("message") or {}).get("content"),
+                "finish_reason": choice.get("finish_reason"),
+                "model": body.get("model"),
+                "usage": {
+                    "prompt_tokens": usage.get("prompt_tokens", 0),
+                    "completion_tokens": usage.get("completion_tokens", 0),
+                    "total_tokens": usage.get("total_tokens", 0)
+                },
+                "retries": 0,
+                "cached": False
+            }
+            if len(body["choices"]) > 1:
+                result["samples"] = [
+                    {"content": (c.get("message") or {}).get("content"), "finish_reason": c.get("finish_reason")}
+                    for c in sorted(body["choices"], key=lambda c: c.get("index") or 0)
+                ]
+            return result
+        error = record.get("error") or body.get("error") or {}
+        message = error.get("message") if isinstance(error, dict) else str(error)
+        return {"error": message or f"HTTP {response.get('status_code')}"}
+
+
+async def run_batch(
+    llm_client: LLMClient,
+    requests: Dict[str, Dict[str, Any]],
+    use_cache: bool = True,
+    batch_id: Optional[str] = None,
+    on_submitted: Optional[Callable[[str], None]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    执行一组补全请求：命中响应缓存的直接返回，其余通过批量API执行
+
+    Args:
+        llm_client: LLM客户端
+        requests: custom_id到请求参数的映射
+        use_cache: 是否使用响应缓存
+        batch_id: 已提交的批量作业ID（续跑时接管，不重复提交）
+        on_submitted: 新提交批量作业后的回调，用于持久化批量作业ID
+
+    Returns:
+        custom_id到补全结果的映射，结果格式与LLMClient._complete一致，失败时只包含error
+    """
+    cache = get_response_cache() if use_cache else None
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = dict(requests)
+    if cache:
+        def lookup():
+            return {custom_id: cache.get(llm_client.cache_key(body)) for custom_id, body in requests.items()}
+        for custom_id, cached in (await asyncio.to_thread(lookup)).items():
+            if cached is not None:
+                results[custom_id] = {**cached, "retries": 0, "cached": True}
+                pending.pop(custom_id)
+    if not pending:
+        return results
+
+    client = BatchAPIClient(llm_client)
+    if not batch_id:
+        batch_id = await client.submit(pending)
+        if on_submitted:
+            on_submitted(batch_id)
+    else:
+        logger.info(f"Batch {batch_id}: 接管已提交的批量作业")
+    batch = await client.wait(batch_id)
+    fetched = await client.fetch_results(batch)
+
+    to_cache = []
+    for custom_id, body in pending.items():
+        result = fetched.get(custom_id) or {"error": f"批量作业状态为 {batch.get('status')}，未返回该请求的结果"}
+        results[custom_id] = result
+        if cache and "error" not in result:
+            to_cache.append((llm_client.cache_key(body), {
+                key: result[key] for key in CACHED_RESULT_FIELDS if key in result
+            }))
+    if to_cache:
+        def store():
+            for cache_key, value in to_cache:
+                cache.set(cache_key, value)
+        await asyncio.to_thread(store)
+    return results
@@ -0,0 +1,77 @@
+"""
+选择题规则评分 - 从模型回答中解析所选选项，与标准答案比对后直接给分，无需调用评测模型
+无法可靠解析选项时返回None，由调用方交给评测模型
+"""
+import re
+from typing import Dict, Any, Iterable, Optional
+
+# 自动评分写入Evaluation时使用的评估者ID（不对应任何用户或模型）
+AUTO_EVALUATOR_ID = 0
+
+# 大写选项可直接出现；小写字母容易与英文单词混淆，只在括号中或后跟右括号时视为选项："(a)"、"a)"
+# 多个选项之间需有分隔（"A, C"、"A、C"、"A C"），每个字母后不能紧跟其他字母
+_UPPER_LIST = r'[A-H](?![A-Za-z])(?:(?:\s*[,，、和]\s*|\s+)[A-H](?![A-Za-z]))*'
+# 紧凑写法"AC"只在明确的答案标记之后接受，且字母须按顺序排列（"BAD"不是选项）
+_UPPER_RUN = r'[A-H]{2,8}(?![A-Za-z])'
+_ANY_OPTIONS = r'[A-Ha-h](?:\s*[,，、和]?\s*[A-Ha-h])*'
+_DELIMITED = r'[（(]\s*(' + _ANY_OPTIONS + r')\s*[)）]|(' + _ANY_OPTIONS + r')\s*[)）]'
+# 明确给出答案的写法："答案：B"、"答案是A、C"、"Answer: (b)"；选项后不能紧跟数字或算式符号（"答案: E=mc2"）
+_MARKED_PATTERN = re.compile(
+    r'(?i:答案|answer)\s*(?:是|为|(?i:is)|[:：])?\s*(?:' + _DELIMITED
+    + r'|(' + _UPPER_LIST + r'|' + _UPPER_RUN + r')(?![0-9_=+\-*/^<>]))'
+)
+# 整个回答以选项开头：只有选项"B"，或选项后紧跟标点/右括号："B. 选项内容"、"B、"、"A, C:"、"(A,C)"、"a)"
+_LEADING_PATTERN = re.compile(
+    r'^\s*(?:' + _DELIMITED + r'|(' + _UPPER_LIST + r')\s*(?:[.．、:：)）]|$))'
+)
+# 选项文本中直接相连的字母
+_ADJACENT_LETTERS = re.compile(r'[A-Ha-h]{2,}')
+
+
+def _selection(match: re.Match) -> Optional[str]:
+    """匹配到的选项（按字母排序后拼接）；相连的字母不是按顺序排列的不同选项时视为无法识别，返回None"""
+    option = next(group for group in match.groups() if group)
+    for run in _ADJACENT_LETTERS.findall(option):
+        letters = run.upper()
+        if any(a >= b for a, b in zip(letters, letters[1:])):
+            return None
+    return "".join(sorted(set(re.findall(r'[A-H]', option.upper()))))
+
+
+def extract_choice(text: Optional[str]) -> Optional[str]:
+    """
+    从回答中提取选项字母（多选按字母排序后拼接）
+
+    优先使用"答案：X"等明确写法，多处写法给出不同选项或选项写法不规范时视为无法识别；无法识别时返回None
+    """
+    if not text:
+        return None
+    marked = {_selection(match) for match in _MARKED_PATTERN.finditer(text)}
+    if marked:
+        return marked.pop() if len(marked) == 1 else None
+    match = _LEADING_PATTERN.match(text)
+    return _selection(match) if match else None
+
+
+def grade_choice(answer: Optional[str], std_answers: Iterable[str]) -> Optional[Dict[str, Any]]:
+    """
+    按规则评分选择题回答
+
+    Args:
+        answer: 模型回答
+        std_answers: 标准答案文本，任一标准答案的选项与回答一致即判为正确
+
+    Returns:
+        包含score和reasoning的字典；回答或标准答案无法解析出选项时返回None
+    """
+    selected = extract_choice(answer)
+    if not selected:
+        return None
+    expected = [choice for choice in (extract_choice(std) for std in std_answers) if choice]
+    if not expected:
+        return None
+    correct = selected in expected
+    return {
+        "score": 100.0 if correct else 0.0,
+        "reasoning": f"规则评分：回答选项 {selected}，标准答案 {'/'.join(expected)}，{'正确' if correct else '错误'}"
+    }
@@ -0,0 +1,69 @@
+"""
+数据集下载服务 - 逐条写出数据集版本的问题及其标签、答案和得分点
+优先直接复制快照文件中的记录，没有快照时按问题ID分页（keyset）查询数据库；
+支持JSON和NDJSON，可选gzip压缩，内存占用与数据集规模无关
+"""
+import json
+import logging
+from typing import Dict, Any, Iterator, List
+
+from ..db.database import SessionLocal
+from .dataset_snapshot import iter_question_pages, encode_question, load_dataset_snapshot
+from .task_export_service import gzip_chunks
+
+logger = logging.getLogger(__name__)
+
+
+def _json_chunks(dataset_info: Dict[str, Any], pages: Iterator[List[bytes]]) -> Iterator[bytes]:
+    """与原下载接口结构一致的JSON文档，questions数组逐条写出"""
+    yield ('{"dataset_info": ' + json.dumps(dataset_info, ensure_ascii=False) + ', "questions": [').encode("utf-8")
+    first = True
+    for page in pages:
+        parts = []
+        for record in page:
+            parts.append(b"\n" if first else b",\n")
+            parts.append(record)
+            first = False
+        yield b"".join(parts)
+    yield b'\n], "download_url": null}\n'
+
+
+def _ndjson_chunks(dataset_info: Dict[str, Any], pages: Iterator[List[bytes]]) -> Iterator[bytes]:
+    """第一行为 {"dataset_info": ...}，之后每个问题一行"""
+    yield (json.dumps({"dataset_info": dataset_info}, ensure_ascii=False) + "\n").encode("utf-8")
+    for page in pages:
+        yield b"".join(record + b"\n" for record in page)
+
+
+def stream_dataset(dataset_id: int, version: int, dataset_info: Dict[str, Any],
+                   export_format: str = "json", compress: bool = False) -> Iterator[bytes]:
+    """
+    生成数据集版本的下载内容
+
+    使用独立的数据库会话，响应开始传输后不依赖请求的会话。
+    """
+    db = SessionLocal()
+    snapshot = None
+    try:
+        snapshot = load_dataset_snapshot(db, dataset_id, version)
+        if snapshot is not None:
+            pages = snapshot.iter_raw_pages()
+        else:
+            pages = ([encode_question(item) for item in page] for page in iter_question_pages(db, dataset_id, version))
+        if export_format == "ndjson":
+            chunks = _ndjson_chunks(dataset_info, pages)
+        else:
+            chunks = _json_chunks(dataset_info, pages)
+        yield from (gzip_chunks(chunks) if compress else chunks)
+    except Exception as e:
+        logger.error(f"Dataset {dataset_id} v{version}: 下载失败: {str(e)}")
+        raise
+    finally:
+        if snapshot is not None:
+            snapshot.close()
+        db.close()
+
+
+def dataset_filename(dataset_id: int, version: int, export_format: str, compress: bool) -> str:
+    extension = {"json": "json", "ndjson": "jsonl"}[export_format]
+    return f"dataset_{dataset_id}_v{version}.{extension}" + (".gz" if compress else "")
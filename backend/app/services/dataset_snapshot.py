@@ -0,0 +1,301 @@
+"""
+数据集版本快照 - 读取数据集某版本的有效问题及其标签、答案和得分点
+版本提交后写入本地快照文件，之后的评测任务和下载通过mmap读取文件，不再查询数据库；没有可用文件时按问题ID分页查询
+
+文件结构：文件头 | 每个问题一条JSON记录 | 按问题ID排序的定长索引 | 元数据JSON
+文件名包含版本统计行的content_token，版本内容变化使统计行失效后，旧文件不再被使用
+"""
+import glob
+import json
+import logging
+import mmap
+import os
+import struct
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Any, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..db.database import SessionLocal
+from ..models.user import User
+from ..models.dataset import Dataset
+from ..models.std_question import StdQuestion
+from ..models.std_answer import StdAnswer, StdAnswerScoringPoint
+from ..models.tag import std_question_tag_association
+from ..crud.crud_dataset_version_stats import get_dataset_content_token
+from ..config.llm_config import EXPORT_PAGE_SIZE, DATASET_SNAPSHOT_DIR
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"DSSNAP01"
+# 魔数、问题数、索引偏移、元数据偏移
+_HEADER = struct.Struct("<8sIQQ")
+# 问题ID、记录偏移、记录长度
+_INDEX_ENTRY = struct.Struct("<qQI")
+
+
+def iter_question_pages(db: Session, dataset_id: int, version: int,
+                        page_size: int = EXPORT_PAGE_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    按问题ID分页（keyset）从数据库读取数据集某版本的有效问题
+
+    每页一次查询问题、一次查询标签、一次查询答案、一次查询得分点，
+    答案按版本区间过滤，与问题属于同一快照。
+    """
+    last_id = 0
+    while True:
+        questions = db.query(
+            StdQuestion.id, StdQuestion.body, StdQuestion.question_type
+        ).filter(
+            StdQuestion.dataset_id == dataset_id,
+            StdQuestion.is_valid == True,
+            StdQuestion.original_version_id <= version,
+            StdQuestion.current_version_id >= version,
+            StdQuestion.id > last_id
+        ).order_by(StdQuestion.id).limit(page_size).all()
+        if not questions:
+            return
+        last_id = questions[-1].id
+        question_ids = [q.id for q in questions]
+
+        tags = defaultdict(list)
+        for question_id, label in db.query(
+            std_question_tag_association.c.std_question_id, std_question_tag_association.c.tag_label
+        ).filter(
+            std_question_tag_association.c.std_question_id.in_(question_ids)
+        ).order_by(std_question_tag_association.c.std_question_id, std_question_tag_association.c.tag_label):
+            tags[question_id].append(label)
+
+        answers = db.query(
+            StdAnswer.id, StdAnswer.std_question_id, StdAnswer.answer, StdAnswer.answered_at,
+            StdAnswer.is_valid, User.username
+        ).outerjoin(User, User.id == StdAnswer.answered_by).filter(
+            StdAnswer.std_question_id.in_(question_ids),
+            StdAnswer.is_valid == True,
+            StdAnswer.original_version_id <= version,
+            StdAnswer.current_version_id >= version
+        ).order_by(StdAnswer.std_question_id, StdAnswer.id).all()
+
+        scoring_points = defaultdict(list)
+        if answers:
+            for point in db.query(
+                StdAnswerScoringPoint.id, StdAnswerScoringPoint.std_answer_id,
+                StdAnswerScoringPoint.answer, StdAnswerScoringPoint.point_order
+            ).filter(
+                StdAnswerScoringPoint.std_answer_id.in_([a.id for a in answers]),
+                StdAnswerScoringPoint.is_valid == True
+            ).order_by(StdAnswerScoringPoint.std_answer_id, StdAnswerScoringPoint.point_order, StdAnswerScoringPoint.id):
+                scoring_points[point.std_answer_id].append({
+                    "id": point.id,
+                    "answer": point.answer,
+                    "point_order": point.point_order
+                })
+
+        std_answers = defaultdict(list)
+        for answer in answers:
+            std_answers[answer.std_question_id].append({
+                "id": answer.id,
+                "answer": answer.answer,
+                "answered_by": answer.username or "unknown",
+                "answered_at": answer.answered_at.isoformat() if answer.answered_at else None,
+                "is_valid": answer.is_valid,
+                "scoring_points": scoring_points.get(answer.id, [])
+            })
+
+        yield [
+            {
+                "id": question.id,
+                "question": question.body,
+                "question_type": question.question_type,
+                "tags": tags.get(question.id, []),
+                "std_answer": std_answers.get(question.id, [])
+            }
+            for question in questions
+        ]
+
+
+def encode_question(item: Dict[str, Any]) -> bytes:
+    """问题记录的JSON编码，快照文件和数据库分页下载使用同一编码"""
+    return json.dumps(item, ensure_ascii=False).encode("utf-8")
+
+
+class SnapshotQuestion:
+    """快照中的一个问题，保存记录的JSON编码（不引用文件），首次访问内容时才解码"""
+    __slots__ = ("id", "_raw", "_record")
+
+    def __init__(self, question_id: int, raw: bytes):
+        self.id = question_id
+        self._raw = raw
+        self._record = None
+
+    @property
+    def record(self) -> Dict[str, Any]:
+        if self._record is None:
+            self._record = json.loads(self._raw)
+            self._raw = None
+        return self._record
+
+    @property
+    def body(self) -> str:
+        return self.record["question"]
+
+    @property
+    def question_type(self) -> str:
+        return self.record["question_type"]
+
+    @property
+    def tags(self) -> List[str]:
+        return self.record["tags"]
+
+    @property
+    def std_answers(self) -> List[Dict[str, Any]]:
+        return self.record["std_answer"]
+
+
+class DatasetSnapshot:
+    """只读的快照文件，通过mmap访问；记录按问题ID排序"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count, self._index_offset, self._meta_offset = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC:
+            self._mmap.close()
+            raise ValueError(f"不是数据集快照文件: {path}")
+        self.path = path
+        self.meta = json.loads(self._mmap[self._meta_offset:])
+        self._ids: Optional[List[int]] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, position: int):
+        return _INDEX_ENTRY.unpack_from(self._mmap, self._index_offset + position * _INDEX_ENTRY.size)
+
+    def question_ids(self) -> List[int]:
+        if self._ids is None:
+            index = self._mmap[self._index_offset:self._index_offset + self._count * _INDEX_ENTRY.size]
+            self._ids = [question_id for question_id, _, _ in _INDEX_ENTRY.iter_unpack(index)]
+        return self._ids
+
+    def raw_record(self, position: int) -> bytes:
+        """第position个问题的JSON编码"""
+        _, offset, length = self._entry(position)
+        return self._mmap[offset:offset + length]
+
+    def get(self, question_id: int) -> Optional[Dict[str, Any]]:
+        """按问题ID读取记录（二分查找索引）"""
+        ids = self.question_ids()
+        position = bisect_left(ids, question_id)
+        if position < len(ids) and ids[position] == question_id:
+            return json.loads(self.raw_record(position))
+        return None
+
+    def questions(self, limit: Optional[int] = None) -> List[SnapshotQuestion]:
+        """按问题ID顺序的前limit个问题，记录复制出文件（关闭快照后仍可使用），内容在访问时才解码"""
+        ids = self.question_ids()
+        count = min(limit, len(ids)) if limit else len(ids)
+        return [SnapshotQuestion(ids[position], self.raw_record(position)) for position in range(count)]
+
+    def iter_raw_pages(self, page_size: int = EXPORT_PAGE_SIZE) -> Iterator[List[bytes]]:
+        """按页返回记录的JSON编码，用于直接写出下载内容"""
+        for start in range(0, self._count, page_size):
+            yield [self.raw_record(position) for position in range(start, min(start + page_size, self._count))]
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self) -> "DatasetSnapshot":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _snapshot_path(dataset_id: int, version: int, token: str) -> str:
+    return os.path.join(DATASET_SNAPSHOT_DIR, f"dataset_{dataset_id}_v{version}_{token}.snap")
+
+
+def write_snapshot(db: Session, dataset_id: int, version: int, token: str) -> str:
+    """
+    从数据库分页读取版本内容写入快照文件，先写临时文件再重命名，读取方不会看到未写完的文件
+
+    Returns:
+        快照文件路径
+    """
+    os.makedirs(DATASET_SNAPSHOT_DIR, exist_ok=True)
+    path = _snapshot_path(dataset_id, version, token)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    index = []
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, 0, 0, 0))
+            offset = _HEADER.size
+            for page in iter_question_pages(db, dataset_id, version):
+                for item in page:
+                    data = encode_question(item)
+                    f.write(data)
+                    index.append((item["id"], offset, len(data)))
+                    offset += len(data)
+            index_offset = offset
+            f.write(b"".join(_INDEX_ENTRY.pack(*entry) for entry in index))
+            meta_offset = index_offset + len(index) * _INDEX_ENTRY.size
+            f.write(json.dumps({"dataset_id": dataset_id, "version": version, "content_token": token}).encode("utf-8"))
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, len(index), index_offset, meta_offset))
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    logger.info(f"Dataset {dataset_id} v{version}: 快照已写入 {path}，{len(index)} 个问题")
+    _remove_stale_snapshots(dataset_id, version, path)
+    return path
+
+
+def _remove_stale_snapshots(dataset_id: int, version: int, current_path: str):
+    """删除同一版本内容变化前的快照文件（仍被其他进程映射时跳过）"""
+    for path in glob.glob(os.path.join(DATASET_SNAPSHOT_DIR, f"dataset_{dataset_id}_v{version}_*.snap")):
+        if path == current_path:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def load_dataset_snapshot(db: Session, dataset_id: int, version: int) -> Optional[DatasetSnapshot]:
+    """
+    打开数据集版本当前内容的快照文件，没有时先写入
+
+    未配置快照目录、版本不存在或读写失败时返回None，调用方改为查询数据库
+    """
+    if not DATASET_SNAPSHOT_DIR:
+        return None
+    try:
+        dataset = db.query(Dataset).filter(Dataset.id == dataset_id, Dataset.version == version).first()
+        if not dataset:
+            return None
+        token = get_dataset_content_token(db, dataset)
+        if not token:
+            return None
+        path = _snapshot_path(dataset_id, version, token)
+        if not os.path.exists(path):
+            write_snapshot(db, dataset_id, version, token)
+        return DatasetSnapshot(path)
+    except Exception as e:
+        logger.warning(f"Dataset {dataset_id} v{version}: 快照不可用，改为查询数据库: {str(e)}")
+        return None
+
+
+def materialize_dataset_snapshot(dataset_id: int, version: int):
+    """版本提交后写入快照文件（后台任务，使用独立的数据库会话）"""
+    db = SessionLocal()
+    try:
+        snapshot = load_dataset_snapshot(db, dataset_id, version)
+        if snapshot:
+            snapshot.close()
+    finally:
+        db.close()
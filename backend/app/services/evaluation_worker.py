@@ -0,0 +1,160 @@
+"""
+评测worker - 在独立进程中从作业队列领取评测任务并执行
+一个worker在同一个事件循环中并发运行多个作业，需要更多容量时启动更多worker进程即可
+"""
+import asyncio
+import os
+import signal
+import socket
+import logging
+from typing import Dict, Optional
+
+from ..db.database import SessionLocal
+from ..models.evaluation_job import EvaluationJob, JobType, JobStatus
+from ..crud.crud_evaluation_job import claim_evaluation_job, renew_job_lease, finish_evaluation_job
+from ..config.llm_config import WORKER_MAX_JOBS, JOB_LEASE_SECONDS, WORKER_POLL_SECONDS
+from .llm_evaluation_service import task_processor
+
+logger = logging.getLogger(__name__)
+
+
+class EvaluationWorker:
+    """评测作业worker"""
+
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        max_jobs: int = WORKER_MAX_JOBS,
+        lease_seconds: int = JOB_LEASE_SECONDS,
+        poll_interval: float = WORKER_POLL_SECONDS
+    ):
+        """
+        初始化worker
+
+        Args:
+            worker_id: worker标识，默认为 主机名:进程号
+            max_jobs: 同时运行的作业数
+            lease_seconds: 作业租约时长，worker每隔三分之一租约时长续约一次
+            poll_interval: 队列为空时的轮询间隔（秒）
+        """
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.max_jobs = max(1, max_jobs)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.running_jobs: Dict[int, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        """停止领取新作业，正在运行的作业释放回队列"""
+        logger.info(f"Worker {self.worker_id}: 收到停止信号")
+        self._stopping.set()
+
+    async def run(self):
+        """主循环：有空闲槽位时领取作业"""
+        logger.info(f"Worker {self.worker_id}: 启动，最大并发作业数 {self.max_jobs}")
+        task_processor.resume_interrupted_tasks()
+        try:
+            while not self._stopping.is_set():
+                job = None
+                if len(self.running_jobs) < self.max_jobs:
+                    job = self._claim()
+                if job:
+                    self.running_jobs[job.id] = asyncio.create_task(self._run_job(job))
+                    continue
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for job_task in self.running_jobs.values():
+                job_task.cancel()
+            if self.running_jobs:
+                await asyncio.gather(*self.running_jobs.values(), return_exceptions=True)
+            logger.info(f"Worker {self.worker_id}: 已退出")
+
+    def _claim(self) -> Optional[EvaluationJob]:
+        db = SessionLocal()
+        try:
+            job = claim_evaluation_job(db, self.worker_id, self.lease_seconds)
+            if job:
+                db.expunge(job)
+                logger.info(f"Worker {self.worker_id}: 领取作业 {job.id} (task {job.task_id}, {job.job_type.value}, 第{job.attempts}次)")
+            return job
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Worker {self.worker_id}: 领取作业失败: {str(e)}")
+            return None
+        finally:
+            db.close()
+
+    def _finish(self, job_id: int, job_status: JobStatus, error_message: Optional[str] = None):
+        db = SessionLocal()
+        try:
+            if not finish_evaluation_job(db, job_id, self.worker_id, job_status, error_message):
+                logger.warning(f"Worker {self.worker_id}: 作业 {job_id} 的租约已不属于本worker")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Worker {self.worker_id}: 更新作业 {job_id} 状态失败: {str(e)}")
+        finally:
+            db.close()
+
+    async def _heartbeat(self, job_id: int, job_task: asyncio.Task):
+        """定期续约；租约被其他worker接管时取消本地执行"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            db = SessionLocal()
+            try:
+                renewed = renew_job_lease(db, job_id, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Worker {self.worker_id}: 作业 {job_id} 续约失败: {str(e)}")
+                continue
+            finally:
+                db.close()
+            if not renewed:
+                logger.error(f"Worker {self.worker_id}: 作业 {job_id} 的租约已丢失，停止执行")
+                job_task.cancel()
+                return
+
+    def _execute(self, job: EvaluationJob):
+        if job.job_type == JobType.GENERATE:
+            return task_processor.process_evaluation_task_async(job.task_id, job.question_limit)
+        if job.job_type == JobType.EVALUATE:
+            return task_processor.process_answer_evaluation_async(job.task_id)
+        if job.job_type == JobType.FANOUT:
+            return task_processor.process_fanout_async(job.task_id, job.question_limit)
+        return task_processor.resume_task_async(job.task_id)
+
+    async def _run_job(self, job: EvaluationJob):
+        job_task = asyncio.create_task(self._execute(job))
+        heartbeat = asyncio.create_task(self._heartbeat(job.id, job_task))
+        try:
+            await job_task
+            self._finish(job.id, JobStatus.DONE)
+            logger.info(f"Worker {self.worker_id}: 作业 {job.id} 完成")
+        except asyncio.CancelledError:
+            # worker停止或租约丢失：已写入的结果会保留，作业释放回队列后从中断处续跑
+            job_task.cancel()
+            self._finish(job.id, JobStatus.QUEUED)
+        except Exception as e:
+            logger.error(f"Worker {self.worker_id}: 作业 {job.id} 失败: {str(e)}")
+            self._finish(job.id, JobStatus.FAILED, str(e))
+        finally:
+            heartbeat.cancel()
+            self.running_jobs.pop(job.id, None)
+
+
+def run_worker(max_jobs: int = WORKER_MAX_JOBS):
+    """worker进程入口"""
+    async def main():
+        worker = EvaluationWorker(max_jobs=max_jobs)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, worker.stop)
+            except NotImplementedError:
+                # Windows不支持add_signal_handler，Ctrl+C时由KeyboardInterrupt退出
+                pass
+        await worker.run()
+
+    asyncio.run(main())
@@ -3,23 +3,64 @@ LLM客户端服务 - 支持OpenAI兼容的API调用
 包括阿里云通义千问、OpenAI、以及其他兼容的API提供商
 """
 import os
+import time
 import asyncio
 import logging
+import re
 import string
-from typing import Dict, Any, Optional, List, Union
-from openai import AsyncOpenAI
+from typing import Dict, Any, Optional, List, Union, Callable
+from openai import AsyncOpenAI, APIStatusError, APIConnectionError, APITimeoutError
 from decimal import Decimal
 import json
 
-from ..config.llm_config import get_default_evaluation_prompt, calculate_cost
+from ..config.llm_config import (
+    get_default_evaluation_prompt, calculate_cost,
+    DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, DEFAULT_MAX_RETRIES
+)
+from .rate_limiter import get_rate_limiter, estimate_tokens, backoff_delay, parse_retry_after
+from .response_cache import ResponseCache, get_response_cache
 
 logger = logging.getLogger(__name__)
 
+# 写入响应缓存的补全结果字段（逐条调用和批量API共用）
+CACHED_RESULT_FIELDS = ("content", "finish_reason", "model", "usage", "samples")
+
+# 不支持n参数（报错或只返回一个样本）的端点+模型，之后直接并行请求
+_n_unsupported: set = set()
+
+# 错误信息中单独出现的参数名n（如 "Unrecognized request argument supplied: n"、'param': 'n'）
+_N_PARAM_PATTERN = re.compile(r'(?<![\w-])n(?![\w-])')
+
+
+def _rejects_n_param(error: APIStatusError) -> bool:
+    """请求错误是否由n参数引起；上下文超长、内容过滤等与问题相关的错误不应关闭n参数"""
+    return error.param == "n" or bool(_N_PARAM_PATTERN.search(error.message or ""))
+
+
+def classify_failure(error: Exception) -> str:
+    """把调用异常归类为简短的失败原因，用于按原因统计"""
+    if isinstance(error, APITimeoutError):
+        return "timeout"
+    if isinstance(error, APIConnectionError):
+        return "connection_error"
+    if isinstance(error, APIStatusError):
+        return "rate_limited" if error.status_code == 429 else f"http_{error.status_code}"
+    return error.__class__.__name__
+
 
 class LLMClient:
     """LLM客户端，支持多种API提供商"""
     
-    def __init__(self, api_key: str, base_url: str = None, model_name: str = "qwen-plus", cost_per_1k_tokens: float = 0.0006):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = None,
+        model_name: str = "qwen-plus",
+        cost_per_1k_tokens: float = 0.0006,
+        requests_per_minute: Optional[int] = DEFAULT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: Optional[int] = DEFAULT_TOKENS_PER_MINUTE,
+        max_retries: int = DEFAULT_MAX_RETRIES
+    ):
         """
         初始化LLM客户端
         
@@ -28,19 +69,184 @@ class LLMClient:
             base_url: API基础URL，默认为阿里云通义千问
             model_name: 模型名称
             cost_per_1k_tokens: 每1k tokens的成本
+            requests_per_minute: 每分钟请求数上限（同一端点+模型的所有客户端共享）
+            tokens_per_minute: 每分钟token数上限（同一端点+模型的所有客户端共享）
+            max_retries: 可重试错误（429、超时、5xx）的最大重试次数
         """
         self.model_name = model_name
         self.api_key = api_key
         self.cost_per_1k_tokens = cost_per_1k_tokens
+        self.max_retries = max_retries
         
         # 默认使用阿里云通义千问的API端点
         if not base_url:
             base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+        self.base_url = base_url
         
+        # 重试由本客户端统一处理，关闭SDK自带的重试
         self.client = AsyncOpenAI(
             api_key=api_key,
-            base_url=base_url
+            base_url=base_url,
+            max_retries=0
         )
+        self.rate_limiter = get_rate_limiter(base_url, model_name, requests_per_minute, tokens_per_minute)
+    
+    async def _create_completion(self, api_params: Dict[str, Any], on_delta: Optional[Callable[[str], None]] = None):
+        """
+        经过限流和重试调用chat.completions.create
+        
+        Args:
+            api_params: 请求参数
+            on_delta: 流式回调，提供时以流式方式调用，每收到一段内容调用一次
+        
+        Returns:
+            (补全结果字典, 重试次数)
+        """
+        estimated = estimate_tokens(api_params.get("messages", []), api_params.get("max_tokens", 0))
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(estimated)
+            emitted = False
+            
+            def on_delta_tracked(delta: str):
+                nonlocal emitted
+                emitted = True
+                on_delta(delta)
+            
+            try:
+                if on_delta is None:
+                    result = self._completion_to_dict(await self.client.chat.completions.create(**api_params))
+                else:
+                    result = await self._stream_completion(api_params, on_delta_tracked)
+            except Exception as e:
+                # 失败的请求不计入token用量
+                self.rate_limiter.settle(estimated, 0)
+                status_code = getattr(e, "status_code", None)
+                retryable = isinstance(e, APIConnectionError) or (
+                    isinstance(e, APIStatusError) and (status_code in (408, 409, 429) or status_code >= 500)
+                )
+                # 流式输出已经开始后不再重试，避免部分内容重复
+                if not retryable or emitted or attempt >= self.max_retries:
+                    raise
+                
+                retry_after = parse_retry_after(e.response.headers) if isinstance(e, APIStatusError) else None
+                delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                if status_code == 429:
+                    # 限流时暂停所有共享该端点的客户端
+                    self.rate_limiter.penalize(delay)
+                attempt += 1
+                logger.warning(f"{self.model_name}: 调用失败({status_code or e.__class__.__name__})，{delay:.2f}s 后第{attempt}次重试")
+                await asyncio.sleep(delay)
+                continue
+            
+            actual = result["usage"]["total_tokens"] or estimated
+            self.rate_limiter.settle(estimated, actual)
+            self.rate_limiter.record_success()
+            return result, attempt
+    
+    @staticmethod
+    def _completion_to_dict(completion) -> Dict[str, Any]:
+        """把非流式补全对象转换为结果字典，请求多个样本（n>1）时samples包含全部样本"""
+        result = {
+            "content": completion.choices[0].message.content,
+            "finish_reason": completion.choices[0].finish_reason,
+            "model": completion.model,
+            "usage": {
+                "prompt_tokens": completion.usage.prompt_tokens if completion.usage else 0,
+                "completion_tokens": completion.usage.completion_tokens if completion.usage else 0,
+                "total_tokens": completion.usage.total_tokens if completion.usage else 0
+            },
+            "raw_response": completion.model_dump() if hasattr(completion, 'model_dump') else str(completion)
+        }
+        if len(completion.choices) > 1:
+            result["samples"] = [
+                {"content": choice.message.content, "finish_reason": choice.finish_reason}
+                for choice in sorted(completion.choices, key=lambda c: c.index or 0)
+            ]
+        return result
+    
+    async def _stream_completion(self, api_params: Dict[str, Any], on_delta: Callable[[str], None]) -> Dict[str, Any]:
+        """流式调用补全接口，记录首token耗时和生成速度"""
+        start = time.monotonic()
+        first_token_at = None
+        parts = []
+        finish_reason = None
+        model = None
+        usage = None
+        stream = await self.client.chat.completions.create(**api_params, stream=True)
+        async for chunk in stream:
+            model = chunk.model or model
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            delta = choice.delta.content if choice.delta else None
+            if delta:
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                parts.append(delta)
+                on_delta(delta)
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+        end = time.monotonic()
+        
+        # 提供商未返回usage时按提示词长度和内容块数估算
+        completion_tokens = usage.completion_tokens if usage else len(parts)
+        prompt_tokens = usage.prompt_tokens if usage else estimate_tokens(api_params.get("messages", []), 0)
+        generation_seconds = end - first_token_at if first_token_at else 0
+        return {
+            "content": "".join(parts),
+            "finish_reason": finish_reason,
+            "model": model,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": usage.total_tokens if usage else prompt_tokens + completion_tokens
+            },
+            "first_token_ms": int((first_token_at - start) * 1000) if first_token_at else None,
+            "tokens_per_second": round(completion_tokens / generation_seconds, 2) if generation_seconds > 0 else None
+        }
+    
+    def cache_key(self, api_params: Dict[str, Any]) -> str:
+        """请求参数对应的响应缓存键"""
+        return ResponseCache.make_key({"base_url": self.base_url, **api_params})
+    
+    async def _complete(
+        self,
+        api_params: Dict[str, Any],
+        use_cache: bool = True,
+        on_delta: Optional[Callable[[str], None]] = None,
+        cache_variant: Optional[Union[int, tuple]] = None
+    ) -> Dict[str, Any]:
+        """
+        调用补全接口，命中响应缓存时直接返回缓存结果
+        
+        cache_variant用于区分同一请求的多次采样（样本序号，n参数请求时为序号元组），使每个样本各自缓存；
+        只有序号0和None使用不带序号的缓存键
+        
+        Returns:
+            包含content、finish_reason、model、usage、retries、cached的字典，
+            流式调用时还包含first_token_ms和tokens_per_second
+        """
+        cache = get_response_cache() if use_cache else None
+        cache_key = None
+        if cache:
+            cache_key = self.cache_key(api_params if cache_variant in (None, 0) else {**api_params, "sample": cache_variant})
+            cached = await asyncio.to_thread(cache.get, cache_key)
+            if cached is not None:
+                return {**cached, "retries": 0, "cached": True}
+        
+        result, retries = await self._create_completion(api_params, on_delta)
+        if cache:
+            await asyncio.to_thread(cache.set, cache_key, {
+                key: result[key] for key in CACHED_RESULT_FIELDS if key in result
+            })
+        return {
+            **result,
+            "retries": retries,
+            "cached": False
+        }
         
     async def generate_answer(
         self, 
@@ -50,6 +256,9 @@ class LLMClient:
         max_tokens: int = 2000,
         top_k: int = 50,
         enable_reasoning: bool = False,
+        use_cache: bool = True,
+        on_delta: Optional[Callable[[str], None]] = None,
+        cache_variant: Optional[int] = None,
         **kwargs
     ) -> Dict[str, Any]:
         """
@@ -62,70 +271,183 @@ class LLMClient:
             max_tokens: 最大token数
             top_k: Top-K采样
             enable_reasoning: 启用推理模式
+            use_cache: 是否使用响应缓存
+            on_delta: 提供时使用流式调用，每收到一段内容调用一次
+            cache_variant: 多次采样时的样本序号，使各样本分别缓存
             **kwargs: 其他参数
             
         Returns:
             包含回答内容和元数据的字典
         """
         try:
-            messages = []
-            
-            # 添加系统提示词
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            
-            # 添加用户问题
-            messages.append({"role": "user", "content": question})
-            
-            # 准备API参数
-            api_params = {
-                "model": self.model_name,
-                "messages": messages,
-                "temperature": temperature,
-                "max_tokens": max_tokens,
-                **kwargs
-            }
-            
-            # 添加top_k参数（如果支持）
-            if top_k and top_k != 50:  # 只在非默认值时添加
-                api_params["top_k"] = top_k
-            
-            # 添加推理模式参数（如果支持）
-            if enable_reasoning:
-                api_params["enable_reasoning"] = True
+            api_params = self.build_answer_request(
+                question, system_prompt, temperature, max_tokens, top_k, enable_reasoning, **kwargs
+            )
             
             # 调用API
-            completion = await self.client.chat.completions.create(**api_params)
-            
-            # 提取回答内容
-            answer_content = completion.choices[0].message.content            # 计算使用量和成本
-            usage_info = {
-                "prompt_tokens": completion.usage.prompt_tokens if completion.usage else 0,
-                "completion_tokens": completion.usage.completion_tokens if completion.usage else 0,
-                "total_tokens": completion.usage.total_tokens if completion.usage else 0
-            }
-            # 使用实例的成本参数
-            cost = calculate_cost(usage_info, self.cost_per_1k_tokens)
-            
-            # 返回结果
-            return {
-                "success": True,
-                "answer": answer_content,
-                "usage": usage_info,
-                "cost": cost,
-                "model": completion.model,
-                "finish_reason": completion.choices[0].finish_reason,
-                "prompt_used": system_prompt,
-                "raw_response": completion.model_dump() if hasattr(completion, 'model_dump') else str(completion)
-            }
+            completion = await self._complete(api_params, use_cache, on_delta, cache_variant)
+            return self.answer_result(completion, system_prompt)
             
         except Exception as e:
             logger.error(f"Error generating answer: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "answer": None
+            return self.failed_answer(e)
+    
+    @staticmethod
+    def failed_answer(error: Exception) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": str(error),
+            "failure_reason": classify_failure(error),
+            "answer": None
+        }
+    
+    async def generate_samples(
+        self,
+        question: str,
+        sample_indexes: List[int],
+        system_prompt: str = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        top_k: int = 50,
+        enable_reasoning: bool = False,
+        use_cache: bool = True,
+        on_delta: Optional[Callable[[str], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        为同一问题生成sample_indexes中各序号的样本（pass@k / 多数投票）
+        
+        优先用n参数一次请求取回全部样本；提供商不支持n参数或返回的样本不足时，
+        剩余样本改为并行的单独请求。只生成一个样本时与generate_answer相同（可流式）。
+        续跑时只传入缺少的序号，样本序号参与缓存键，不会取回已有样本的缓存结果。
+        
+        Returns:
+            与sample_indexes一一对应、与generate_answer格式相同的结果
+        """
+        count = len(sample_indexes)
+        if count <= 1:
+            return [await self.generate_answer(
+                question, system_prompt, temperature, max_tokens, top_k, enable_reasoning, use_cache, on_delta,
+                cache_variant=sample_indexes[0] if sample_indexes else None
+            )]
+        
+        results: List[Dict[str, Any]] = []
+        endpoint = (self.base_url, self.model_name)
+        if endpoint not in _n_unsupported:
+            api_params = self.build_answer_request(
+                question, system_prompt, temperature, max_tokens, top_k, enable_reasoning, n=count
+            )
+            # 从0开始的完整序号沿用原缓存键，续跑时的部分序号单独缓存
+            cache_variant = None if sample_indexes == list(range(count)) else tuple(sample_indexes)
+            try:
+                completion = await self._complete(api_params, use_cache, cache_variant=cache_variant)
+                results = self.sample_results(completion, system_prompt)[:count]
+            except APIStatusError as e:
+                if e.status_code not in (400, 422) or not _rejects_n_param(e):
+                    logger.error(f"Error generating samples: {str(e)}")
+                    return [self.failed_answer(e) for _ in range(count)]
+            except Exception as e:
+                logger.error(f"Error generating samples: {str(e)}")
+                return [self.failed_answer(e) for _ in range(count)]
+            if len(results) < count:
+                logger.info(f"{self.model_name}: 不支持n参数，改为并行请求各个样本")
+                _n_unsupported.add(endpoint)
+        
+        results += await asyncio.gather(*(
+            self.generate_answer(
+                question, system_prompt, temperature, max_tokens, top_k, enable_reasoning, use_cache,
+                cache_variant=sample_index
+            )
+            for sample_index in sample_indexes[len(results):]
+        ))
+        return results
+    
+    def sample_results(self, completion: Dict[str, Any], system_prompt: str = None) -> List[Dict[str, Any]]:
+        """
+        把可能包含多个样本的补全结果拆分为每个样本一个结果
+        
+        提示词token只计入第一个样本，输出token平均分摊，各样本之和等于整次调用的用量。
+        """
+        samples = completion.get("samples") or [
+            {"content": completion["content"], "finish_reason": completion["finish_reason"]}
+        ]
+        usage = completion["usage"]
+        completion_tokens = usage.get("completion_tokens") or 0
+        share, remainder = divmod(completion_tokens, len(samples))
+        results = []
+        for i, sample in enumerate(samples):
+            sample_usage = {
+                "prompt_tokens": (usage.get("prompt_tokens") or 0) if i == 0 else 0,
+                "completion_tokens": share + (remainder if i == 0 else 0)
             }
+            sample_usage["total_tokens"] = sample_usage["prompt_tokens"] + sample_usage["completion_tokens"]
+            results.append(self.answer_result({
+                **completion,
+                "content": sample["content"],
+                "finish_reason": sample["finish_reason"],
+                "usage": sample_usage,
+                "retries": completion.get("retries", 0) if i == 0 else 0
+            }, system_prompt))
+        return results
+    
+    def build_answer_request(
+        self,
+        question: str,
+        system_prompt: str = None,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        top_k: int = 50,
+        enable_reasoning: bool = False,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """构建生成回答的请求参数（逐条调用和批量API共用）"""
+        messages = []
+        
+        # 添加系统提示词
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        
+        # 添加用户问题
+        messages.append({"role": "user", "content": question})
+        
+        # 准备API参数
+        api_params = {
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            **kwargs
+        }
+        
+        # 添加top_k参数（如果支持）
+        if top_k and top_k != 50:  # 只在非默认值时添加
+            api_params["top_k"] = top_k
+        
+        # 添加推理模式参数（如果支持）
+        if enable_reasoning:
+            api_params["enable_reasoning"] = True
+        return api_params
+    
+    def answer_result(self, completion: Dict[str, Any], system_prompt: str = None) -> Dict[str, Any]:
+        """把补全结果转换为generate_answer的返回格式"""
+        # 计算使用量和成本，命中缓存时没有实际花费
+        usage_info = completion["usage"]
+        cost = 0.0 if completion["cached"] else calculate_cost(usage_info, self.cost_per_1k_tokens)
+        
+        # 返回结果
+        return {
+            "success": True,
+            "answer": completion["content"],
+            "usage": usage_info,
+            "cost": cost,
+            "model": completion["model"],
+            "finish_reason": completion["finish_reason"],
+            "prompt_used": system_prompt,
+            "retries": completion["retries"],
+            "cached": completion["cached"],
+            "first_token_ms": completion.get("first_token_ms"),
+            "tokens_per_second": completion.get("tokens_per_second"),
+            "raw_response": completion.get("raw_response")
+        }
     
     async def evaluate_answer(
         self,
@@ -134,6 +456,7 @@ class LLMClient:
         evaluation_prompt: str = None,
         correct_answer: str = None,
         question_type: str = "text",
+        use_cache: bool = True,
         **kwargs
     ) -> Dict[str, Any]:
         """
@@ -144,89 +467,20 @@ class LLMClient:
             answer: 待评测的答案            evaluation_prompt: 评测提示词
             correct_answer: 标准答案（用于参考）
             question_type: 问题类型 (choice/text)
+            use_cache: 是否使用响应缓存
             **kwargs: 其他参数
             
         Returns:
             包含评分和评测详情的字典
         """
         try:
-            # 构建评测提示词
-            if not evaluation_prompt:
-                evaluation_prompt = get_default_evaluation_prompt(question_type)
-
-            # 安全地格式化评测提示词
-            try:
-                evaluation_content = evaluation_prompt.format(
-                    question=str(question),
-                    answer=str(answer),
-                    correct_answer=str(correct_answer or "")
-                )
-            except (KeyError, ValueError) as format_error:
-                logger.warning(f"Failed to format evaluation prompt: {format_error}")
-                # 如果格式化失败，使用简单的字符串拼接
-                evaluation_content = f"""
-请评估以下回答的质量：
-
-问题：{question}
-回答：{answer}
-标准答案：{correct_answer or "无"}
-
-请按照JSON格式返回评分结果：
-{{"score": 分数(0-100), "reasoning": "评分理由"}}
-"""
-            
-            messages = [
-                {"role": "system", "content": "你是一个专业的问答评测专家，请客观公正地评测答案质量。"},
-                {"role": "user", "content": evaluation_content}
-            ]
-            
-            # 调用API进行评测
-            completion = await self.client.chat.completions.create(
-                model=self.model_name,                messages=messages,
-                temperature=0.3,  # 评测时使用较低的temperature保证一致性
-                max_tokens=1000,
-                **kwargs
+            api_params, evaluation_content = self.build_evaluation_request(
+                question, answer, evaluation_prompt, correct_answer, question_type, **kwargs
             )
-            evaluation_text = completion.choices[0].message.content
-            
-            # 尝试解析JSON格式的评测结果
-            try:
-                # 清理可能的markdown格式标记
-                clean_text = evaluation_text.strip()
-                if clean_text.startswith('```json'):
-                    clean_text = clean_text.replace('```json', '').replace('```', '').strip()
-                elif clean_text.startswith('```'):
-                    clean_text = clean_text.replace('```', '').strip()
-                
-                # 改进的JSON解析逻辑
-                evaluation_result = self._parse_evaluation_json(clean_text)
-                
-                score = float(evaluation_result.get("score", 0))
-                reasoning = evaluation_result.get("reasoning", "")
-                
-            except (json.JSONDecodeError, ValueError) as e:
-                logger.warning(f"Failed to parse JSON evaluation result: {str(e)}")
-                logger.warning(f"Raw evaluation text: {evaluation_text}")
-                # 如果不是JSON格式，尝试从文本中提取分数
-                score = self._extract_score_from_text(evaluation_text)
-                reasoning = evaluation_text
-                
-            usage_info = {
-                "prompt_tokens": completion.usage.prompt_tokens if completion.usage else 0,
-                "completion_tokens": completion.usage.completion_tokens if completion.usage else 0,
-                "total_tokens": completion.usage.total_tokens if completion.usage else 0
-            }
-            cost = calculate_cost(usage_info, self.cost_per_1k_tokens)
             
-            return {
-                "success": True,
-                "score": min(100, max(0, score)),  # 确保分数在0-100范围内
-                "reasoning": reasoning,
-                "evaluation_prompt": evaluation_content,
-                "raw_evaluation": evaluation_text,
-                "usage": usage_info,
-                "cost": cost
-            }
+            # 调用API进行评测
+            completion = await self._complete(api_params, use_cache)
+            return self.evaluation_result(completion, evaluation_content)
             
         except Exception as e:
             logger.error(f"Error evaluating answer: {str(e)}")
@@ -243,9 +497,105 @@ class LLMClient:
             return {
                 "success": False,
                 "error": str(e),
+                "failure_reason": classify_failure(e),
                 "score": 0,
                 "reasoning": f"评测过程中发生错误: {str(e)}",
             }
+    
+    def build_evaluation_request(
+        self,
+        question: str,
+        answer: str,
+        evaluation_prompt: str = None,
+        correct_answer: str = None,
+        question_type: str = "text",
+        **kwargs
+    ):
+        """
+        构建评测请求参数（逐条调用和批量API共用）
+        
+        Returns:
+            (API参数, 格式化后的评测提示词)
+        """
+        # 构建评测提示词
+        if not evaluation_prompt:
+            evaluation_prompt = get_default_evaluation_prompt(question_type)
+
+        # 安全地格式化评测提示词
+        try:
+            evaluation_content = evaluation_prompt.format(
+                question=str(question),
+                answer=str(answer),
+                correct_answer=str(correct_answer or "")
+            )
+        except (KeyError, ValueError) as format_error:
+            logger.warning(f"Failed to format evaluation prompt: {format_error}")
+            # 如果格式化失败，使用简单的字符串拼接
+            evaluation_content = f"""
+请评估以下回答的质量：
+
+问题：{question}
+回答：{answer}
+标准答案：{correct_answer or "无"}
+
+请按照JSON格式返回评分结果：
+{{"score": 分数(0-100), "reasoning": "评分理由"}}
+"""
+        
+        messages = [
+            {"role": "system", "content": "你是一个专业的问答评测专家，请客观公正地评测答案质量。"},
+            {"role": "user", "content": evaluation_content}
+        ]
+        api_params = {
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": 0.3,  # 评测时使用较低的temperature保证一致性
+            "max_tokens": 1000,
+            **kwargs
+        }
+        return api_params, evaluation_content
+    
+    def evaluation_result(self, completion: Dict[str, Any], evaluation_content: str) -> Dict[str, Any]:
+        """解析评测补全结果，转换为evaluate_answer的返回格式"""
+        evaluation_text = completion["content"]
+        
+        # 尝试解析JSON格式的评测结果
+        try:
+            # 清理可能的markdown格式标记
+            clean_text = evaluation_text.strip()
+            if clean_text.startswith('```json'):
+                clean_text = clean_text.replace('```json', '').replace('```', '').strip()
+            elif clean_text.startswith('```'):
+                clean_text = clean_text.replace('```', '').strip()
+            
+            # 改进的JSON解析逻辑
+            evaluation_result = self._parse_evaluation_json(clean_text)
+            
+            score = float(evaluation_result.get("score", 0))
+            reasoning = evaluation_result.get("reasoning", "")
+            
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.warning(f"Failed to parse JSON evaluation result: {str(e)}")
+            logger.warning(f"Raw evaluation text: {evaluation_text}")
+            # 如果不是JSON格式，尝试从文本中提取分数
+            score = self._extract_score_from_text(evaluation_text)
+            reasoning = evaluation_text
+            
+        usage_info = completion["usage"]
+        cost = 0.0 if completion["cached"] else calculate_cost(usage_info, self.cost_per_1k_tokens)
+        
+        return {
+            "success": True,
+            "score": min(100, max(0, score)),  # 确保分数在0-100范围内
+            "reasoning": reasoning,
+            "evaluation_prompt": evaluation_content,
+            "raw_evaluation": evaluation_text,
+            "usage": usage_info,
+            "cost": cost,
+            "retries": completion["retries"],
+            "cached": completion["cached"]
+        }
+    
     def _extract_score_from_text(self, text: str) -> float:
         """从文本中提取分数"""
         import re
@@ -381,7 +731,9 @@ async def get_llm_client(
             api_key=api_key,
             base_url=db_llm.api_endpoint or "https://dashscope.aliyuncs.com/compatible-mode/v1",
             model_name=db_llm.name,
-            cost_per_1k_tokens=float(db_llm.cost_per_1k_tokens) if db_llm.cost_per_1k_tokens else 0.0006
+            cost_per_1k_tokens=float(db_llm.cost_per_1k_tokens) if db_llm.cost_per_1k_tokens else 0.0006,
+            requests_per_minute=db_llm.requests_per_minute or DEFAULT_REQUESTS_PER_MINUTE,
+            tokens_per_minute=db_llm.tokens_per_minute or DEFAULT_TOKENS_PER_MINUTE
         )
     
     return _client_cache[cache_key]
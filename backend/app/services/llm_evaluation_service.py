@@ -5,9 +5,10 @@ import asyncio
 import json
 import time
 import hashlib
-from typing import Dict, Any, Optional, List
+from collections import defaultdict
+from typing import Dict, Any, Optional, List, Tuple
 from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from datetime import datetime
 from decimal import Decimal
 import logging
@@ -17,11 +18,22 @@ from ..models.llm_evaluation_task import LLMEvaluationTask, TaskStatus
 from ..models.std_question import StdQuestion
 from ..models.llm import LLM
 from ..models.llm_answer import LLMAnswer
-from ..models.evaluation import Evaluation, EvaluatorType
-from ..crud.crud_llm_evaluation_task import update_llm_evaluation_task, get_llm_evaluation_task
+from ..models.evaluation import Evaluation, EvaluatorType, AUTOMATIC_EVALUATOR_TYPES
+from ..crud.crud_llm_evaluation_task import (
+    update_llm_evaluation_task, get_llm_evaluation_task, get_task_metrics
+)
+from ..crud.crud_leaderboard import refresh_task_leaderboard
 from ..schemas.llm_evaluation_task import LLMEvaluationTaskUpdate
-from .llm_client_service import get_llm_client, LLMClient
-from ..config.llm_config import get_api_key_from_env
+from .llm_client_service import get_llm_client, LLMClient, classify_failure
+from .task_write_buffer import TaskWriteBuffer
+from .task_progress import TaskProgressPublisher
+from .choice_grader import grade_choice, AUTO_EVALUATOR_ID
+from .sample_metrics import refresh_sample_metrics
+from .batch_api_service import run_batch, BatchNotSupportedError
+from .dataset_snapshot import load_dataset_snapshot
+from ..config.llm_config import (
+    get_api_key_from_env, get_default_system_prompt, DEFAULT_CONCURRENCY
+)
 
 logger = logging.getLogger(__name__)
 
@@ -32,8 +44,20 @@ class LLMEvaluationTaskProcessor:
     def __init__(self):
         self.running_tasks: Dict[int, asyncio.Task] = {}
         
-    async def process_evaluation_task_async(self, task_id: int, question_limit: Optional[int] = None):
-        """异步处理评测任务"""
+    async def process_evaluation_task_async(
+        self,
+        task_id: int,
+        question_limit: Optional[int] = None,
+        questions: Optional[List[StdQuestion]] = None,
+        prompts: Optional[Dict[Tuple[Optional[str], int], str]] = None
+    ):
+        """
+        异步处理评测任务，已有答案的问题会被跳过，因此也用于断点续跑
+
+        Args:
+            questions: 已加载（并与会话分离）的问题列表，扇出任务由多个模型共享，为空时按任务查询
+            prompts: (system prompt, 问题ID) 到完整提示词的缓存，扇出任务由多个模型共享
+        """
         from ..db.database import SessionLocal
         db = SessionLocal()        
         try:
@@ -51,7 +75,7 @@ class LLMEvaluationTaskProcessor:
             try:
                 update_data = LLMEvaluationTaskUpdate(
                     status=TaskStatus.GENERATING_ANSWERS,
-                    started_at=datetime.now()
+                    started_at=task.started_at or datetime.now()
                 )
                 logger.info(f"Task {task_id}: 创建更新数据对象成功")
                 
@@ -64,29 +88,15 @@ class LLMEvaluationTaskProcessor:
                 logger.error(f"Task {task_id}: 更新状态错误堆栈:\n{traceback.format_exc()}")
                 raise            logger.info(f"Task {task_id}: 更新任务状态为RUNNING成功")
             
-            # 获取数据集问题
+            # 获取数据集问题（扇出任务由调用方统一加载）
             logger.info(f"Task {task_id}: 步骤3 - 获取数据集问题")
-            try:
-                questions = db.query(StdQuestion).filter(
-                    StdQuestion.dataset_id == task.dataset_id,
-                    StdQuestion.is_valid == True
-                ).order_by(StdQuestion.id).all()
-                
-                logger.info(f"Task {task_id}: 找到 {len(questions)} 个问题，数据集ID: {task.dataset_id}")
-                
-                if question_limit:
-                    questions = questions[:question_limit]
-                    logger.info(f"Task {task_id}: 限制为 {len(questions)} 个问题")
-                
-                if not questions:
-                    logger.error(f"Task {task_id}: 数据集 {task.dataset_id} 中没有找到问题")
-                    return
-                    
-            except Exception as query_error:
-                logger.error(f"Task {task_id}: 查询数据集问题时发生错误: {str(query_error)}")
-                import traceback
-                logger.error(f"Task {task_id}: 查询问题错误堆栈:\n{traceback.format_exc()}")
-                raise
+            if questions is None:
+                questions = self._load_task_questions(db, task, question_limit)
+            if prompts is None:
+                prompts = {}
+            if not questions:
+                logger.error(f"Task {task_id}: 数据集 {task.dataset_id} 中没有找到问题")
+                return
             
             # 更新总问题数
             update_data = LLMEvaluationTaskUpdate(total_questions=len(questions))
@@ -125,130 +135,148 @@ class LLMEvaluationTaskProcessor:
                 update_llm_evaluation_task(db, task_id, update_data)
                 return
             
-            completed_count = 0
-            failed_count = 0
-            for i, question in enumerate(questions):
-                try:
-                    logger.info(f"Processing question {i+1}/{len(questions)}: {question.id}")
-                    # 检查任务是否被取消
-                    current_task = get_llm_evaluation_task(db, task_id)
-                    if current_task.status == TaskStatus.CANCELLED.value:
-                        logger.info(f"Task {task_id} was cancelled")
-                        break
-                    
-                    # 更新当前进度 - 使用已完成的问题数量
-                    progress = int(((completed_count + failed_count) / len(questions)) * 100)
-                    update_data = LLMEvaluationTaskUpdate(
-                        progress=progress,
-                        completed_questions=completed_count,
-                        failed_questions=failed_count
-                    )
-                    update_llm_evaluation_task(db, task_id, update_data)
-                    # 生成答案
-                    start_time = time.time()
-                    logger.info(f"Generating answer for question: {question.body[:100]}...")                    # 根据问题类型选择合适的system prompt
+            # 断点续跑：已有的样本不再生成，计数从已有结果开始；一道题有任一有效样本即算成功
+            samples_per_question = max(1, task.samples_per_question or 1)
+            existing_answers: Dict[int, Dict[int, bool]] = defaultdict(dict)
+            for question_id, sample_index, is_valid in db.query(
+                LLMAnswer.std_question_id, LLMAnswer.sample_index, LLMAnswer.is_valid
+            ).filter(LLMAnswer.task_id == task_id):
+                existing_answers[question_id][sample_index] = is_valid
+            missing_samples = {
+                q.id: [i for i in range(samples_per_question) if i not in existing_answers.get(q.id, {})]
+                for q in questions
+            }
+            remaining_questions = [q for q in questions if missing_samples[q.id]]
+            finished = [q for q in questions if not missing_samples[q.id]]
+            completed_count = sum(1 for q in finished if any(existing_answers[q.id].values()))
+            failed_count = len(finished) - completed_count
+            if existing_answers:
+                logger.info(f"Task {task_id}: 续跑，已有 {len(questions) - len(remaining_questions)} 个答案，剩余 {len(remaining_questions)} 个问题")
+            cache_hits = task.cache_hits or 0
+            cache_misses = task.cache_misses or 0
+            concurrency = max(1, task.concurrency or DEFAULT_CONCURRENCY)
+            semaphore = asyncio.Semaphore(concurrency)
+            cancelled = asyncio.Event()
+            # 多次采样时不使用流式生成
+            streaming = bool(task.enable_streaming) and samples_per_question == 1
+            logger.info(f"Task {task_id}: 并发数 {concurrency}，每题采样 {samples_per_question} 次，流式生成: {streaming}")
+            # 进度（计数、速率、最新答案、正在生成的请求）定期写入进度快照，供 /progress 读取
+            publisher = TaskProgressPublisher(
+                task_id, TaskStatus.GENERATING_ANSWERS.value, len(questions), completed_count, failed_count
+            )
+            
+            async def generate(question: StdQuestion):
+                """在信号量限制下为单个问题生成答案（多次采样时生成缺少的全部样本）"""
+                async with semaphore:
+                    if cancelled.is_set():
+                        return None
                     question_type = getattr(question, 'question_type', 'text')  # 默认为text类型
-                    if question_type == 'choice':
-                        # 优先使用任务的选择题专用提示词，其次使用默认提示词
-                        if task.choice_system_prompt:
-                            system_prompt = task.choice_system_prompt
+                    system_prompt = self._resolve_system_prompt(task, question_type)
+                    start_time = time.time()
+                    # 一次请求生成该题缺少的全部样本，每个样本登记一个进行中的条目（流式生成时只有一个样本）
+                    sample_indexes = missing_samples[question.id]
+                    entries = [publisher.request_started(question.id, index) for index in sample_indexes]
+                    on_delta = (lambda delta: publisher.on_delta(entries[0], delta)) if streaming else None
+                    count = len(sample_indexes)
+                    try:
+                        answer_results = await llm_client.generate_samples(
+                            question=question.body,
+                            sample_indexes=sample_indexes,
+                            system_prompt=system_prompt,
+                            temperature=float(task.temperature) if task.temperature else 0.7,
+                            max_tokens=task.max_tokens or 2000,
+                            top_k=task.top_k or 50,
+                            enable_reasoning=task.enable_reasoning or False,
+                            use_cache=task.use_cache,
+                            on_delta=on_delta
+                        )
+                    except Exception as e:
+                        answer_results = [LLMClient.failed_answer(e) for _ in range(count)]
+                    finally:
+                        for index in sample_indexes:
+                            publisher.request_finished(question.id, index)
+                    response_time = int((time.time() - start_time) * 1000)  # 毫秒
+                    for answer_result in answer_results:
+                        answer_result["response_time"] = response_time
+                    return system_prompt, answer_results
+            
+            # 批量模式下先通过批量API取回全部结果；提供商不支持批量接口时退回逐条调用
+            batch_outcomes = None
+            if task.execution_mode == "batch" and remaining_questions:
+                batch_outcomes = await self._generate_answers_batch(db, task, llm_client, remaining_questions, missing_samples)
+            
+            # 所有问题同时排队，实际并发由信号量限制；结果按问题顺序写入写缓冲，批量落库
+            if batch_outcomes is not None:
+                pending = [asyncio.create_task(asyncio.sleep(0, result=outcome)) for outcome in batch_outcomes]
+            else:
+                pending = [asyncio.create_task(generate(question)) for question in remaining_questions]
+            buffer = TaskWriteBuffer(db, task_id)
+            publisher.start()
+            try:
+                for question, future in zip(remaining_questions, pending):
+                    outcome = await future
+                    if outcome is None:
+                        break
+                    system_prompt, answer_results = outcome
+                    succeeded = any(existing_answers.get(question.id, {}).values())
+                    latest_answer = None
+                    prompt_used = prompts.get((system_prompt, question.id))
+                    if prompt_used is None:
+                        prompt_used = prompts[(system_prompt, question.id)] = self._build_prompt(system_prompt, question.body)
+                    for sample_index, answer_result in zip(missing_samples[question.id], answer_results):
+                        if answer_result.get("cached"):
+                            cache_hits += 1
                         else:
-                            from ..config.llm_config import get_default_system_prompt
-                            system_prompt = get_default_system_prompt('choice')
-                    else:
-                        # 优先使用任务的文本题专用提示词，其次使用默认提示词
-                        if task.text_system_prompt:
-                            system_prompt = task.text_system_prompt
+                            cache_misses += 1
+                        if answer_result["success"]:
+                            answer = answer_result["answer"]
+                            succeeded = True
                         else:
-                            from ..config.llm_config import get_default_system_prompt  
-                            system_prompt = get_default_system_prompt('text')
-                    
-                    # 如果都没有，最后才使用通用的system_prompt作为兜底
-                    if not system_prompt and task.system_prompt:
-                        system_prompt = task.system_prompt
-                    
-                    answer_result = await llm_client.generate_answer(
-                        question=question.body,
-                        system_prompt=system_prompt,
-                        temperature=float(task.temperature) if task.temperature else 0.7,
-                        max_tokens=task.max_tokens or 2000,
-                        top_k=task.top_k or 50,
-                        enable_reasoning=task.enable_reasoning or False
-                    )
-                    response_time = int((time.time() - start_time) * 1000)  # 毫秒
-                    logger.info(f"Got answer result - success: {answer_result['success']}")
-                    if answer_result["success"]:
-                        logger.info(f"Task {task_id}: 第{i+1}题 - 获得成功答案: {answer_result['answer'][:100]}...")
-                        
-                        # 创建LLM答案记录
-                        logger.info(f"Task {task_id}: 第{i+1}题 - 开始创建LLMAnswer对象")
-                        try:
-                            llm_answer = LLMAnswer(
-                                llm_id=llm.id,
-                                task_id=task_id,  # 使用task_id作为evaluation_task_id
-                                std_question_id=question.id,
-                                prompt_used=self._build_prompt(system_prompt, question.body),
-                                answer=answer_result["answer"],
-                                is_valid=True
-                            )
-                            logger.info(f"Task {task_id}: 第{i+1}题 - LLMAnswer对象创建成功")
-                            
-                            logger.info(f"Task {task_id}: 第{i+1}题 - 开始添加到数据库")
-                            db.add(llm_answer)
-                            logger.info(f"Task {task_id}: 第{i+1}题 - 已添加到session，开始commit")
-                            
-                            db.commit()
-                            logger.info(f"Task {task_id}: 第{i+1}题 - commit成功，开始refresh")
-                            
-                            db.refresh(llm_answer)
-                            logger.info(f"Task {task_id}: 第{i+1}题 - LLM答案保存成功，ID: {llm_answer.id}")
-                            
-                        except Exception as save_error:
-                            logger.error(f"Task {task_id}: 第{i+1}题 - 保存LLM答案时发生错误: {str(save_error)}")
-                            import traceback
-                            logger.error(f"Task {task_id}: 第{i+1}题 - 保存答案错误堆栈:\n{traceback.format_exc()}")
-                            # 回滚事务                            db.rollback()
-                            raise
-                        
-                        completed_count += 1
-                        
-                        # 自动评估功能已移除，只生成答案
-                    else:
-                        # 记录失败
-                        llm_answer = LLMAnswer(
+                            # 记录失败
+                            answer = f"API调用失败: {answer_result.get('error', 'Unknown error')}"
+                            logger.error(f"Failed to get answer for question {question.id} (sample {sample_index}): {answer_result.get('error')}")
+                        latest_answer = latest_answer or (answer if answer_result["success"] else None)
+                        buffer.add_answer(
                             llm_id=llm.id,
                             task_id=task_id,
                             std_question_id=question.id,
-                            prompt_used=self._build_prompt(task.system_prompt, question.body),
-                            answer=f"API调用失败: {answer_result.get('error', 'Unknown error')}",
-                            is_valid=False
+                            sample_index=sample_index,
+                            prompt_used=prompt_used,
+                            answer=answer,
+                            is_valid=answer_result["success"],
+                            response_time_ms=answer_result.get("response_time"),
+                            first_token_ms=answer_result.get("first_token_ms"),
+                            tokens_per_second=answer_result.get("tokens_per_second"),
+                            **self._usage_fields(answer_result),
+                            failure_reason=None if answer_result["success"] else answer_result.get("failure_reason", "unknown")
                         )
-                        db.add(llm_answer)
-                        db.commit()
-                        
+                    if succeeded:
+                        completed_count += 1
+                    else:
                         failed_count += 1
-                        logger.error(f"Failed to get answer for question {question.id}: {answer_result.get('error')}")
-                except Exception as e:
-                    failed_count += 1
-                    logger.error(f"Error processing question {question.id}: {str(e)}")
+                    logger.info(f"Task {task_id}: 第{completed_count + failed_count}/{len(questions)}题 - success: {succeeded}, 耗时 {answer_results[0].get('response_time')}ms")
+                    publisher.record(succeeded, latest_answer or answer)
                     
-                    # 记录失败的答案
-                    try:
-                        llm_answer = LLMAnswer(
-                            llm_id=llm.id,
-                            task_id=task_id,
-                            std_question_id=question.id,
-                            prompt_used=self._build_prompt(task.system_prompt if task.system_prompt else "", question.body),
-                            answer=f"处理失败: {str(e)}",
-                            is_valid=False
-                        )
-                        db.add(llm_answer)
-                        db.commit()
-                    except Exception as save_error:
-                        logger.error(f"Failed to save error answer: {str(save_error)}")
-                
-                # 小延迟避免API限流
-                await asyncio.sleep(0.1)
+                    # 更新当前进度 - 使用已完成的问题数量，随下一次批量写入一起提交
+                    buffer.set_progress(
+                        progress=int(((completed_count + failed_count) / len(questions)) * 100),
+                        completed_questions=completed_count,
+                        failed_questions=failed_count,
+                        cache_hits=cache_hits,
+                        cache_misses=cache_misses
+                    )
+                    
+                    # 每次批量写入后检查任务是否被取消
+                    if buffer.maybe_flush() and self._is_task_cancelled(db, task_id):
+                        logger.info(f"Task {task_id} was cancelled")
+                        cancelled.set()
+                        break
+            finally:
+                for future in pending:
+                    future.cancel()
+                # 取消或异常时也要把已缓存的结果写入
+                buffer.flush()
+                await publisher.stop()
             
             # 最终更新任务状态 - 根据实际结果判断
             total_processed = completed_count + failed_count
@@ -298,8 +326,44 @@ class LLMEvaluationTaskProcessor:
             db.close()
             logger.info(f"Task {task_id} completed")
     
+    async def process_fanout_async(self, task_id: int, question_limit: Optional[int] = None):
+        """
+        多模型扇出：为task_id所在扇出分组中尚未完成生成的任务并发生成答案
+
+        数据集问题只加载一次，完整提示词按 (system prompt, 问题) 共享；每个模型使用各自的会话、
+        客户端（按base_url和模型共享的限流器）和并发数，总耗时取决于最慢的模型而不是所有模型之和。
+        """
+        from ..db.database import SessionLocal
+        from ..crud.crud_llm_evaluation_task import get_fanout_group_tasks
+        db = SessionLocal()
+        try:
+            lead = get_llm_evaluation_task(db, task_id)
+            if not lead:
+                logger.error(f"Task {task_id}: 任务不存在")
+                return
+            members = get_fanout_group_tasks(db, lead.fanout_group) if lead.fanout_group else [lead]
+            # 续跑时跳过已完成生成或已取消的任务
+            members = [
+                member for member in members
+                if member.status not in (TaskStatus.EVALUATING_ANSWERS, TaskStatus.COMPLETED, TaskStatus.CANCELLED)
+            ]
+            if not members:
+                logger.info(f"Task {task_id}: 扇出分组 {lead.fanout_group} 中没有需要生成答案的任务")
+                return
+            questions = self._load_task_questions(db, lead, question_limit)
+        finally:
+            db.close()
+
+        logger.info(f"扇出分组 {lead.fanout_group}: {len(members)} 个模型共享 {len(questions)} 个问题")
+        prompts: Dict[Tuple[Optional[str], int], str] = {}
+        # 每个任务自行处理异常并写入失败状态，一个模型失败不影响其他模型
+        await asyncio.gather(*(
+            self.process_evaluation_task_async(member.id, question_limit, questions=questions, prompts=prompts)
+            for member in members
+        ))
+    
     async def process_answer_evaluation_async(self, task_id: int):
-        """异步处理答案评测任务"""
+        """异步处理答案评测任务，已有LLM评测的答案会被跳过，因此也用于断点续跑"""
         from ..db.database import SessionLocal
         db = SessionLocal()
         
@@ -370,86 +434,178 @@ class LLMEvaluationTaskProcessor:
                 update_llm_evaluation_task(db, task_id, update_data)
                 return
             
+            # 一次性预取该任务涉及的全部标准问题及标准答案
+            std_questions = db.query(StdQuestion).options(
+                joinedload(StdQuestion.std_answers)
+            ).filter(
+                StdQuestion.id.in_(
+                    db.query(LLMAnswer.std_question_id).filter(LLMAnswer.task_id == task_id)
+                )
+            ).all()
+            questions_by_id = {q.id: q for q in std_questions}
+            # 答案和问题只读，与会话分离，避免每次批量提交后逐个重新加载
+            for obj in [*llm_answers, *std_questions]:
+                db.expunge(obj)
+            logger.info(f"Task {task_id}: 预取 {len(questions_by_id)} 个标准问题")
+            
+            # 断点续跑：已有LLM评测或规则评分的答案不再评测，计数和总分从已有结果开始
+            existing_scores = dict(db.query(Evaluation.llm_answer_id, Evaluation.score).join(
+                LLMAnswer, Evaluation.llm_answer_id == LLMAnswer.id
+            ).filter(
+                LLMAnswer.task_id == task_id,
+                Evaluation.evaluator_type.in_(AUTOMATIC_EVALUATOR_TYPES)
+            ).all())
+            if existing_scores:
+                logger.info(f"Task {task_id}: 续跑，已有 {len(existing_scores)} 个评测结果")
+            
             # 处理每个LLM答案
-            completed_evaluations = 0
+            completed_evaluations = sum(1 for answer in llm_answers if answer.id in existing_scores)
             failed_evaluations = 0
-            total_score = 0
+            total_score = sum(float(existing_scores[answer.id] or 0) for answer in llm_answers if answer.id in existing_scores)
+            cache_hits = task.cache_hits or 0
+            cache_misses = task.cache_misses or 0
+            concurrency = max(1, task.concurrency or DEFAULT_CONCURRENCY)
+            semaphore = asyncio.Semaphore(concurrency)
+            cancelled = asyncio.Event()
             
-            for i, llm_answer in enumerate(llm_answers):
-                try:
-                    logger.info(f"Task {task_id}: 评测答案 {i+1}/{len(llm_answers)}")
-                    
-                    # 检查任务是否被取消
-                    current_task = get_llm_evaluation_task(db, task_id)
-                    if current_task.status == TaskStatus.CANCELLED:
-                        logger.info(f"Task {task_id}: 任务已取消")
-                        break
-                    
-                    # 获取标准问题和标准答案
-                    std_question = db.query(StdQuestion).filter(
-                        StdQuestion.id == llm_answer.std_question_id
-                    ).first()
-                    
-                    if not std_question:
-                        logger.warning(f"Task {task_id}: 答案 {llm_answer.id} 的标准问题不存在")
-                        failed_evaluations += 1
-                        continue
-                      # 获取标准答案
+            async def judge(llm_answer: LLMAnswer, std_question: StdQuestion, evaluation_prompt: Optional[str]):
+                """在信号量限制下评测单个答案"""
+                async with semaphore:
+                    if cancelled.is_set():
+                        return None
+                    # 获取标准答案
                     std_answers = std_question.std_answers
                     correct_answer = std_answers[0].answer if std_answers else ""
-                    
-                    # 根据问题类型选择评测提示词
-                    question_type = getattr(std_question, 'question_type', 'text')
-                    if question_type == 'choice':
-                        # 优先使用任务的选择题专用评测提示词，其次使用通用评测提示词
-                        evaluation_prompt = task.choice_evaluation_prompt or task.evaluation_prompt
+                    start_time = time.time()
+                    publisher.request_started(std_question.id, llm_answer.sample_index or 0)
+                    try:
+                        result = await self._call_evaluation_llm(
+                            llm_client,
+                            std_question.body,
+                            llm_answer.answer,
+                            correct_answer,
+                            evaluation_prompt,
+                            std_question.question_type or 'text',
+                            use_cache=task.use_cache
+                        )
+                    finally:
+                        publisher.request_finished(std_question.id, llm_answer.sample_index or 0)
+                    result["response_time"] = int((time.time() - start_time) * 1000)  # 毫秒
+                    return result
+            
+            items = []
+            auto_graded = []
+            for llm_answer in llm_answers:
+                if llm_answer.id in existing_scores:
+                    continue
+                std_question = questions_by_id.get(llm_answer.std_question_id)
+                if not std_question:
+                    logger.warning(f"Task {task_id}: 答案 {llm_answer.id} 的标准问题不存在")
+                    failed_evaluations += 1
+                    continue
+                # 选择题能解析出选项时按规则评分，解析失败才交给评测模型
+                if std_question.question_type == 'choice':
+                    graded = grade_choice(llm_answer.answer, [a.answer for a in std_question.std_answers])
+                    if graded:
+                        auto_graded.append((llm_answer, std_question, graded))
+                        continue
+                evaluation_prompt = self._resolve_evaluation_prompt(task, std_question.question_type or 'text')
+                items.append((llm_answer, std_question, evaluation_prompt))
+            
+            publisher = TaskProgressPublisher(
+                task_id, TaskStatus.EVALUATING_ANSWERS.value, len(llm_answers), completed_evaluations, failed_evaluations
+            )
+            
+            # 批量模式下先通过批量API取回全部结果；提供商不支持批量接口时退回逐条调用
+            batch_outcomes = None
+            if task.execution_mode == "batch" and items:
+                batch_outcomes = await self._evaluate_answers_batch(db, task, llm_client, items)
+            if batch_outcomes is not None:
+                jobs = [(*item, asyncio.create_task(asyncio.sleep(0, result=outcome)))
+                        for item, outcome in zip(items, batch_outcomes)]
+            else:
+                jobs = [(*item, asyncio.create_task(judge(*item))) for item in items]
+            
+            if auto_graded:
+                logger.info(f"Task {task_id}: {len(auto_graded)} 个选择题答案按规则评分，{len(items)} 个答案交给评测模型")
+            
+            buffer = TaskWriteBuffer(db, task_id)
+            publisher.start()
+            try:
+                for llm_answer, std_question, graded in auto_graded:
+                    buffer.add_evaluation(
+                        std_question_id=std_question.id,
+                        llm_answer_id=llm_answer.id,
+                        score=graded["score"],
+                        evaluator_type=EvaluatorType.AUTO,
+                        evaluator_id=AUTO_EVALUATOR_ID,
+                        reasoning=graded["reasoning"],
+                        evaluation_prompt=None,
+                        response_time_ms=0,
+                        **self._usage_fields({})
+                    )
+                    completed_evaluations += 1
+                    total_score += graded["score"]
+                    publisher.record(True, f"评分: {graded['score']}/100\n评测内容: {graded['reasoning']}", graded["score"], "evaluation")
+                if auto_graded:
+                    buffer.set_progress(
+                        progress=int(((completed_evaluations + failed_evaluations) / len(llm_answers)) * 100)
+                    )
+                    buffer.maybe_flush()
+                
+                for i, (llm_answer, std_question, evaluation_prompt, future) in enumerate(jobs):
+                    evaluation_result = await future
+                    if evaluation_result is None:
+                        break
+                    logger.info(f"Task {task_id}: 评测答案 {i+1}/{len(jobs)}")
+                    if evaluation_result.get("cached"):
+                        cache_hits += 1
                     else:
-                        # 优先使用任务的文本题专用评测提示词，其次使用通用评测提示词
-                        evaluation_prompt = task.text_evaluation_prompt or task.evaluation_prompt
-                    
-                    # 调用评测LLM
-                    evaluation_result = await self._call_evaluation_llm(
-                        llm_client,
-                        std_question.body,
-                        llm_answer.answer,
-                        correct_answer,
-                        evaluation_prompt,
-                        question_type                     )
-                    
+                        cache_misses += 1
                     if evaluation_result["success"]:
                         # 创建评测记录
-                        evaluation = Evaluation(
+                        buffer.add_evaluation(
                             std_question_id=std_question.id,
                             llm_answer_id=llm_answer.id,
                             score=evaluation_result["score"],
                             evaluator_type=EvaluatorType.LLM,
                             evaluator_id=evaluation_llm.id,
                             reasoning=evaluation_result["reasoning"],
-                            evaluation_prompt=evaluation_prompt
+                            evaluation_prompt=evaluation_prompt,
+                            response_time_ms=evaluation_result.get("response_time"),
+                            **self._usage_fields(evaluation_result)
                         )
-                        db.add(evaluation)
-                        db.commit()
-                        
                         completed_evaluations += 1
                         total_score += evaluation_result["score"]
                         
                         logger.info(f"Task {task_id}: 答案 {llm_answer.id} 评测完成，得分: {evaluation_result['score']}")
+                        publisher.record(
+                            True, f"评分: {evaluation_result['score']}/100\n评测内容: {evaluation_result['reasoning'] or '无评测理由'}",
+                            evaluation_result["score"], "evaluation"
+                        )
                     else:
                         failed_evaluations += 1
                         logger.error(f"Task {task_id}: 答案 {llm_answer.id} 评测失败: {evaluation_result.get('error')}")
+                        publisher.record(False)
                     
                     # 更新进度
-                    progress = int(((completed_evaluations + failed_evaluations) / len(llm_answers)) * 100)
-                    update_data = LLMEvaluationTaskUpdate(progress=progress)
-                    update_llm_evaluation_task(db, task_id, update_data)
-                    
-                    # 小延迟避免API限流
-                    await asyncio.sleep(0.1)
+                    buffer.set_progress(
+                        progress=int(((completed_evaluations + failed_evaluations) / len(llm_answers)) * 100),
+                        cache_hits=cache_hits,
+                        cache_misses=cache_misses
+                    )
                     
-                except Exception as e:
-                    failed_evaluations += 1
-                    logger.error(f"Task {task_id}: 处理答案 {llm_answer.id} 时发生错误: {str(e)}")
-                    continue
+                    # 每次批量写入后检查任务是否被取消
+                    if buffer.maybe_flush() and self._is_task_cancelled(db, task_id):
+                        logger.info(f"Task {task_id}: 任务已取消")
+                        cancelled.set()
+                        break
+            finally:
+                for *_, future in jobs:
+                    future.cancel()
+                # 取消或异常时也要把已缓存的结果写入
+                buffer.flush()
+                await publisher.stop()
             
             # 计算平均分
             avg_score = total_score / completed_evaluations if completed_evaluations > 0 else 0
@@ -474,11 +630,14 @@ class LLMEvaluationTaskProcessor:
             update_data = LLMEvaluationTaskUpdate(
                 status=final_status,
                 progress=100,
-                score=Decimal(str(avg_score)),
+                score=Decimal(str(round(avg_score, 2))),
                 completed_at=datetime.now(),
                 result_summary=result_summary
             )
             update_llm_evaluation_task(db, task_id, update_data)
+            if final_status == TaskStatus.COMPLETED:
+                refresh_sample_metrics(db, task_id)
+                refresh_task_leaderboard(db, task_id)
             
             logger.info(f"Task {task_id}: 评测任务完成")
             
@@ -498,6 +657,44 @@ class LLMEvaluationTaskProcessor:
             db.close()
             logger.info(f"Task {task_id}: 评测任务处理完成")
     
+    def _load_task_questions(self, db: Session, task: LLMEvaluationTask, question_limit: Optional[int] = None) -> List[StdQuestion]:
+        """
+        读取任务数据集版本的问题（按ID排序）
+
+        优先使用版本快照文件（读取后即关闭），问题内容在访问时才解码；没有快照时查询数据库，
+        并与会话分离（只读，避免每次批量提交后逐个重新加载）
+        """
+        try:
+            snapshot = load_dataset_snapshot(db, task.dataset_id, task.dataset_version)
+            if snapshot is not None:
+                # 问题记录复制出文件后即关闭快照，不在长期运行的进程中保留mmap和文件句柄
+                with snapshot:
+                    questions = snapshot.questions(question_limit)
+                    logger.info(f"Task {task.id}: 从快照读取 {len(questions)} 个问题（共 {len(snapshot)} 个），数据集ID: {task.dataset_id}")
+                return questions
+            
+            questions = db.query(StdQuestion).filter(
+                StdQuestion.dataset_id == task.dataset_id,
+                StdQuestion.is_valid == True,
+                StdQuestion.original_version_id <= task.dataset_version,
+                StdQuestion.current_version_id >= task.dataset_version
+            ).order_by(StdQuestion.id).all()
+            
+            logger.info(f"Task {task.id}: 找到 {len(questions)} 个问题，数据集ID: {task.dataset_id}")
+            
+            if question_limit:
+                questions = questions[:question_limit]
+                logger.info(f"Task {task.id}: 限制为 {len(questions)} 个问题")
+            
+            for question in questions:
+                db.expunge(question)
+            return questions
+        except Exception as query_error:
+            logger.error(f"Task {task.id}: 查询数据集问题时发生错误: {str(query_error)}")
+            import traceback
+            logger.error(f"Task {task.id}: 查询问题错误堆栈:\n{traceback.format_exc()}")
+            raise
+    
     def _get_or_create_llm(self, db: Session, model_name: str, model_version: Optional[str] = None) -> LLM:
         """获取或创建LLM记录"""
         try:
@@ -519,6 +716,33 @@ class LLMEvaluationTaskProcessor:
             logger.error(f"_get_or_create_llm: 错误堆栈:\n{traceback.format_exc()}")
             raise
     
+    def _resolve_system_prompt(self, task: LLMEvaluationTask, question_type: str) -> Optional[str]:
+        """根据问题类型选择合适的system prompt"""
+        if question_type == 'choice':
+            # 优先使用任务的选择题专用提示词，其次使用默认提示词
+            system_prompt = task.choice_system_prompt or get_default_system_prompt('choice')
+        else:
+            # 优先使用任务的文本题专用提示词，其次使用默认提示词
+            system_prompt = task.text_system_prompt or get_default_system_prompt('text')
+        
+        # 如果都没有，最后才使用通用的system_prompt作为兜底
+        if not system_prompt and task.system_prompt:
+            system_prompt = task.system_prompt
+        return system_prompt
+    
+    def _resolve_evaluation_prompt(self, task: LLMEvaluationTask, question_type: str) -> Optional[str]:
+        """根据问题类型选择评测提示词"""
+        if question_type == 'choice':
+            # 优先使用任务的选择题专用评测提示词，其次使用通用评测提示词
+            return task.choice_evaluation_prompt or task.evaluation_prompt
+        # 优先使用任务的文本题专用评测提示词，其次使用通用评测提示词
+        return task.text_evaluation_prompt or task.evaluation_prompt
+    
+    def _is_task_cancelled(self, db: Session, task_id: int) -> bool:
+        """只查询状态列，判断任务是否已被取消"""
+        status = db.query(LLMEvaluationTask.status).filter(LLMEvaluationTask.id == task_id).scalar()
+        return status == TaskStatus.CANCELLED
+    
     def _build_prompt(self, system_prompt: Optional[str], question_body: str) -> str:
         """构建完整的提示词"""
         if system_prompt:
@@ -545,7 +769,8 @@ class LLMEvaluationTaskProcessor:
         answer: str,
         correct_answer: str = "",
         evaluation_prompt: Optional[str] = None,
-        question_type: str = "text"
+        question_type: str = "text",
+        use_cache: bool = True
     ) -> Dict[str, Any]:
         """使用LLM客户端调用评估LLM"""
         try:
@@ -555,7 +780,8 @@ class LLMEvaluationTaskProcessor:
                 answer=answer,
                 evaluation_prompt=evaluation_prompt,
                 correct_answer=correct_answer,
-                question_type=question_type
+                question_type=question_type,
+                use_cache=use_cache
             )
             
             return result
@@ -565,10 +791,133 @@ class LLMEvaluationTaskProcessor:
             return {
                 "success": False,
                 "error": str(e),
+                "failure_reason": classify_failure(e),
                 "score": 0,
                 "reasoning": f"评估失败: {str(e)}"
             }
     
+    @staticmethod
+    def _usage_fields(result: Dict[str, Any]) -> Dict[str, Any]:
+        """从调用结果中取出需要持久化的token用量、成本和重试次数"""
+        usage = result.get("usage") or {}
+        return {
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens"),
+            "cost": result.get("cost"),
+            "retries": result.get("retries") or 0
+        }
+    
+    def _set_batch_id(self, db: Session, task_id: int, batch_id: Optional[str]):
+        """记录任务当前的批量作业ID，续跑时据此接管而不是重新提交"""
+        update_llm_evaluation_task(db, task_id, LLMEvaluationTaskUpdate(batch_id=batch_id))
+    
+    async def _generate_answers_batch(
+        self,
+        db: Session,
+        task: LLMEvaluationTask,
+        llm_client: LLMClient,
+        questions: List[StdQuestion],
+        missing_samples: Dict[int, List[int]]
+    ) -> Optional[List[tuple]]:
+        """通过批量API生成答案，返回与questions顺序一致的(system_prompt, [answer_result, ...])列表；
+        每题需要多个样本时在一个请求中使用n参数。提供商不支持批量接口时返回None"""
+        system_prompts = {}
+        requests = {}
+        for question in questions:
+            system_prompt = self._resolve_system_prompt(task, question.question_type or 'text')
+            system_prompts[question.id] = system_prompt
+            count = len(missing_samples[question.id])
+            requests[f"question-{question.id}"] = llm_client.build_answer_request(
+                question=question.body,
+                system_prompt=system_prompt,
+                temperature=float(task.temperature) if task.temperature else 0.7,
+                max_tokens=task.max_tokens or 2000,
+                top_k=task.top_k or 50,
+                enable_reasoning=task.enable_reasoning or False,
+                **({"n": count} if count > 1 else {})
+            )
+        
+        task_id = task.id
+        try:
+            results = await run_batch(
+                llm_client, requests,
+                use_cache=task.use_cache,
+                batch_id=task.batch_id,
+                on_submitted=lambda batch_id: self._set_batch_id(db, task_id, batch_id)
+            )
+        except BatchNotSupportedError as e:
+            logger.warning(f"Task {task_id}: 提供商不支持批量接口({str(e)})，改为逐条调用")
+            return None
+        self._set_batch_id(db, task_id, None)
+        
+        outcomes = []
+        for question in questions:
+            completion = results[f"question-{question.id}"]
+            count = len(missing_samples[question.id])
+            if "error" in completion:
+                answer_results = []
+                error = completion["error"]
+            else:
+                answer_results = llm_client.sample_results(completion, system_prompts[question.id])[:count]
+                error = "批量结果返回的样本数少于请求的n"
+            answer_results += [
+                {"success": False, "error": error, "failure_reason": "batch_error", "answer": None}
+                for _ in range(count - len(answer_results))
+            ]
+            outcomes.append((system_prompts[question.id], answer_results))
+        return outcomes
+    
+    async def _evaluate_answers_batch(
+        self,
+        db: Session,
+        task: LLMEvaluationTask,
+        llm_client: LLMClient,
+        items: List[tuple]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """通过批量API评测答案，items为(llm_answer, std_question, evaluation_prompt)列表，
+        返回顺序一致的评测结果；提供商不支持批量接口时返回None"""
+        evaluation_contents = {}
+        requests = {}
+        for llm_answer, std_question, evaluation_prompt in items:
+            std_answers = std_question.std_answers
+            api_params, evaluation_content = llm_client.build_evaluation_request(
+                question=std_question.body,
+                answer=llm_answer.answer,
+                evaluation_prompt=evaluation_prompt,
+                correct_answer=std_answers[0].answer if std_answers else "",
+                question_type=std_question.question_type or 'text'
+            )
+            evaluation_contents[llm_answer.id] = evaluation_content
+            requests[f"answer-{llm_answer.id}"] = api_params
+        
+        task_id = task.id
+        try:
+            results = await run_batch(
+                llm_client, requests,
+                use_cache=task.use_cache,
+                batch_id=task.batch_id,
+                on_submitted=lambda batch_id: self._set_batch_id(db, task_id, batch_id)
+            )
+        except BatchNotSupportedError as e:
+            logger.warning(f"Task {task_id}: 提供商不支持批量接口({str(e)})，改为逐条调用")
+            return None
+        self._set_batch_id(db, task_id, None)
+        
+        outcomes = []
+        for llm_answer, _, _ in items:
+            completion = results[f"answer-{llm_answer.id}"]
+            if "error" in completion:
+                outcomes.append({
+                    "success": False,
+                    "error": completion["error"],
+                    "failure_reason": "batch_error",
+                    "score": 0,
+                    "reasoning": f"评估失败: {completion['error']}"
+                })
+            else:
+                outcomes.append(llm_client.evaluation_result(completion, evaluation_contents[llm_answer.id]))
+        return outcomes
+    
     def _generate_result_summary(self, db: Session, task_id: int) -> Dict[str, Any]:
         """生成任务结果摘要"""
         try:
@@ -579,10 +928,11 @@ class LLMEvaluationTaskProcessor:
             valid_answers = len([a for a in answers if a.is_valid])
             failed_answers = total_answers - valid_answers
             
-            # 计算成本和token使用 - 由于字段已移除，设为默认值
-            total_cost = Decimal("0")  # API字段已移除
-            total_tokens = 0  # API字段已移除
-            avg_response_time = 0  # API字段已移除
+            # 计算成本、token使用和平均耗时
+            metrics = get_task_metrics(db, task_id)
+            total_cost = metrics["total_cost"]
+            total_tokens = metrics["total_prompt_tokens"] + metrics["total_completion_tokens"]
+            avg_response_time = metrics["generation"]["latency_ms"]["avg"] or 0
             
             # 获取评估分数
             evaluations = db.query(Evaluation).join(LLMAnswer).filter(LLMAnswer.task_id == task_id).all()
@@ -679,6 +1029,92 @@ class LLMEvaluationTaskProcessor:
             except Exception as update_error:
                 logger.error(f"Failed to update task status: {str(update_error)}")
 
+    
+    def get_resume_phase(self, db: Session, task: LLMEvaluationTask) -> Optional[str]:
+        """判断任务应从哪个阶段续跑：'generate'、'evaluate'，无需续跑时返回None"""
+        # 与生成阶段计算缺失样本的规则一致：每题每个样本序号各有一条答案才算生成完成
+        samples_per_question = max(1, task.samples_per_question or 1)
+        answered = db.query(LLMAnswer.std_question_id, LLMAnswer.sample_index).filter(
+            LLMAnswer.task_id == task.id
+        ).distinct().count()
+        if not task.total_questions or answered < task.total_questions * samples_per_question:
+            return "generate"
+        valid_answers = db.query(LLMAnswer).filter(
+            LLMAnswer.task_id == task.id,
+            LLMAnswer.is_valid == True
+        ).count()
+        evaluated = db.query(Evaluation.llm_answer_id).join(
+            LLMAnswer, Evaluation.llm_answer_id == LLMAnswer.id
+        ).filter(
+            LLMAnswer.task_id == task.id,
+            Evaluation.evaluator_type.in_(AUTOMATIC_EVALUATOR_TYPES)
+        ).distinct().count()
+        if valid_answers and evaluated < valid_answers:
+            return "evaluate"
+        return None
+    
+    async def resume_task_async(self, task_id: int, phase: Optional[str] = None):
+        """续跑被中断的任务，phase为空时根据已有结果判断从哪个阶段继续"""
+        from ..db.database import SessionLocal
+        db = SessionLocal()
+        try:
+            task = get_llm_evaluation_task(db, task_id)
+            if not task:
+                logger.error(f"Task {task_id}: 任务不存在，无法续跑")
+                return
+            phase = phase or self.get_resume_phase(db, task)
+            question_limit = task.total_questions
+            if phase == "evaluate":
+                update_data = LLMEvaluationTaskUpdate(
+                    status=TaskStatus.EVALUATING_ANSWERS,
+                    error_message=None,
+                    completed_at=None
+                )
+                update_llm_evaluation_task(db, task_id, update_data)
+        finally:
+            db.close()
+        
+        logger.info(f"Task {task_id}: 从 {phase} 阶段续跑")
+        if phase == "generate":
+            await self.process_evaluation_task_async(task_id, question_limit)
+        elif phase == "evaluate":
+            await self.process_answer_evaluation_async(task_id)
+    
+    def resume_interrupted_tasks(self):
+        """为上次进程退出时仍在运行、且没有未结束作业的任务加入续跑作业"""
+        from ..db.database import SessionLocal
+        from ..crud.crud_llm_evaluation_task import get_interrupted_llm_evaluation_tasks
+        from ..crud.crud_evaluation_job import get_active_job, get_active_fanout_job, enqueue_evaluation_job
+        from ..models.evaluation_job import JobType
+        db = SessionLocal()
+        try:
+            for task in get_interrupted_llm_evaluation_tasks(db):
+                if get_active_job(db, task.id):
+                    continue
+                # 扇出作业未结束时，分组中的任务由该作业继续生成答案
+                if (task.fanout_group and task.status != TaskStatus.EVALUATING_ANSWERS
+                        and get_active_fanout_job(db, task.fanout_group)):
+                    continue
+                if task.status == TaskStatus.EVALUATING_ANSWERS:
+                    # 处于评测阶段但还没有任何评测结果的任务在等待用户启动评测，不自动续跑
+                    has_evaluations = db.query(Evaluation.id).join(
+                        LLMAnswer, Evaluation.llm_answer_id == LLMAnswer.id
+                    ).filter(
+                        LLMAnswer.task_id == task.id,
+                        Evaluation.evaluator_type.in_(AUTOMATIC_EVALUATOR_TYPES)
+                    ).first() is not None
+                    if not has_evaluations:
+                        continue
+                    # 答案已全部评测时仍需续跑一次以写入最终状态
+                    phase = self.get_resume_phase(db, task) or "evaluate"
+                else:
+                    # 答案已全部生成时仍需续跑一次以写入最终状态
+                    phase = self.get_resume_phase(db, task) or "generate"
+                logger.info(f"Task {task.id}: 检测到中断的任务，加入续跑作业")
+                job_type = JobType.GENERATE if phase == "generate" else JobType.EVALUATE
+                enqueue_evaluation_job(db, task.id, job_type, task.total_questions)
+        finally:
+            db.close()
 
 # 全局任务处理器实例
 task_processor = LLMEvaluationTaskProcessor()
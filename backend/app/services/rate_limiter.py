@@ -0,0 +1,179 @@
+"""
+LLM调用限流服务 - 按 (base_url, model) 共享的令牌桶限流器
+同时限制每分钟请求数和每分钟token数，并在遇到429时自适应降速
+"""
+import asyncio
+import random
+import threading
+import time
+import logging
+from typing import Dict, Optional, Tuple, List, Any
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """双令牌桶限流器（请求数 + token数）
+
+    状态由线程锁保护而不是asyncio.Lock，因为同一个限流器会被不同线程中的不同事件循环共享
+    （例如多个BackgroundTasks各自创建的事件循环）。
+    """
+
+    # 遇到限流时速率最多降到配置值的比例
+    MIN_RATE_SCALE = 0.1
+    # 每次成功调用后恢复的速率比例
+    RATE_RECOVERY_STEP = 0.02
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        """
+        初始化限流器
+
+        Args:
+            requests_per_minute: 每分钟请求数上限，None表示不限制
+            tokens_per_minute: 每分钟token数上限，None表示不限制
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._available_requests = float(requests_per_minute or 0)
+        self._available_tokens = float(tokens_per_minute or 0)
+        self._rate_scale = 1.0
+        self._blocked_until = 0.0
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def configure(self, requests_per_minute: Optional[int], tokens_per_minute: Optional[int]):
+        """更新限额（模型配置变化时调用）"""
+        with self._lock:
+            if requests_per_minute != self.requests_per_minute:
+                self.requests_per_minute = requests_per_minute
+                self._available_requests = min(self._available_requests, float(requests_per_minute or 0))
+            if tokens_per_minute != self.tokens_per_minute:
+                self.tokens_per_minute = tokens_per_minute
+                self._available_tokens = min(self._available_tokens, float(tokens_per_minute or 0))
+
+    def _refill(self, now: float):
+        """按经过的时间补充令牌"""
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        if self.requests_per_minute:
+            rate = self.requests_per_minute * self._rate_scale / 60.0
+            self._available_requests = min(float(self.requests_per_minute), self._available_requests + elapsed * rate)
+        if self.tokens_per_minute:
+            rate = self.tokens_per_minute * self._rate_scale / 60.0
+            self._available_tokens = min(float(self.tokens_per_minute), self._available_tokens + elapsed * rate)
+
+    def _try_acquire(self, tokens: int) -> float:
+        """尝试获取令牌，成功返回0，否则返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._blocked_until:
+                return self._blocked_until - now
+
+            wait = 0.0
+            if self.requests_per_minute and self._available_requests < 1:
+                rate = self.requests_per_minute * self._rate_scale / 60.0
+                wait = max(wait, (1 - self._available_requests) / rate)
+            if self.tokens_per_minute:
+                # 单次请求超过桶容量时按桶容量计算，避免永远等待
+                needed = min(tokens, self.tokens_per_minute)
+                if self._available_tokens < needed:
+                    rate = self.tokens_per_minute * self._rate_scale / 60.0
+                    wait = max(wait, (needed - self._available_tokens) / rate)
+            if wait > 0:
+                return wait
+
+            if self.requests_per_minute:
+                self._available_requests -= 1
+            if self.tokens_per_minute:
+                self._available_tokens -= tokens
+            return 0.0
+
+    async def acquire(self, tokens: int = 0):
+        """等待直到可以发起一次预计消耗tokens个token的请求"""
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        """请求完成后按实际token用量修正token桶"""
+        if not self.tokens_per_minute:
+            return
+        with self._lock:
+            self._available_tokens += estimated_tokens - actual_tokens
+
+    def record_success(self):
+        """成功调用后逐步恢复被降低的速率"""
+        with self._lock:
+            if self._rate_scale < 1.0:
+                self._rate_scale = min(1.0, self._rate_scale + self.RATE_RECOVERY_STEP)
+
+    def penalize(self, delay: float):
+        """遇到限流(429)时暂停所有共享该限流器的调用，并将速率减半"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._blocked_until = max(self._blocked_until, now + delay)
+            self._rate_scale = max(self.MIN_RATE_SCALE, self._rate_scale / 2)
+        logger.warning(f"Rate limited, pausing for {delay:.2f}s (rate scale {self._rate_scale:.2f})")
+
+
+# 全局限流器注册表，键为 (base_url, model_name)
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    base_url: str,
+    model_name: str,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None
+) -> RateLimiter:
+    """获取（或创建）某个端点+模型共享的限流器"""
+    key = (base_url.rstrip("/"), model_name)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+            _limiters[key] = limiter
+    limiter.configure(requests_per_minute, tokens_per_minute)
+    return limiter
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: int) -> int:
+    """粗略估计一次请求的token用量（提示词按字符数计，补全按max_tokens计）"""
+    prompt_chars = sum(len(str(message.get("content") or "")) for message in messages)
+    return prompt_chars + (max_tokens or 0)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, max_delay: float = 60.0) -> float:
+    """指数退避 + 抖动"""
+    cap = min(max_delay, base * (2 ** attempt))
+    return cap / 2 + random.uniform(0, cap / 2)
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """解析 Retry-After / retry-after-ms 响应头，返回秒数"""
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        retry_at = parsedate_to_datetime(retry_after)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
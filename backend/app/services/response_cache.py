@@ -0,0 +1,137 @@
+"""
+LLM响应缓存服务 - 以请求内容哈希为键的本地SQLite持久化缓存
+相同模型、消息和采样参数的请求直接复用之前的补全结果
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from ..config.llm_config import LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE_MAX_AGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """基于SQLite的响应缓存，支持按总大小和按时间淘汰"""
+
+    # 每写入多少条记录执行一次淘汰
+    EVICT_EVERY = 100
+
+    def __init__(self, path: str, max_bytes: int, max_age_seconds: int):
+        """
+        初始化缓存
+
+        Args:
+            path: SQLite文件路径
+            max_bytes: 缓存内容总大小上限（字节），超过后按最近访问时间淘汰
+            max_age_seconds: 缓存条目的最长保留时间（秒）
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._writes_since_evict = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response_cache (
+                cache_key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_accessed ON response_cache (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """根据模型、消息和采样参数计算缓存键"""
+        canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，过期条目视为未命中"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM response_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.max_age_seconds and now - created_at > self.max_age_seconds:
+                self._conn.execute("DELETE FROM response_cache WHERE cache_key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE response_cache SET accessed_at = ? WHERE cache_key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """写入缓存"""
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (cache_key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            self._conn.commit()
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= self.EVICT_EVERY:
+                self._writes_since_evict = 0
+                self._evict(now)
+
+    def _evict(self, now: float):
+        """淘汰过期条目，并在超出大小上限时按最近访问时间淘汰（调用方需持有锁）"""
+        if self.max_age_seconds:
+            self._conn.execute("DELETE FROM response_cache WHERE created_at < ?", (now - self.max_age_seconds,))
+        if self.max_bytes:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+            if total > self.max_bytes:
+                # 淘汰到上限的90%，避免每次写入都触发淘汰
+                target = total - int(self.max_bytes * 0.9)
+                freed = 0
+                keys = []
+                for cache_key, size in self._conn.execute(
+                    "SELECT cache_key, size FROM response_cache ORDER BY accessed_at"
+                ):
+                    keys.append((cache_key,))
+                    freed += size
+                    if freed >= target:
+                        break
+                self._conn.executemany("DELETE FROM response_cache WHERE cache_key = ?", keys)
+                logger.info(f"Response cache evicted {len(keys)} entries ({freed} bytes)")
+        self._conn.commit()
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+            self._conn.commit()
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """获取全局响应缓存实例"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE_MAX_AGE_SECONDS)
+    return _response_cache
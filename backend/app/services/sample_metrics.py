@@ -0,0 +1,126 @@
+"""
+多次采样指标 - 按题汇总同一问题的多个样本，计算pass@1、pass@k和多数投票准确率
+评测阶段结束时计算一次，结果写入任务评分汇总表
+"""
+import logging
+from collections import Counter, defaultdict
+from math import comb
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import select, func, case
+from sqlalchemy.orm import Session
+
+from ..models.llm_answer import LLMAnswer
+from ..models.std_question import StdQuestion
+from ..models.evaluation import Evaluation
+from ..models.llm_evaluation_task import LLMEvaluationTask
+from ..models.task_score_aggregate import ALL_QUESTION_TYPES
+from ..crud.crud_task_score_aggregate import save_sample_metrics
+from ..config.llm_config import PASS_SCORE_THRESHOLD, EXPORT_PAGE_SIZE
+from .choice_grader import extract_choice
+
+logger = logging.getLogger(__name__)
+
+# (选择题选项或None, 样本得分)
+Sample = Tuple[Optional[str], float]
+
+
+def pass_at_k(n: int, c: int, k: int) -> float:
+    """n个样本中c个通过时pass@k的无偏估计"""
+    if n - c < k:
+        return 1.0
+    return 1.0 - comb(n - c, k) / comb(n, k)
+
+
+def majority_vote_correct(question_type: str, samples: List[Sample]) -> bool:
+    """
+    多数投票是否正确
+
+    选择题按解析出的选项分组，取样本最多的选项（并列时取最先出现的），该组平均分通过即正确；
+    其他题型无法比较回答文本，按通过的样本是否过半判断。
+    """
+    if question_type == "choice":
+        votes = Counter(choice for choice, _ in samples if choice)
+        if votes:
+            top = max(votes.values())
+            winner = next(choice for choice, _ in samples if choice and votes[choice] == top)
+            scores = [score for choice, score in samples if choice == winner]
+            return sum(scores) / len(scores) >= PASS_SCORE_THRESHOLD
+    passed = sum(1 for _, score in samples if score >= PASS_SCORE_THRESHOLD)
+    return passed * 2 > len(samples)
+
+
+def compute_sample_metrics(db: Session, task_id: int) -> Dict[str, Dict[str, Any]]:
+    """
+    计算任务按问题类型（及all）的多次采样指标（百分比）
+
+    每个样本的得分为其有效评测的平均分，没有评分的样本不参与计算；
+    所有样本按题排序后流式读取，只在内存中保留当前一道题的样本。
+    """
+    k = db.query(LLMEvaluationTask.samples_per_question).filter(LLMEvaluationTask.id == task_id).scalar() or 1
+    sample_score = select(func.avg(Evaluation.score)).where(
+        Evaluation.llm_answer_id == LLMAnswer.id,
+        Evaluation.is_valid == True,
+        Evaluation.score.isnot(None)
+    ).scalar_subquery()
+    query = select(
+        LLMAnswer.std_question_id,
+        StdQuestion.question_type,
+        # 只有选择题需要回答文本，用于按选项投票
+        case((StdQuestion.question_type == "choice", LLMAnswer.answer), else_=None).label("answer"),
+        sample_score.label("score")
+    ).select_from(LLMAnswer).outerjoin(
+        StdQuestion, StdQuestion.id == LLMAnswer.std_question_id
+    ).where(
+        LLMAnswer.task_id == task_id,
+        LLMAnswer.is_valid == True
+    ).order_by(LLMAnswer.std_question_id, LLMAnswer.sample_index)
+
+    totals = defaultdict(lambda: {"questions": 0, "pass_at_1": 0.0, "pass_at_k": 0.0, "majority": 0})
+
+    def add_question(question_type: str, samples: List[Sample]):
+        if not samples:
+            return
+        n = len(samples)
+        c = sum(1 for _, score in samples if score >= PASS_SCORE_THRESHOLD)
+        majority = majority_vote_correct(question_type, samples)
+        for key in (question_type, ALL_QUESTION_TYPES):
+            total = totals[key]
+            total["questions"] += 1
+            total["pass_at_1"] += c / n
+            total["pass_at_k"] += pass_at_k(n, c, min(k, n))
+            total["majority"] += int(majority)
+
+    current_id, current_type, samples = None, None, []
+    result = db.execute(query, execution_options={"stream_results": True})
+    for rows in result.partitions(EXPORT_PAGE_SIZE):
+        for row in rows:
+            if row.std_question_id != current_id:
+                add_question(current_type, samples)
+                current_id, current_type, samples = row.std_question_id, row.question_type or "text", []
+            if row.score is not None:
+                samples.append((extract_choice(row.answer), float(row.score)))
+    add_question(current_type, samples)
+
+    return {
+        question_type: {
+            "question_count": total["questions"],
+            "samples_per_question": k,
+            "pass_at_1": round(total["pass_at_1"] / total["questions"] * 100, 2),
+            "pass_at_k": round(total["pass_at_k"] / total["questions"] * 100, 2),
+            "majority_vote_accuracy": round(total["majority"] / total["questions"] * 100, 2)
+        }
+        for question_type, total in totals.items()
+    }
+
+
+def refresh_sample_metrics(db: Session, task_id: int):
+    """计算并写入任务的多次采样指标"""
+    metrics = compute_sample_metrics(db, task_id)
+    save_sample_metrics(db, task_id, metrics)
+    overall = metrics.get(ALL_QUESTION_TYPES)
+    if overall:
+        logger.info(
+            f"Task {task_id}: pass@1 {overall['pass_at_1']}%，pass@{overall['samples_per_question']} {overall['pass_at_k']}%，"
+            f"多数投票 {overall['majority_vote_accuracy']}%"
+        )
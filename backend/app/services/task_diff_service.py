@@ -0,0 +1,146 @@
+"""
+任务对比服务 - 在数据库中按标准问题关联两个任务的答案和评分，逐行输出分差（NDJSON）
+两侧的每题得分由一次分组查询得到，结果通过流式游标读取，内存占用与题目数量无关
+"""
+import json
+import logging
+from typing import Dict, Any, Iterator, Optional
+
+from sqlalchemy import select, func, and_, case
+from sqlalchemy.orm import aliased
+
+from ..db.database import SessionLocal
+from ..models.llm_answer import LLMAnswer
+from ..models.std_question import StdQuestion
+from ..models.evaluation import Evaluation
+from ..config.llm_config import EXPORT_PAGE_SIZE
+from .choice_grader import extract_choice
+
+logger = logging.getLogger(__name__)
+
+def _task_scores(task_id: int):
+    """任务每道题的得分（有效答案上有效评测的平均分）和代表答案ID，每题一行"""
+    return select(
+        LLMAnswer.std_question_id.label("std_question_id"),
+        func.min(LLMAnswer.id).label("answer_id"),
+        func.avg(Evaluation.score).label("score")
+    ).select_from(LLMAnswer).outerjoin(
+        Evaluation, and_(
+            Evaluation.llm_answer_id == LLMAnswer.id,
+            Evaluation.is_valid == True,
+            Evaluation.score.isnot(None)
+        )
+    ).where(
+        LLMAnswer.task_id == task_id,
+        LLMAnswer.is_valid == True
+    ).group_by(LLMAnswer.std_question_id).subquery()
+
+
+def build_diff_query(base_task_id: int, other_task_id: int, only_changed: bool = False):
+    """两个任务按标准问题关联的对比查询，delta为对比任务得分减基准任务得分"""
+    base = _task_scores(base_task_id)
+    other = _task_scores(other_task_id)
+    base_answer = aliased(LLMAnswer)
+    other_answer = aliased(LLMAnswer)
+    is_choice = StdQuestion.question_type == "choice"
+    delta = (other.c.score - base.c.score).label("delta")
+
+    query = select(
+        base.c.std_question_id,
+        StdQuestion.question_type,
+        base.c.score.label("base_score"),
+        other.c.score.label("other_score"),
+        delta,
+        # 只有选择题需要取回回答文本，用于判断选项是否变化
+        case((is_choice, base_answer.answer), else_=None).label("base_answer"),
+        case((is_choice, other_answer.answer), else_=None).label("other_answer")
+    ).select_from(base).join(
+        other, other.c.std_question_id == base.c.std_question_id
+    ).outerjoin(
+        StdQuestion, StdQuestion.id == base.c.std_question_id
+    ).outerjoin(
+        base_answer, base_answer.id == base.c.answer_id
+    ).outerjoin(
+        other_answer, other_answer.id == other.c.answer_id
+    )
+    if only_changed:
+        query = query.where(delta != 0)
+    return query, delta
+
+
+def _format_score(score) -> Optional[float]:
+    return round(float(score), 2) if score is not None else None
+
+
+def _diff_item(row) -> Dict[str, Any]:
+    item = {
+        "question_id": row.std_question_id,
+        "question_type": row.question_type or "text",
+        "base_score": _format_score(row.base_score),
+        "other_score": _format_score(row.other_score),
+        "delta": _format_score(row.delta)
+    }
+    if row.question_type == "choice":
+        base_choice = extract_choice(row.base_answer)
+        other_choice = extract_choice(row.other_answer)
+        item["base_choice"] = base_choice
+        item["other_choice"] = other_choice
+        item["flipped"] = base_choice != other_choice
+    return item
+
+
+def stream_task_diff(base_task_id: int, other_task_id: int, top_n: int = 20,
+                     only_changed: bool = False) -> Iterator[bytes]:
+    """
+    生成两个任务的逐题对比（NDJSON）
+
+    每道题一行，最后一行为 {"summary": ...}，包含提升、退步、不变的题数，平均分差，
+    选择题选项变化数，以及分差最大的top_n个退步题目。使用独立的数据库会话。
+    """
+    db = SessionLocal()
+    try:
+        query, delta = build_diff_query(base_task_id, other_task_id, only_changed)
+        summary = {
+            "base_task_id": base_task_id,
+            "other_task_id": other_task_id,
+            "matched": 0,
+            "improved": 0,
+            "regressed": 0,
+            "unchanged": 0,
+            "unscored": 0,
+            "average_delta": None,
+            "flipped_choices": 0
+        }
+        delta_sum = 0.0
+        result = db.execute(query.order_by(query.selected_columns.std_question_id),
+                            execution_options={"stream_results": True})
+        for rows in result.partitions(EXPORT_PAGE_SIZE):
+            lines = []
+            for row in rows:
+                item = _diff_item(row)
+                summary["matched"] += 1
+                if item["delta"] is None:
+                    summary["unscored"] += 1
+                else:
+                    delta_sum += item["delta"]
+                    key = "improved" if item["delta"] > 0 else "regressed" if item["delta"] < 0 else "unchanged"
+                    summary[key] += 1
+                if item.get("flipped"):
+                    summary["flipped_choices"] += 1
+                lines.append(json.dumps(item, ensure_ascii=False) + "\n")
+            yield "".join(lines).encode("utf-8")
+
+        scored = summary["matched"] - summary["unscored"]
+        if scored:
+            summary["average_delta"] = round(delta_sum / scored, 2)
+        summary["top_regressions"] = [
+            _diff_item(row) for row in db.execute(
+                query.where(delta < 0).order_by(delta, query.selected_columns.std_question_id).limit(top_n)
+            )
+        ] if top_n > 0 else []
+        yield (json.dumps({"summary": summary}, ensure_ascii=False) + "\n").encode("utf-8")
+    except Exception as e:
+        logger.error(f"Task {base_task_id} vs {other_task_id}: 生成对比失败: {str(e)}")
+        raise
+    finally:
+        db.close()
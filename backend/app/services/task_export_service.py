@@ -0,0 +1,187 @@
+"""
+任务结果导出服务 - 按页读取答案和评测结果，逐行写出JSON/NDJSON/CSV，可选gzip压缩
+导出过程内存占用与任务规模无关，响应在读取第一页后即开始传输
+"""
+import csv
+import io
+import json
+import zlib
+import logging
+from collections import defaultdict
+from typing import Dict, Any, Iterator, List
+
+from sqlalchemy.orm import Session
+
+from ..db.database import SessionLocal
+from ..models.llm_answer import LLMAnswer
+from ..models.std_question import StdQuestion
+from ..models.evaluation import Evaluation
+from ..models.llm_evaluation_task import LLMEvaluationTask
+from ..config.llm_config import EXPORT_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+CSV_COLUMNS = [
+    "question_id", "sample_index", "question_text", "question_type", "llm_answer", "answered_at", "is_valid",
+    "response_time_ms", "evaluator_type", "score", "reasoning", "evaluation_time"
+]
+
+
+def iter_answer_pages(db: Session, task_id: int, include_prompts: bool = False,
+                      page_size: int = EXPORT_PAGE_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """按答案ID分页（keyset）读取任务结果，每页一次查询答案、一次查询评测"""
+    columns = [
+        LLMAnswer.id, LLMAnswer.std_question_id, LLMAnswer.sample_index, StdQuestion.body, StdQuestion.question_type,
+        LLMAnswer.answer, LLMAnswer.answered_at, LLMAnswer.is_valid, LLMAnswer.response_time_ms
+    ]
+    if include_prompts:
+        columns.append(LLMAnswer.prompt_used)
+
+    last_id = 0
+    while True:
+        rows = db.query(*columns).outerjoin(
+            StdQuestion, StdQuestion.id == LLMAnswer.std_question_id
+        ).filter(
+            LLMAnswer.task_id == task_id,
+            LLMAnswer.id > last_id
+        ).order_by(LLMAnswer.id).limit(page_size).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+
+        evaluations = defaultdict(list)
+        for e in db.query(
+            Evaluation.llm_answer_id, Evaluation.score, Evaluation.reasoning,
+            Evaluation.evaluator_type, Evaluation.evaluation_time
+        ).filter(
+            Evaluation.llm_answer_id.in_([row.id for row in rows])
+        ).order_by(Evaluation.llm_answer_id, Evaluation.id):
+            evaluations[e.llm_answer_id].append({
+                "score": float(e.score) if e.score is not None else None,
+                "reasoning": e.reasoning,
+                "evaluator_type": e.evaluator_type.value,
+                "evaluation_time": e.evaluation_time.isoformat() if e.evaluation_time else None
+            })
+
+        page = []
+        for row in rows:
+            item = {
+                "question_id": row.std_question_id,
+                "sample_index": row.sample_index,
+                "question_text": row.body or "",
+                "question_type": row.question_type or "text",
+                "llm_answer": row.answer,
+                "answered_at": row.answered_at.isoformat() if row.answered_at else None,
+                "is_valid": row.is_valid,
+                "response_time_ms": row.response_time_ms
+            }
+            if include_prompts and row.prompt_used:
+                item["prompt_used"] = row.prompt_used
+            item["evaluations"] = evaluations.get(row.id, [])
+            page.append(item)
+        yield page
+
+
+def _json_chunks(task_info: Dict[str, Any], summary: Dict[str, Any],
+                 pages: Iterator[List[Dict[str, Any]]]) -> Iterator[str]:
+    """与原下载接口结构一致的JSON文档，results数组逐条写出，摘要放在最后"""
+    yield '{"task_info": ' + json.dumps(task_info, ensure_ascii=False) + ', "results": ['
+    first = True
+    for page in pages:
+        parts = []
+        for item in page:
+            parts.append(("\n" if first else ",\n") + json.dumps(item, ensure_ascii=False))
+            first = False
+        yield "".join(parts)
+    yield '\n], "summary": ' + json.dumps(summary, ensure_ascii=False) + '}\n'
+
+
+def _ndjson_chunks(pages: Iterator[List[Dict[str, Any]]]) -> Iterator[str]:
+    """每个答案一行JSON，评测结果嵌套在evaluations字段中"""
+    for page in pages:
+        yield "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in page)
+
+
+def _csv_chunks(pages: Iterator[List[Dict[str, Any]]], include_prompts: bool) -> Iterator[str]:
+    """每条评测一行，没有评测的答案单独占一行"""
+    columns = CSV_COLUMNS + (["prompt_used"] if include_prompts else [])
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    # 带BOM便于Excel识别UTF-8
+    buffer.write("\ufeff")
+    writer.writeheader()
+    for page in pages:
+        for item in page:
+            for evaluation in item["evaluations"] or [{}]:
+                writer.writerow({**item, **evaluation})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """逐块gzip压缩"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_task_results(task_id: int, export_format: str = "json", include_prompts: bool = False,
+                        compress: bool = False) -> Iterator[bytes]:
+    """
+    生成任务结果导出内容
+
+    使用独立的数据库会话，响应开始传输后不依赖请求的会话。
+    """
+    db = SessionLocal()
+    try:
+        pages = iter_answer_pages(db, task_id, include_prompts)
+        if export_format == "ndjson":
+            chunks = _ndjson_chunks(pages)
+        elif export_format == "csv":
+            chunks = _csv_chunks(pages, include_prompts)
+        else:
+            task = db.query(LLMEvaluationTask).filter(LLMEvaluationTask.id == task_id).first()
+            chunks = _json_chunks(*_task_header(task), pages)
+
+        encoded = (chunk.encode("utf-8") for chunk in chunks)
+        yield from (gzip_chunks(encoded) if compress else encoded)
+    except Exception as e:
+        logger.error(f"Task {task_id}: 导出结果失败: {str(e)}")
+        raise
+    finally:
+        db.close()
+
+
+def _task_header(task: LLMEvaluationTask):
+    """JSON导出的task_info和summary部分"""
+    task_info = {
+        "id": task.id,
+        "name": task.name,
+        "model": task.model.name if task.model else "Unknown",  # 使用关联的模型名称
+        "dataset": task.dataset.name if task.dataset else "Unknown",
+        "created_at": task.created_at.isoformat() if task.created_at else None
+    }
+    summary = {
+        "total_questions": task.total_questions,
+        "successful_count": task.completed_questions,
+        "failed_count": task.failed_questions,
+        "average_score": float(task.score) if task.score is not None else None,
+    }
+    return task_info, summary
+
+
+def export_filename(task_id: int, export_format: str, compress: bool) -> str:
+    extension = {"json": "json", "ndjson": "jsonl", "csv": "csv"}[export_format]
+    return f"task_{task_id}_detailed_results.{extension}" + (".gz" if compress else "")
@@ -0,0 +1,149 @@
+"""
+任务进度发布 - 处理器在内存中维护进度（计数、速率、预计剩余时间、最新条目、进行中的请求），
+定期覆盖写入TaskProgressSnapshot，进度接口和SSE推送只读取这一行
+"""
+import asyncio
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from ..db.database import SessionLocal
+from ..crud.crud_llm_evaluation_task import save_task_progress_snapshot
+from ..config.llm_config import PROGRESS_SNAPSHOT_SECONDS, INFLIGHT_PARTIAL_CHARS
+
+logger = logging.getLogger(__name__)
+
+# 最新内容保留的长度
+LATEST_CONTENT_CHARS = 200
+
+
+class TaskProgressPublisher:
+    """单个任务阶段（生成答案或评测答案）的进度发布器"""
+
+    def __init__(
+        self,
+        task_id: int,
+        phase: str,
+        total_items: int,
+        completed_items: int = 0,
+        failed_items: int = 0,
+        interval: float = PROGRESS_SNAPSHOT_SECONDS
+    ):
+        """
+        初始化进度发布器
+
+        Args:
+            task_id: 任务ID
+            phase: 阶段，与TaskStatus取值一致（generating_answers / evaluating_answers）
+            total_items: 本阶段的条目总数
+            completed_items / failed_items: 续跑时已有的成功和失败数
+            interval: 写入快照的间隔（秒）
+        """
+        self.task_id = task_id
+        self.phase = phase
+        self.total_items = total_items
+        self.completed_items = completed_items
+        self.failed_items = failed_items
+        self.interval = interval
+        self.latest_content: Optional[str] = None
+        self.latest_score: Optional[float] = None
+        self.latest_content_type: Optional[str] = None
+        # 按 (问题ID, 样本序号) 登记，同一问题的多个样本可同时执行
+        self.inflight: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        # 速率只按本次运行处理的条目计算，续跑时已有的结果不计入
+        self._started_at = time.monotonic()
+        self._initial_processed = completed_items + failed_items
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        """开始定期写入快照（立即写入第一次，覆盖上一阶段留下的快照）"""
+        self._writer = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止定期写入，并写入最终快照"""
+        if self._writer:
+            self._writer.cancel()
+            self._writer = None
+        self.inflight.clear()
+        await self.publish()
+
+    def request_started(self, question_id: int, sample_index: int = 0) -> Dict[str, Any]:
+        """登记一个开始执行的请求，返回可传给on_delta的条目"""
+        entry = self.inflight[(question_id, sample_index)] = {"started_at": time.time(), "first_token_ms": None, "partial": ""}
+        return entry
+
+    def on_delta(self, entry: Dict[str, Any], delta: str):
+        """流式生成时累积请求的部分输出"""
+        if entry["first_token_ms"] is None:
+            entry["first_token_ms"] = int((time.time() - entry["started_at"]) * 1000)
+        entry["partial"] = (entry["partial"] + delta)[-INFLIGHT_PARTIAL_CHARS:]
+
+    def request_finished(self, question_id: int, sample_index: int = 0):
+        self.inflight.pop((question_id, sample_index), None)
+
+    def record(self, success: bool, content: Optional[str] = None, score: Optional[float] = None,
+               content_type: str = "answer"):
+        """记录一个已完成的条目，并更新最新内容"""
+        if success:
+            self.completed_items += 1
+        else:
+            self.failed_items += 1
+        if content is not None:
+            self.latest_content = content[:LATEST_CONTENT_CHARS] + "..." if len(content) > LATEST_CONTENT_CHARS else content
+            self.latest_score = score
+            self.latest_content_type = content_type
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前进度的快照内容"""
+        processed = self.completed_items + self.failed_items
+        processed_this_run = processed - self._initial_processed
+        elapsed = time.monotonic() - self._started_at
+        questions_per_minute = None
+        estimated_remaining_time = None
+        if elapsed > 0 and processed_this_run > 0:
+            questions_per_minute = round(processed_this_run / elapsed * 60, 2)
+            estimated_remaining_time = int(max(0, self.total_items - processed) / questions_per_minute * 60)
+        now = time.time()
+        return {
+            "phase": self.phase,
+            "progress": int(processed / self.total_items * 100) if self.total_items else 100,
+            "total_items": self.total_items,
+            "completed_items": self.completed_items,
+            "failed_items": self.failed_items,
+            "questions_per_minute": questions_per_minute,
+            "estimated_remaining_time": estimated_remaining_time,
+            "latest_content": self.latest_content,
+            "latest_score": self.latest_score,
+            "latest_content_type": self.latest_content_type,
+            "inflight": [
+                {
+                    "question_id": question_id,
+                    "sample_index": sample_index,
+                    "elapsed_ms": int((now - entry["started_at"]) * 1000),
+                    "first_token_ms": entry["first_token_ms"],
+                    "partial": entry["partial"] or None
+                }
+                for (question_id, sample_index), entry in list(self.inflight.items())
+            ],
+            "updated_at": datetime.now()
+        }
+
+    async def publish(self):
+        """写入一次快照"""
+        await asyncio.to_thread(self._save, self.snapshot())
+
+    def _save(self, values: Dict[str, Any]):
+        """使用独立会话写入快照，不影响任务主会话中的写缓冲"""
+        db = SessionLocal()
+        try:
+            save_task_progress_snapshot(db, self.task_id, values)
+        except Exception as e:
+            logger.warning(f"Task {self.task_id}: 写入进度快照失败: {str(e)}")
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            await self.publish()
+            await asyncio.sleep(self.interval)
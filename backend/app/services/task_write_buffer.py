@@ -0,0 +1,117 @@
+"""
+评测任务写缓冲 - 批量写入LLMAnswer/Evaluation行并合并任务进度更新
+"""
+import time
+import logging
+from typing import Dict, Any, List
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from ..models.llm_answer import LLMAnswer
+from ..models.evaluation import Evaluation
+from ..models.llm_evaluation_task import LLMEvaluationTask
+from ..crud.crud_task_score_aggregate import apply_evaluation_score_changes
+from ..config.llm_config import WRITE_BUFFER_ROWS, WRITE_BUFFER_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class TaskWriteBuffer:
+    """任务处理器的写缓冲
+
+    答案和评测行先缓存在内存中，累计到flush_rows行或距上次写入超过flush_interval秒时
+    用一次批量INSERT写入；进度字段只保留最新值，随批量写入一起提交。
+    """
+
+    def __init__(self, db: Session, task_id: int, flush_rows: int = WRITE_BUFFER_ROWS, flush_interval: float = WRITE_BUFFER_SECONDS):
+        """
+        初始化写缓冲
+
+        Args:
+            db: 数据库会话
+            task_id: 任务ID
+            flush_rows: 累计多少行后写入
+            flush_interval: 距上次写入多少秒后写入
+        """
+        self.db = db
+        self.task_id = task_id
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.pending_answers: List[Dict[str, Any]] = []
+        self.pending_evaluations: List[Dict[str, Any]] = []
+        self.pending_progress: Dict[str, Any] = {}
+        self.last_flush = time.monotonic()
+
+    def add_answer(self, **values):
+        """缓存一条LLMAnswer"""
+        self.pending_answers.append(values)
+
+    def add_evaluation(self, **values):
+        """缓存一条Evaluation"""
+        self.pending_evaluations.append(values)
+
+    def set_progress(self, **fields):
+        """记录最新的任务进度字段，多次调用只保留最后的值"""
+        self.pending_progress.update(fields)
+
+    def maybe_flush(self) -> bool:
+        """达到行数或时间阈值时写入，返回是否执行了写入"""
+        pending_rows = len(self.pending_answers) + len(self.pending_evaluations)
+        if pending_rows >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        """把缓存的行和进度写入数据库"""
+        self.last_flush = time.monotonic()
+        if not (self.pending_answers or self.pending_evaluations or self.pending_progress):
+            return
+        answers, self.pending_answers = self.pending_answers, []
+        evaluations, self.pending_evaluations = self.pending_evaluations, []
+        progress, self.pending_progress = self.pending_progress, {}
+        try:
+            self._write(answers, evaluations, progress)
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Task {self.task_id}: 批量写入失败，改为逐行写入: {str(e)}")
+            self._write_row_by_row(answers, evaluations, progress)
+
+    def _write(self, answers: List[Dict[str, Any]], evaluations: List[Dict[str, Any]], progress: Dict[str, Any]):
+        if answers:
+            self.db.execute(insert(LLMAnswer), answers)
+        if evaluations:
+            self.db.execute(insert(Evaluation), evaluations)
+            self._update_score_aggregate(evaluations)
+        if progress:
+            self.db.execute(
+                update(LLMEvaluationTask).where(LLMEvaluationTask.id == self.task_id).values(**progress)
+            )
+        self.db.commit()
+
+    def _update_score_aggregate(self, evaluations: List[Dict[str, Any]]):
+        """新写入的评测计入任务评分汇总，与评测行在同一事务中提交"""
+        apply_evaluation_score_changes(self.db, [
+            (row["llm_answer_id"], None, row.get("score"))
+            for row in evaluations if row.get("is_valid", True)
+        ])
+
+    def _write_row_by_row(self, answers: List[Dict[str, Any]], evaluations: List[Dict[str, Any]], progress: Dict[str, Any]):
+        """批量写入失败时逐行重试，只丢弃真正写不进去的行"""
+        for model, rows in ((LLMAnswer, answers), (Evaluation, evaluations)):
+            for row in rows:
+                try:
+                    self.db.execute(insert(model), [row])
+                    if model is Evaluation:
+                        self._update_score_aggregate([row])
+                    self.db.commit()
+                except Exception as e:
+                    self.db.rollback()
+                    logger.error(f"Task {self.task_id}: 写入{model.__tablename__}失败: {str(e)}")
+        if progress:
+            try:
+                self._write([], [], progress)
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"Task {self.task_id}: 写入任务进度失败: {str(e)}")
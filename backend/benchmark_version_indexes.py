@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+版本快照查询基准脚本 - 检查版本快照读取是否使用复合索引，并与忽略该索引时的耗时对比
+
+用法：
+    python benchmark_version_indexes.py [--dataset-id ID] [--version V] [--repeat N]
+
+未指定数据集时选择问题最多的数据集，未指定版本时使用数据集当前版本。
+任一查询未对复合索引做范围扫描（range/ref）时以非0状态退出。
+"""
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, select, func, and_
+from app.db.database import DATABASE_URL
+from app.models.dataset import Dataset
+from app.models.std_question import StdQuestion
+from app.models.std_answer import StdAnswer
+
+QUESTION_INDEX = "idx_stdquestion_dataset_valid_version"
+ANSWER_INDEX = "idx_stdanswer_question_valid_version"
+# 使用索引时可接受的访问类型
+INDEX_ACCESS_TYPES = {"range", "ref", "eq_ref"}
+
+
+def question_snapshot_query(dataset_id: int, version: int):
+    """数据集某版本的有效问题（与crud_std_question的版本过滤一致）"""
+    return select(StdQuestion.id, StdQuestion.question_type).where(
+        StdQuestion.dataset_id == dataset_id,
+        StdQuestion.is_valid == True,
+        StdQuestion.original_version_id <= version,
+        StdQuestion.current_version_id >= version
+    )
+
+
+def answer_snapshot_query(dataset_id: int, version: int):
+    """数据集某版本的有效答案（与get_std_answers_by_dataset_version一致）"""
+    return select(StdAnswer.id, StdAnswer.std_question_id).join(
+        StdQuestion, StdQuestion.id == StdAnswer.std_question_id
+    ).where(
+        StdQuestion.dataset_id == dataset_id,
+        StdQuestion.is_valid == True,
+        StdQuestion.original_version_id <= version,
+        StdQuestion.current_version_id >= version,
+        StdAnswer.is_valid == True,
+        StdAnswer.original_version_id <= version,
+        StdAnswer.current_version_id >= version
+    )
+
+
+def count_snapshot_query(dataset_id: int, version: int):
+    """数据集某版本的问题数和答案数（统计接口使用的形式）"""
+    return select(
+        func.count(func.distinct(StdQuestion.id)), func.count(func.distinct(StdAnswer.id))
+    ).select_from(StdQuestion).outerjoin(
+        StdAnswer, and_(
+            StdAnswer.std_question_id == StdQuestion.id,
+            StdAnswer.is_valid == True,
+            StdAnswer.original_version_id <= version,
+            StdAnswer.current_version_id >= version
+        )
+    ).where(
+        StdQuestion.dataset_id == dataset_id,
+        StdQuestion.is_valid == True,
+        StdQuestion.original_version_id <= version,
+        StdQuestion.current_version_id >= version
+    )
+
+
+def ignore_indexes(query):
+    """同一查询忽略复合索引，用于对比耗时"""
+    return query.with_hint(
+        StdQuestion, f"IGNORE INDEX ({QUESTION_INDEX})", "mysql"
+    ).with_hint(
+        StdAnswer, f"IGNORE INDEX ({ANSWER_INDEX})", "mysql"
+    )
+
+
+def compile_sql(conn, query) -> str:
+    return str(query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+
+
+def explain(conn, query):
+    """EXPLAIN结果，每个表一行"""
+    return [dict(row._mapping) for row in conn.exec_driver_sql("EXPLAIN " + compile_sql(conn, query))]
+
+
+def timed(conn, query, repeat: int) -> float:
+    """多次执行取最短耗时（毫秒）"""
+    sql = compile_sql(conn, query)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.exec_driver_sql(sql).fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def pick_dataset(conn, dataset_id, version):
+    """确定要测试的数据集和版本"""
+    if dataset_id is None:
+        dataset_id = conn.execute(
+            select(StdQuestion.dataset_id).group_by(StdQuestion.dataset_id)
+            .order_by(func.count(StdQuestion.id).desc()).limit(1)
+        ).scalar()
+        if dataset_id is None:
+            raise RuntimeError("数据库中没有标准问题")
+    if version is None:
+        version = conn.execute(select(Dataset.version).where(Dataset.id == dataset_id)).scalar()
+        if version is None:
+            raise RuntimeError(f"数据集 {dataset_id} 不存在")
+    return dataset_id, version
+
+
+def run_benchmark(dataset_id=None, version=None, repeat: int = 5) -> bool:
+    """执行基准测试，所有查询都使用复合索引时返回True"""
+    engine = create_engine(DATABASE_URL)
+    expected = {StdQuestion.__tablename__: QUESTION_INDEX, StdAnswer.__tablename__: ANSWER_INDEX}
+    ok = True
+    with engine.connect() as conn:
+        dataset_id, version = pick_dataset(conn, dataset_id, version)
+        print(f"数据集 {dataset_id}，版本 {version}，每个查询执行 {repeat} 次取最短耗时")
+        cases = [
+            ("问题快照", question_snapshot_query(dataset_id, version)),
+            ("答案快照", answer_snapshot_query(dataset_id, version)),
+            ("快照计数", count_snapshot_query(dataset_id, version)),
+        ]
+        for name, query in cases:
+            print(f"\n[{name}]")
+            for row in explain(conn, query):
+                table = row.get("table")
+                used = row.get("key") == expected.get(table) and row.get("type") in INDEX_ACCESS_TYPES
+                if table in expected and not used:
+                    ok = False
+                print(f"  {table}: type={row.get('type')} key={row.get('key')} rows={row.get('rows')} "
+                      f"extra={row.get('Extra')} {'✓' if used else '✗' if table in expected else ''}")
+            with_index = timed(conn, query, repeat)
+            without_index = timed(conn, ignore_indexes(query), repeat)
+            print(f"  使用复合索引: {with_index:.2f} ms，忽略复合索引: {without_index:.2f} ms")
+    engine.dispose()
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="版本快照查询基准测试")
+    parser.add_argument("--dataset-id", type=int, default=None, help="数据集ID，默认为问题最多的数据集")
+    parser.add_argument("--version", type=int, default=None, help="数据集版本，默认为当前版本")
+    parser.add_argument("--repeat", type=int, default=5, help="每个查询的执行次数")
+    args = parser.parse_args()
+
+    if run_benchmark(args.dataset_id, args.version, args.repeat):
+        print("\n所有版本快照查询均使用复合索引")
+    else:
+        print("\n存在未使用复合索引的查询，请确认已执行 alembic upgrade head")
+        sys.exit(1)
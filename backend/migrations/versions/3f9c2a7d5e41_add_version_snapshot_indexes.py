@@ -0,0 +1,47 @@
+"""add version snapshot indexes
+
+为StdQuestion和StdAnswer添加版本快照读取使用的复合索引。
+数据库由create_all或complete_database_schema.sql创建时索引已存在，此时跳过。
+
+Revision ID: 3f9c2a7d5e41
+Revises: 5c2e91b04a7d
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a7d5e41'
+down_revision: Union[str, None] = '5c2e91b04a7d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (表名, 索引名, 列)
+INDEXES = [
+    ('StdQuestion', 'idx_stdquestion_dataset_valid_version',
+     ['dataset_id', 'is_valid', 'original_version_id', 'current_version_id']),
+    ('StdAnswer', 'idx_stdanswer_question_valid_version',
+     ['std_question_id', 'is_valid', 'original_version_id', 'current_version_id']),
+]
+
+
+def _existing_indexes(table: str) -> set:
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, name, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, name, _ in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,237 @@
+"""add evaluation pipeline schema
+
+为已有数据库补齐评测流水线新增的表、列和索引：
+作业队列、进度快照、评分汇总、排行榜、数据集版本统计，
+任务的并发/缓存/批量/流式/多次采样/扇出配置，答案和评测的调用统计列，
+以及Evaluation.evaluator_type新增的auto取值。
+数据库由create_all或complete_database_schema.sql创建时这些对象已存在，此时跳过。
+
+Revision ID: 5c2e91b04a7d
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e91b04a7d'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 已有表新增的列：表名 -> 列定义
+NEW_COLUMNS = {
+    'LLM': [
+        sa.Column('requests_per_minute', sa.Integer(), nullable=True),
+        sa.Column('tokens_per_minute', sa.Integer(), nullable=True),
+    ],
+    'LLMEvaluationTask': [
+        sa.Column('cache_hits', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('cache_misses', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('concurrency', sa.Integer(), server_default=sa.text('5'), nullable=False),
+        sa.Column('use_cache', sa.Boolean(), server_default=sa.text('1'), nullable=False),
+        sa.Column('execution_mode', sa.String(length=20), server_default=sa.text("'interactive'"), nullable=False),
+        sa.Column('batch_id', sa.String(length=255), nullable=True),
+        sa.Column('enable_streaming', sa.Boolean(), server_default=sa.text('0'), nullable=False),
+        sa.Column('samples_per_question', sa.Integer(), server_default=sa.text('1'), nullable=False),
+        sa.Column('fanout_group', sa.String(length=36), nullable=True),
+    ],
+    'LLMAnswer': [
+        sa.Column('sample_index', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('response_time_ms', sa.Integer(), nullable=True),
+        sa.Column('first_token_ms', sa.Integer(), nullable=True),
+        sa.Column('tokens_per_second', sa.Float(), nullable=True),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+        sa.Column('completion_tokens', sa.Integer(), nullable=True),
+        sa.Column('cost', sa.DECIMAL(12, 6), nullable=True),
+        sa.Column('retries', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.Column('failure_reason', sa.String(length=100), nullable=True),
+    ],
+    'Evaluation': [
+        sa.Column('response_time_ms', sa.Integer(), nullable=True),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+        sa.Column('completion_tokens', sa.Integer(), nullable=True),
+        sa.Column('cost', sa.DECIMAL(12, 6), nullable=True),
+        sa.Column('retries', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    ],
+}
+
+# 已有表新增的索引：(表名, 索引名, 列)；同样列上已有任一索引（如create_all生成的ix_*）时跳过
+NEW_INDEXES = [
+    ('LLMEvaluationTask', 'idx_task_fanout_group', ['fanout_group']),
+    ('LLMAnswer', 'idx_la_failure_reason', ['failure_reason']),
+    ('LLMAnswer', 'idx_la_task_id', ['task_id', 'id']),
+    ('Evaluation', 'idx_eval_answer_type_score', ['llm_answer_id', 'evaluator_type', 'score']),
+]
+
+EVALUATOR_TYPES_BEFORE = ('user', 'llm')
+EVALUATOR_TYPES_AFTER = ('user', 'llm', 'auto')
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _create_new_tables(existing: set):
+    if 'EvaluationJob' not in existing:
+        op.create_table(
+            'EvaluationJob',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('task_id', sa.Integer(), nullable=False),
+            sa.Column('job_type', sa.Enum('generate', 'evaluate', 'resume', 'fanout', name='jobtype'), nullable=False),
+            sa.Column('status', sa.Enum('queued', 'running', 'done', 'failed', name='jobstatus'),
+                      server_default='queued', nullable=False),
+            sa.Column('question_limit', sa.Integer(), nullable=True),
+            sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False),
+            sa.Column('lease_owner', sa.String(length=255), nullable=True),
+            sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+            sa.Column('error_message', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['task_id'], ['LLMEvaluationTask.id'], name='fk_job_task',
+                                    ondelete='CASCADE', onupdate='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('idx_job_task', 'EvaluationJob', ['task_id'])
+        op.create_index('idx_job_status_lease', 'EvaluationJob', ['status', 'lease_expires_at'])
+
+    if 'TaskScoreAggregate' not in existing:
+        op.create_table(
+            'TaskScoreAggregate',
+            sa.Column('task_id', sa.Integer(), nullable=False),
+            sa.Column('question_type', sa.String(length=20), nullable=False),
+            sa.Column('score_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+            sa.Column('score_sum', sa.DECIMAL(16, 4), server_default=sa.text('0'), nullable=False),
+            sa.Column('score_sum_sq', sa.DECIMAL(20, 4), server_default=sa.text('0'), nullable=False),
+            sa.Column('histogram', sa.JSON(), nullable=True),
+            sa.Column('question_count', sa.Integer(), nullable=True),
+            sa.Column('samples_per_question', sa.Integer(), nullable=True),
+            sa.Column('pass_at_1', sa.DECIMAL(5, 2), nullable=True),
+            sa.Column('pass_at_k', sa.DECIMAL(5, 2), nullable=True),
+            sa.Column('majority_vote_accuracy', sa.DECIMAL(5, 2), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+            sa.ForeignKeyConstraint(['task_id'], ['LLMEvaluationTask.id'], name='fk_score_agg_task',
+                                    ondelete='CASCADE', onupdate='CASCADE'),
+            sa.PrimaryKeyConstraint('task_id', 'question_type'),
+        )
+
+    if 'ModelLeaderboardEntry' not in existing:
+        op.create_table(
+            'ModelLeaderboardEntry',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('task_id', sa.Integer(), nullable=False),
+            sa.Column('dataset_id', sa.Integer(), nullable=False),
+            sa.Column('dataset_version', sa.Integer(), nullable=False),
+            sa.Column('model_id', sa.Integer(), nullable=True),
+            sa.Column('created_by', sa.Integer(), nullable=False),
+            sa.Column('group_type', sa.String(length=20), nullable=False),
+            sa.Column('group_key', sa.String(length=100), nullable=False),
+            sa.Column('score_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+            sa.Column('score_sum', sa.DECIMAL(16, 4), server_default=sa.text('0'), nullable=False),
+            sa.Column('average_score', sa.DECIMAL(5, 2), nullable=True),
+            sa.Column('completed_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+            sa.ForeignKeyConstraint(['task_id'], ['LLMEvaluationTask.id'], name='fk_leaderboard_task',
+                                    ondelete='CASCADE', onupdate='CASCADE'),
+            sa.ForeignKeyConstraint(['model_id'], ['LLM.id'], name='fk_leaderboard_model'),
+            sa.ForeignKeyConstraint(['created_by'], ['User.id'], name='fk_leaderboard_user'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('task_id', 'group_type', 'group_key', name='uq_leaderboard_task_group'),
+        )
+        op.create_index('idx_leaderboard_dataset', 'ModelLeaderboardEntry', ['dataset_id', 'dataset_version', 'created_by'])
+
+    if 'DatasetVersionStats' not in existing:
+        # content_token由下一个版本（8b41d06e2c97）添加
+        op.create_table(
+            'DatasetVersionStats',
+            sa.Column('dataset_id', sa.Integer(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('question_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+            sa.Column('choice_question_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+            sa.Column('text_question_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+            sa.Column('answer_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+            sa.Column('scoring_point_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+            sa.Column('tag_counts', sa.JSON(), nullable=True),
+            sa.Column('computed_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+            sa.ForeignKeyConstraint(['dataset_id', 'version'], ['Dataset.id', 'Dataset.version'],
+                                    name='fk_version_stats_dataset', ondelete='CASCADE', onupdate='CASCADE'),
+            sa.PrimaryKeyConstraint('dataset_id', 'version'),
+        )
+
+    if 'TaskProgressSnapshot' not in existing:
+        op.create_table(
+            'TaskProgressSnapshot',
+            sa.Column('task_id', sa.Integer(), nullable=False),
+            sa.Column('phase', sa.String(length=30), nullable=True),
+            sa.Column('progress', sa.Integer(), server_default=sa.text('0'), nullable=True),
+            sa.Column('total_items', sa.Integer(), server_default=sa.text('0'), nullable=True),
+            sa.Column('completed_items', sa.Integer(), server_default=sa.text('0'), nullable=True),
+            sa.Column('failed_items', sa.Integer(), server_default=sa.text('0'), nullable=True),
+            sa.Column('questions_per_minute', sa.Float(), nullable=True),
+            sa.Column('estimated_remaining_time', sa.Integer(), nullable=True),
+            sa.Column('latest_content', sa.Text(), nullable=True),
+            sa.Column('latest_score', sa.DECIMAL(5, 2), nullable=True),
+            sa.Column('latest_content_type', sa.String(length=20), nullable=True),
+            sa.Column('inflight', sa.JSON(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+            sa.ForeignKeyConstraint(['task_id'], ['LLMEvaluationTask.id'], name='fk_snapshot_task',
+                                    ondelete='CASCADE', onupdate='CASCADE'),
+            sa.PrimaryKeyConstraint('task_id'),
+        )
+
+
+def _alter_evaluator_type(values: tuple, existing_values: tuple):
+    """MySQL的ENUM列需要修改取值列表；其他数据库（如SQLite）的枚举不做约束，跳过"""
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    op.alter_column('Evaluation', 'evaluator_type',
+                    existing_nullable=False,
+                    type_=sa.Enum(*values, name='evaluatortype'),
+                    existing_type=sa.Enum(*existing_values, name='evaluatortype'))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = _inspector()
+    for table, columns in NEW_COLUMNS.items():
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        for column in columns:
+            if column.name not in existing:
+                op.add_column(table, column)
+
+    inspector = _inspector()
+    for table, name, columns in NEW_INDEXES:
+        indexed = {tuple(index['column_names']) for index in inspector.get_indexes(table)}
+        if tuple(columns) not in indexed:
+            op.create_index(name, table, columns)
+
+    _alter_evaluator_type(EVALUATOR_TYPES_AFTER, EVALUATOR_TYPES_BEFORE)
+    _create_new_tables(set(inspector.get_table_names()))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    inspector = _inspector()
+    existing_tables = set(inspector.get_table_names())
+    for table in ('TaskProgressSnapshot', 'DatasetVersionStats', 'ModelLeaderboardEntry',
+                  'TaskScoreAggregate', 'EvaluationJob'):
+        if table in existing_tables:
+            op.drop_table(table)
+
+    # 降级前需删除规则自动评分的评测，否则MySQL无法收窄ENUM
+    op.execute(sa.text("DELETE FROM Evaluation WHERE evaluator_type = 'auto'"))
+    _alter_evaluator_type(EVALUATOR_TYPES_BEFORE, EVALUATOR_TYPES_AFTER)
+
+    for table, name, _ in reversed(NEW_INDEXES):
+        if name in {index['name'] for index in inspector.get_indexes(table)}:
+            op.drop_index(name, table_name=table)
+
+    for table, columns in NEW_COLUMNS.items():
+        existing = {column['name'] for column in _inspector().get_columns(table)}
+        for column in reversed(columns):
+            if column.name in existing:
+                op.drop_column(table, column.name)
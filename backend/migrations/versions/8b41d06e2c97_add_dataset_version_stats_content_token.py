@@ -0,0 +1,47 @@
+"""add dataset version stats content token
+
+为DatasetVersionStats添加content_token列，用于标识数据集版本快照文件。
+表由create_all或complete_database_schema.sql创建时已包含该列，此时跳过；已有统计行的content_token为空，
+首次读取该版本的快照时补写。
+
+Revision ID: 8b41d06e2c97
+Revises: 3f9c2a7d5e41
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b41d06e2c97'
+down_revision: Union[str, None] = '3f9c2a7d5e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLE = 'DatasetVersionStats'
+COLUMN = 'content_token'
+
+
+def _existing_columns() -> set:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(TABLE):
+        return set()
+    return {column['name'] for column in inspector.get_columns(TABLE)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table(TABLE):
+        # 统计表由5c2e91b04a7d创建
+        return
+    if COLUMN not in _existing_columns():
+        op.add_column(TABLE, sa.Column(COLUMN, sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if COLUMN in _existing_columns():
+        op.drop_column(TABLE, COLUMN)
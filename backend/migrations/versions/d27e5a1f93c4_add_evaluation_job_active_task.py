@@ -0,0 +1,91 @@
+"""add evaluation job active task
+
+为EvaluationJob添加active_task_id列及其唯一索引，保证同一任务最多只有一个未结束的作业。
+已有的未结束作业按task_id回填，同一任务有多个未结束作业时保留最早的一个，其余标记为失败。
+表由create_all或complete_database_schema.sql创建时已包含该列和索引，此时跳过。
+
+Revision ID: d27e5a1f93c4
+Revises: 8b41d06e2c97
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd27e5a1f93c4'
+down_revision: Union[str, None] = '8b41d06e2c97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLE = 'EvaluationJob'
+COLUMN = 'active_task_id'
+INDEX = 'uq_job_active_task'
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+def _existing_columns() -> set:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(TABLE):
+        return set()
+    return {column['name'] for column in inspector.get_columns(TABLE)}
+
+
+def _existing_indexes() -> set:
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(TABLE)}
+
+
+def _backfill_active_jobs():
+    """未结束的作业写入active_task_id；同一任务的重复作业标记为失败"""
+    bind = op.get_bind()
+    jobs = sa.table(
+        TABLE,
+        sa.column('id', sa.Integer),
+        sa.column('task_id', sa.Integer),
+        sa.column('status', sa.String),
+        sa.column('error_message', sa.Text),
+        sa.column('lease_owner', sa.String),
+        sa.column('lease_expires_at', sa.DateTime),
+        sa.column('finished_at', sa.DateTime),
+        sa.column(COLUMN, sa.Integer),
+    )
+    rows = bind.execute(
+        sa.select(jobs.c.id, jobs.c.task_id).where(jobs.c.status.in_(ACTIVE_STATUSES)).order_by(jobs.c.id)
+    ).all()
+    seen = set()
+    for job_id, task_id in rows:
+        if task_id in seen:
+            bind.execute(jobs.update().where(jobs.c.id == job_id).values(
+                status='failed',
+                error_message='同一任务已有未结束的作业，重复作业不再执行',
+                lease_owner=None,
+                lease_expires_at=None,
+                finished_at=sa.func.now(),
+            ))
+            continue
+        seen.add(task_id)
+        bind.execute(jobs.update().where(jobs.c.id == job_id).values({COLUMN: task_id}))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table(TABLE):
+        # 作业表由5c2e91b04a7d创建
+        return
+    if COLUMN not in _existing_columns():
+        op.add_column(TABLE, sa.Column(COLUMN, sa.Integer(), nullable=True))
+        _backfill_active_jobs()
+    if INDEX not in _existing_indexes():
+        op.create_index(INDEX, TABLE, [COLUMN], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if COLUMN not in _existing_columns():
+        return
+    if INDEX in _existing_indexes():
+        op.drop_index(INDEX, table_name=TABLE)
+    op.drop_column(TABLE, COLUMN)
@@ -0,0 +1,60 @@
+"""
+选择题规则评分测试 - 只在选项写法明确时给出选项，其余情况返回None交给评测模型
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.choice_grader import extract_choice, grade_choice
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("答案：B\n解释：因为", "B"),
+    ("答案: A, C", "AC"),
+    ("答案为（D）", "D"),
+    ("答案是B因为", "B"),
+    ("答案：AC", "AC"),
+    ("答案：A 和 C", "AC"),
+    ("Answer: (b)", "B"),
+    ("B. 因为", "B"),
+    ("B、", "B"),
+    ("(A,C)", "AC"),
+    ("A, C: 两项都对", "AC"),
+    ("a) foo", "A"),
+    ("B", "B"),
+])
+def test_extracts_clear_options(text, expected):
+    assert extract_choice(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    # 英文单词不是选项
+    "Answer is b",
+    "I think A is wrong",
+    "answer: because",
+    "BAD: x",
+    "Answer: BAD idea",
+    "(bad)",
+    # 选项后紧跟算式或数字
+    "答案: E=mc2",
+    "答案：E2",
+    # 没有答案标记的紧凑写法、顺序颠倒的紧凑写法
+    "ABC",
+    "答案：CA",
+    # 多处答案互相矛盾
+    "Answer: A\nAnswer: B",
+    "",
+    None,
+])
+def test_unclear_options_return_none(text):
+    assert extract_choice(text) is None
+
+
+def test_grade_choice():
+    assert grade_choice("答案：B", ["B"])["score"] == 100.0
+    assert grade_choice("答案：C", ["B"])["score"] == 0.0
+    assert grade_choice("我不知道", ["B"]) is None
+    assert grade_choice("答案：B", ["见解析"]) is None
@@ -0,0 +1,76 @@
+"""
+评测作业入队测试 - 多个进程同时为同一任务入队时只保留一个未结束的作业
+"""
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.crud import crud_evaluation_job
+from app.crud.crud_evaluation_job import enqueue_evaluation_job, finish_evaluation_job
+from app.models.evaluation_job import EvaluationJob, JobStatus, JobType
+
+
+@pytest.fixture
+def make_session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    EvaluationJob.__table__.create(bind=engine)
+    sessions = []
+
+    def factory():
+        session = sessionmaker(autoflush=False, bind=engine)()
+        sessions.append(session)
+        return session
+
+    yield factory
+    for session in sessions:
+        session.close()
+    engine.dispose()
+
+
+def test_unique_index_rejects_second_active_job(make_session):
+    db = make_session()
+    db.add(EvaluationJob(task_id=1, job_type=JobType.RESUME, status=JobStatus.QUEUED, active_task_id=1))
+    db.commit()
+    db.add(EvaluationJob(task_id=1, job_type=JobType.RESUME, status=JobStatus.QUEUED, active_task_id=1))
+    with pytest.raises(IntegrityError):
+        db.commit()
+
+
+def test_concurrent_enqueue_returns_existing_job(make_session, monkeypatch):
+    first = enqueue_evaluation_job(make_session(), 1, JobType.RESUME)
+
+    # 模拟另一个进程在对方插入之前完成了"是否已入队"的检查
+    original = crud_evaluation_job.get_active_job
+    calls = []
+
+    def stale_get_active_job(db, task_id):
+        calls.append(task_id)
+        return None if len(calls) == 1 else original(db, task_id)
+
+    monkeypatch.setattr(crud_evaluation_job, "get_active_job", stale_get_active_job)
+    second = enqueue_evaluation_job(make_session(), 1, JobType.RESUME)
+
+    assert second.id == first.id
+    assert make_session().query(EvaluationJob).count() == 1
+
+
+def test_finished_job_allows_new_job(make_session):
+    db = make_session()
+    job = enqueue_evaluation_job(db, 1, JobType.GENERATE)
+    job.status = JobStatus.RUNNING
+    job.lease_owner = "worker-1"
+    db.commit()
+    assert finish_evaluation_job(db, job.id, "worker-1", JobStatus.DONE)
+
+    next_job = enqueue_evaluation_job(make_session(), 1, JobType.EVALUATE)
+    assert next_job.id != job.id
+    assert next_job.active_task_id == 1
+    db.refresh(job)
+    assert job.active_task_id is None
@@ -0,0 +1,88 @@
+"""
+多次采样续跑测试 - 启用响应缓存时，续跑生成的缺失样本不能取回已有样本的缓存结果
+"""
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import llm_client_service
+from app.services.llm_client_service import LLMClient
+from app.services.response_cache import ResponseCache
+
+
+class FakeCompletions:
+    """每次调用返回不同内容的补全接口，supports_n为False时忽略n参数"""
+
+    def __init__(self, supports_n: bool):
+        self.supports_n = supports_n
+        self.calls = 0
+
+    async def create(self, **params):
+        n = (params.get("n") or 1) if self.supports_n else 1
+        choices = []
+        for index in range(n):
+            self.calls += 1
+            choices.append(SimpleNamespace(
+                message=SimpleNamespace(content=f"answer-{self.calls}"), finish_reason="stop", index=index
+            ))
+        return SimpleNamespace(
+            choices=choices,
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=20 * n, total_tokens=10 + 20 * n),
+            model=params["model"]
+        )
+
+
+@pytest.fixture
+def make_client(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), 10 * 1024 * 1024, 3600)
+    monkeypatch.setattr(llm_client_service, "get_response_cache", lambda: cache)
+    llm_client_service._n_unsupported.clear()
+
+    def make(supports_n: bool):
+        client = LLMClient(api_key="k", base_url="http://stub/v1", model_name="fake-model",
+                           requests_per_minute=None, tokens_per_minute=None, max_retries=0)
+        client.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(supports_n)))
+        return client
+
+    yield make
+    llm_client_service._n_unsupported.clear()
+    cache._conn.close()
+
+
+def answers(results):
+    assert all(result["success"] for result in results)
+    return [result["answer"] for result in results]
+
+
+@pytest.mark.parametrize("supports_n", [False, True])
+def test_resume_does_not_reuse_cached_samples(make_client, supports_n):
+    client = make_client(supports_n)
+    # 首次运行只保存了样本0、1（另一任务或中断前的运行已缓存了完整的4个样本）
+    first = answers(asyncio.run(client.generate_samples("Q?", [0, 1, 2, 3])))
+    stored = first[:2]
+
+    # 续跑只生成缺少的样本2、3
+    resumed = answers(asyncio.run(client.generate_samples("Q?", [2, 3])))
+    assert not set(resumed) & set(stored)
+    assert len(set(resumed)) == 2
+
+
+def test_resumed_sample_reuses_its_own_cache_entry(make_client):
+    client = make_client(False)
+    first = answers(asyncio.run(client.generate_samples("Q?", [0, 1, 2, 3])))
+    calls = client.client.chat.completions.calls
+
+    # 不支持n参数时每个样本单独缓存，续跑的样本命中各自序号的缓存
+    resumed = asyncio.run(client.generate_samples("Q?", [2, 3]))
+    assert answers(resumed) == first[2:]
+    assert all(result["cached"] for result in resumed)
+    assert client.client.chat.completions.calls == calls
+
+    # 只缺一个样本时同样按序号缓存，不会取回样本0
+    single = asyncio.run(client.generate_samples("Q?", [3]))
+    assert answers(single) == first[3:]
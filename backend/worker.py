@@ -0,0 +1,23 @@
+import argparse
+import logging
+
+from app import models
+from app.db.database import engine
+from app.config.llm_config import WORKER_MAX_JOBS
+from app.services.evaluation_worker import run_worker
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM评测任务worker")
+    parser.add_argument("--max-jobs", type=int, default=WORKER_MAX_JOBS, help="同时运行的评测作业数")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler('llm_evaluation_worker.log', encoding='utf-8')
+        ]
+    )
+    models.Base.metadata.create_all(bind=engine)
+    run_worker(args.max_jobs)
@@ -81,6 +81,7 @@ CREATE TABLE `StdQuestion` (
   INDEX `idx_stdquestion_version` (`version`),
   INDEX `idx_stdquestion_original_version` (`original_version_id`),
   INDEX `idx_stdquestion_current_version` (`current_version_id`),
+  INDEX `idx_stdquestion_dataset_valid_version` (`dataset_id`, `is_valid`, `original_version_id`, `current_version_id`),  -- 版本快照读取
   CONSTRAINT `fk_stdquestion_dataset`
     FOREIGN KEY (`dataset_id`, `current_version_id`) REFERENCES `Dataset` (`id`, `version`)
     ON DELETE CASCADE ON UPDATE CASCADE,  
@@ -110,6 +111,7 @@ CREATE TABLE `StdAnswer` (
   INDEX `idx_stdanswer_valid` (`is_valid`),
   INDEX `idx_stdanswer_original_version` (`original_version_id`),
   INDEX `idx_stdanswer_current_version` (`current_version_id`),
+  INDEX `idx_stdanswer_question_valid_version` (`std_question_id`, `is_valid`, `original_version_id`, `current_version_id`),  -- 版本快照读取
   CONSTRAINT `fk_stdanswer_user`
     FOREIGN KEY (`answered_by`) REFERENCES `User` (`id`)
     ON DELETE SET NULL ON UPDATE CASCADE,
@@ -307,6 +309,8 @@ CREATE TABLE `LLM` (
   `top_k` INT DEFAULT 50,
   `enable_reasoning` TINYINT(1) NOT NULL DEFAULT 0,
   `cost_per_1k_tokens` DECIMAL(8,6) DEFAULT 0.0006,
+  `requests_per_minute` INT DEFAULT NULL, -- 每分钟请求数上限
+  `tokens_per_minute` INT DEFAULT NULL, -- 每分钟token数上限
   `description` TEXT DEFAULT NULL,
   `version` VARCHAR(50) DEFAULT NULL,
   `affiliation` VARCHAR(100) DEFAULT NULL,
@@ -332,6 +336,8 @@ CREATE TABLE `LLMEvaluationTask` (
   `total_questions` INT NOT NULL DEFAULT 0,
   `completed_questions` INT NOT NULL DEFAULT 0,
   `failed_questions` INT NOT NULL DEFAULT 0,  
+  `cache_hits` INT NOT NULL DEFAULT 0, -- 响应缓存命中次数
+  `cache_misses` INT NOT NULL DEFAULT 0, -- 响应缓存未命中次数
   `model_id` INT NOT NULL,
   `api_key_hash` VARCHAR(255) DEFAULT NULL,
   `system_prompt` TEXT DEFAULT NULL,
@@ -343,6 +349,13 @@ CREATE TABLE `LLMEvaluationTask` (
   `max_tokens` INT DEFAULT 2000,
   `top_k` INT DEFAULT 50,
   `enable_reasoning` TINYINT(1) NOT NULL DEFAULT 0,
+  `concurrency` INT NOT NULL DEFAULT 5, -- 并发请求数
+  `use_cache` TINYINT(1) NOT NULL DEFAULT 1, -- 是否使用响应缓存
+  `execution_mode` VARCHAR(20) NOT NULL DEFAULT 'interactive', -- 执行方式：interactive / batch
+  `batch_id` VARCHAR(255) DEFAULT NULL, -- 正在进行的批量作业ID
+  `enable_streaming` TINYINT(1) NOT NULL DEFAULT 0, -- 流式生成回答
+  `samples_per_question` INT NOT NULL DEFAULT 1, -- 每题采样次数
+  `fanout_group` VARCHAR(36) DEFAULT NULL, -- 多模型扇出分组
   `evaluation_prompt` TEXT DEFAULT NULL,
   `started_at` DATETIME DEFAULT NULL,
   `completed_at` DATETIME DEFAULT NULL,
@@ -353,6 +366,7 @@ CREATE TABLE `LLMEvaluationTask` (
   INDEX `idx_task_status` (`status`),
   INDEX `idx_task_created_at` (`created_at`),  
   INDEX `idx_task_model` (`model_id`),
+  INDEX `idx_task_fanout_group` (`fanout_group`),
   CONSTRAINT `fk_task_dataset`
     FOREIGN KEY (`dataset_id`, `dataset_version`) REFERENCES `Dataset` (`id`, `version`)
     ON DELETE CASCADE ON UPDATE CASCADE,
@@ -370,16 +384,27 @@ CREATE TABLE `LLMAnswer` (
   `llm_id` INT DEFAULT NULL,
   `task_id` INT DEFAULT NULL,
   `std_question_id` INT DEFAULT NULL,
+  `sample_index` INT NOT NULL DEFAULT 0, -- 同一问题的第几次采样
   `prompt_used` TEXT DEFAULT NULL,
   `answer` TEXT DEFAULT NULL,
   `answered_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `is_valid` TINYINT(1) NOT NULL DEFAULT 1,
+  `response_time_ms` INT DEFAULT NULL, -- 生成总耗时（毫秒）
+  `first_token_ms` INT DEFAULT NULL, -- 首token耗时（毫秒），仅流式生成时记录
+  `tokens_per_second` FLOAT DEFAULT NULL, -- 首token之后的生成速度
+  `prompt_tokens` INT DEFAULT NULL, -- 输入token数
+  `completion_tokens` INT DEFAULT NULL, -- 输出token数
+  `cost` DECIMAL(12,6) DEFAULT NULL, -- 调用成本，命中缓存时为0
+  `retries` INT NOT NULL DEFAULT 0, -- 重试次数
+  `failure_reason` VARCHAR(100) DEFAULT NULL, -- 失败原因分类
   PRIMARY KEY (`id`),
   KEY `idx_la_llm` (`llm_id`),
   KEY `idx_la_task` (`task_id`),
   KEY `idx_la_question` (`std_question_id`),
   INDEX `idx_la_answered_at` (`answered_at`),
   INDEX `idx_la_valid` (`is_valid`),
+  INDEX `idx_la_failure_reason` (`failure_reason`),
+  INDEX `idx_la_task_id` (`task_id`, `id`), -- 按任务keyset分页
   CONSTRAINT `fk_llmanswer_llm`
     FOREIGN KEY (`llm_id`) REFERENCES `LLM` (`id`)
     ON DELETE SET NULL ON UPDATE CASCADE,
@@ -397,13 +422,18 @@ CREATE TABLE `Evaluation` (
   `std_question_id` INT NOT NULL,
   `llm_answer_id` INT NOT NULL,
   `score` DECIMAL(5,2) DEFAULT NULL,
-  `evaluator_type` ENUM('user', 'llm') NOT NULL,
+  `evaluator_type` ENUM('user', 'llm', 'auto') NOT NULL, -- auto为规则自动评分
   `evaluator_id` INT NOT NULL, -- 用户ID或LLM ID
   `evaluation_time` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `notes` TEXT DEFAULT NULL,
   `reasoning` TEXT DEFAULT NULL, -- 评估理由
   `evaluation_prompt` TEXT DEFAULT NULL, -- 使用的评估提示词
   `is_valid` TINYINT(1) NOT NULL DEFAULT 1,
+  `response_time_ms` INT DEFAULT NULL, -- 自动评估耗时（毫秒）
+  `prompt_tokens` INT DEFAULT NULL, -- 输入token数
+  `completion_tokens` INT DEFAULT NULL, -- 输出token数
+  `cost` DECIMAL(12,6) DEFAULT NULL, -- 调用成本，命中缓存时为0
+  `retries` INT NOT NULL DEFAULT 0, -- 重试次数
   PRIMARY KEY (`id`),
   UNIQUE KEY `uk_eval_unique` (`std_question_id`, `llm_answer_id`, `evaluator_type`, `evaluator_id`),
   KEY `idx_eval_stdq` (`std_question_id`),
@@ -411,6 +441,7 @@ CREATE TABLE `Evaluation` (
   KEY `idx_eval_type` (`evaluator_type`),
   KEY `idx_eval_evaluator` (`evaluator_id`),
   INDEX `idx_eval_time` (`evaluation_time`),
+  INDEX `idx_eval_answer_type_score` (`llm_answer_id`, `evaluator_type`, `score`), -- 按评测者类型和分数筛选答案
   CONSTRAINT `fk_eval_stdq`
     FOREIGN KEY (`std_question_id`) REFERENCES `StdQuestion` (`id`)
     ON DELETE CASCADE ON UPDATE CASCADE,
@@ -419,6 +450,115 @@ CREATE TABLE `Evaluation` (
     ON DELETE CASCADE ON UPDATE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+-- 评测作业队列，由独立的worker进程按租约领取执行
+CREATE TABLE `EvaluationJob` (
+  `id` INT NOT NULL AUTO_INCREMENT,
+  `task_id` INT NOT NULL,
+  `job_type` ENUM('generate', 'evaluate', 'resume', 'fanout') NOT NULL,
+  `status` ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+  `question_limit` INT DEFAULT NULL,
+  `attempts` INT NOT NULL DEFAULT 0, -- 已被领取的次数
+  `lease_owner` VARCHAR(255) DEFAULT NULL, -- 持有租约的worker标识
+  `lease_expires_at` DATETIME DEFAULT NULL, -- 租约到期时间
+  `error_message` TEXT DEFAULT NULL,
+  `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `finished_at` DATETIME DEFAULT NULL,
+  `active_task_id` INT DEFAULT NULL, -- 作业未结束时等于task_id，结束时置空
+  PRIMARY KEY (`id`),
+  INDEX `idx_job_task` (`task_id`),
+  INDEX `idx_job_status_lease` (`status`, `lease_expires_at`),
+  UNIQUE INDEX `uq_job_active_task` (`active_task_id`), -- 同一任务最多只有一个未结束的作业
+  CONSTRAINT `fk_job_task`
+    FOREIGN KEY (`task_id`) REFERENCES `LLMEvaluationTask` (`id`)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 评测任务评分汇总表（评测写入或失效时增量更新，每个答案按其有效评测的平均分计入一次）
+CREATE TABLE `TaskScoreAggregate` (
+  `task_id` INT NOT NULL,
+  `question_type` VARCHAR(20) NOT NULL, -- choice / text / all
+  `score_count` INT NOT NULL DEFAULT 0, -- 有有效评分的答案数
+  `score_sum` DECIMAL(16,4) NOT NULL DEFAULT 0, -- 答案平均分之和
+  `score_sum_sq` DECIMAL(20,4) NOT NULL DEFAULT 0, -- 答案平均分的平方和
+  `histogram` JSON DEFAULT NULL, -- 答案平均分每10分一个桶的计数
+  `question_count` INT DEFAULT NULL, -- 多次采样指标参与计算的题数
+  `samples_per_question` INT DEFAULT NULL, -- pass@k中的k
+  `pass_at_1` DECIMAL(5,2) DEFAULT NULL,
+  `pass_at_k` DECIMAL(5,2) DEFAULT NULL,
+  `majority_vote_accuracy` DECIMAL(5,2) DEFAULT NULL, -- 多数投票准确率
+  `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`task_id`, `question_type`),
+  CONSTRAINT `fk_score_agg_task`
+    FOREIGN KEY (`task_id`) REFERENCES `LLMEvaluationTask` (`id`)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 模型排行榜汇总表（任务完成时刷新，每个任务每个分组一行）
+CREATE TABLE `ModelLeaderboardEntry` (
+  `id` INT NOT NULL AUTO_INCREMENT,
+  `task_id` INT NOT NULL,
+  `dataset_id` INT NOT NULL,
+  `dataset_version` INT NOT NULL,
+  `model_id` INT DEFAULT NULL,
+  `created_by` INT NOT NULL,
+  `group_type` VARCHAR(20) NOT NULL, -- overall / question_type / tag
+  `group_key` VARCHAR(100) NOT NULL, -- overall为all，其余为问题类型或标签名
+  `score_count` INT NOT NULL DEFAULT 0,
+  `score_sum` DECIMAL(16,4) NOT NULL DEFAULT 0,
+  `average_score` DECIMAL(5,2) DEFAULT NULL,
+  `completed_at` DATETIME DEFAULT NULL,
+  `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_leaderboard_task_group` (`task_id`, `group_type`, `group_key`),
+  INDEX `idx_leaderboard_dataset` (`dataset_id`, `dataset_version`, `created_by`),
+  CONSTRAINT `fk_leaderboard_task`
+    FOREIGN KEY (`task_id`) REFERENCES `LLMEvaluationTask` (`id`)
+    ON DELETE CASCADE ON UPDATE CASCADE,
+  CONSTRAINT `fk_leaderboard_model`
+    FOREIGN KEY (`model_id`) REFERENCES `LLM` (`id`),
+  CONSTRAINT `fk_leaderboard_user`
+    FOREIGN KEY (`created_by`) REFERENCES `User` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 数据集版本统计表（版本创建或完成时计算，版本内容变化时删除，读取时按需重新计算）
+CREATE TABLE `DatasetVersionStats` (
+  `dataset_id` INT NOT NULL,
+  `version` INT NOT NULL,
+  `question_count` INT NOT NULL DEFAULT 0, -- 有效问题数
+  `choice_question_count` INT NOT NULL DEFAULT 0, -- 选择题数
+  `text_question_count` INT NOT NULL DEFAULT 0, -- 文本题数
+  `answer_count` INT NOT NULL DEFAULT 0, -- 有效标准答案数
+  `scoring_point_count` INT NOT NULL DEFAULT 0, -- 有效得分点数
+  `tag_counts` JSON DEFAULT NULL, -- 标签到问题数的映射
+  `content_token` VARCHAR(32) DEFAULT NULL, -- 每次计算时重新生成，用于标识快照文件对应的版本内容
+  `computed_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`dataset_id`, `version`),
+  CONSTRAINT `fk_version_stats_dataset`
+    FOREIGN KEY (`dataset_id`, `version`) REFERENCES `Dataset` (`id`, `version`)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 评测任务进度快照表（执行中的任务定期覆盖写入）
+CREATE TABLE `TaskProgressSnapshot` (
+  `task_id` INT NOT NULL,
+  `phase` VARCHAR(30) DEFAULT NULL, -- 写入快照时的阶段
+  `progress` INT DEFAULT 0,
+  `total_items` INT DEFAULT 0,
+  `completed_items` INT DEFAULT 0,
+  `failed_items` INT DEFAULT 0,
+  `questions_per_minute` FLOAT DEFAULT NULL,
+  `estimated_remaining_time` INT DEFAULT NULL, -- 预计剩余时间（秒）
+  `latest_content` TEXT DEFAULT NULL, -- 最新答案或评测理由（截断）
+  `latest_score` DECIMAL(5,2) DEFAULT NULL,
+  `latest_content_type` VARCHAR(20) DEFAULT NULL,
+  `inflight` JSON DEFAULT NULL, -- 正在执行的请求及其部分输出
+  `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`task_id`),
+  CONSTRAINT `fk_snapshot_task`
+    FOREIGN KEY (`task_id`) REFERENCES `LLMEvaluationTask` (`id`)
+    ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 -- ================== 版本管理系统 ==================
 
 -- 数据集版本工作表